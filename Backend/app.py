@@ -490,6 +490,7 @@ def assign():
             "select save_employee_master(%s,%s,%s,%s,%s,%s);",
             (emp_id,manager1_id,hr1_id,manager2_id,manager3_id,hr2_id),
         )
+        cur.execute("select refresh_reporting_lines(%s::int[]);", ([emp_id],))
         conn.commit()
         
         return jsonify({"status":"success","message":"Assigned successfully"}),200
@@ -1,31 +1,48 @@
+import hashlib
+import logging
+import os
+import time
 from datetime import timedelta, timezone, datetime
 from jose import jwt, JWTError
-from passlib.context import CryptContext
 from fastapi.security import OAuth2PasswordBearer
 from fastapi import HTTPException, Depends, Request
-from sqlmodel import Session, select
+from sqlmodel import Session, SQLModel, select
+from sqlalchemy import text
 from models.user_model import User
 from database import get_session
-from typing import Annotated, Literal
+from sqlmodel.ext.asyncio.session import AsyncSession
+from database import get_async_session
+from utils.session_cache import session_cache
+from utils.session_store import get_session_store, REVOKED_SESSION
+from utils.ttl_cache import TTLCache
+from typing import Annotated, Literal, Optional
 from functools import wraps
 
+logger = logging.getLogger(__name__)
+
 SECRET_KEY = "super-secret-key"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/users/login")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt runs on the bounded password pool, never on the event loop
+from utils.hash_utils import hash_password, verify_password
 
+# Validated claims keyed by token digest; each entry lives until the token's exp
+JWT_CLAIM_CACHE_SIZE = int(os.getenv("JWT_CLAIM_CACHE_SIZE", 10000))
+claims_cache = TTLCache(JWT_CLAIM_CACHE_SIZE, ttl=24 * 3600)
 
-# Hash plain password
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
 
+class Principal(SQLModel):
+    """The authenticated caller, resolved once per request from the token's session."""
+    user_id: int
+    role: Optional[str] = None
+    user_type: Optional[str] = None
 
-# Verify password against hashed
-def verify_password(plain: str, hashed: str) -> bool:
-    return pwd_context.verify(plain, hashed)
+    @property
+    def id(self) -> int:
+        return self.user_id
 
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
@@ -38,39 +55,110 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
 # Verify JWT token
 def verify_token(token: str):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
+        return decode_claims(token)
     except JWTError:
         return None
+
+
+def decode_claims(token: str) -> dict:
+    """jwt.decode, memoised per token until it expires. Raises JWTError like jwt.decode."""
+    key = hashlib.sha256(token.encode()).digest()
+    claims = claims_cache.get(key)
+    if claims is None:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        exp = claims.get("exp")
+        claims_cache.set(key, claims, exp - time.time() if exp else None)
+    return dict(claims)
     
 #changed
-def get_current_user(request: Request, db: Session = Depends(get_session)):
-    token = request.headers.get("Authorization")
-    if not token:
+async def get_current_user(request: Request, db: AsyncSession = Depends(get_async_session)) -> Principal:
+    # Already resolved by another auth dependency on this request
+    principal = getattr(request.state, "principal", None)
+    if principal is not None:
+        return principal
+
+    header = request.headers.get("Authorization")
+    if not header:
         raise HTTPException(status_code=401, detail="Missing token")
 
+    principal = Principal(**await _session_user(bearer_token(header), db))
+    request.state.principal = principal
+    return principal
+
+
+def bearer_token(header: str) -> str:
+    """The token in an Authorization header: `Bearer <token>`, or a bare token as older clients send it."""
+    scheme, _, credentials = header.partition(" ")
+    if scheme.lower() == "bearer" and credentials.strip():
+        return credentials.strip()
+    return header.strip()
+
+
+EMPLOYEE_PRINCIPAL_QUERY = text("SELECT id, role FROM employees WHERE company_email = :email")
+
+
+async def _employee_user(payload: dict, db: AsyncSession) -> dict:
+    """
+    Employee logins issue {sub, role} tokens with no session. The employee
+    behind `sub` must still exist and still hold the token's role; the
+    answer is cached like a session, so a role change applies within
+    SESSION_CACHE_TTL_SECONDS.
+    """
+    key = ("employee", payload["sub"], payload["role"])
+    cached = session_cache.get(key)
+    if cached is not None:
+        return cached
+
+    row = (await db.execute(EMPLOYEE_PRINCIPAL_QUERY, {"email": payload["sub"]})).first()
+    if row is None or row.role != payload["role"]:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    user = {"user_id": row.id, "role": row.role, "user_type": "employee"}
+    exp = payload.get("exp")
+    session_cache.set(key, user, exp - time.time() if exp else None)
+    return user
+
+
+async def _session_user(token: str, db: AsyncSession) -> dict:
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_claims(token)
         session_id: str = payload.get("session_id")
         if not session_id:
+            if payload.get("sub") and payload.get("role"):
+                return await _employee_user(payload, db)
             raise HTTPException(status_code=401, detail="Invalid token")
 
-        # ✅ Check Redis
-        data = redis_client.get(session_id)
-        if data:
-            return json.loads(data)
+        # In-process cache first: no network round trip for a hot session
+        cached = session_cache.get(session_id)
+        if cached is not None:
+            return cached
+
+        # ✅ Check the session store (Redis by default); the sessions table
+        # below still answers while the store is unreachable
+        try:
+            user, ttl = await get_session_store().get(session_id)
+        except Exception as e:
+            logger.warning(f"Session store lookup failed, using the sessions table: {e}")
+            user, ttl = None, None
+        if user == REVOKED_SESSION:
+            raise HTTPException(status_code=401, detail="Invalid or expired session")
+        if user:
+            session_cache.set(session_id, user, ttl)
+            return user
 
         # 🔄 Fallback DB check
-        result = db.exec(
-            """SELECT user_id, role, user_type, expires_at, is_active
-               FROM sessions WHERE session_id = :sid""",
+        result = (await db.execute(
+            text("""SELECT user_id, role, user_type, expires_at, is_active
+                    FROM sessions WHERE session_id = :sid"""),
             {"sid": session_id}
-        ).first()
+        )).first()
 
         if not result or result.expires_at < datetime.utcnow() or not result.is_active:
             raise HTTPException(status_code=401, detail="Invalid or expired session")
 
-        return {"user_id": result.user_id, "role": result.role, "user_type": result.user_type}
+        user = {"user_id": result.user_id, "role": result.role, "user_type": result.user_type}
+        session_cache.set(session_id, user, (result.expires_at - datetime.utcnow()).total_seconds())
+        return user
 
     except JWTError:
         raise HTTPException(status_code=403, detail="Invalid or expired token")
@@ -78,13 +166,19 @@ def get_current_user(request: Request, db: Session = Depends(get_session)):
 
 
 #changed
-def role_required(role: Literal["HR", "Manager", "Employee","Account Manager"]):
+Role = Literal["HR", "Manager", "Employee", "Account Manager"]
+
+
+def role_required(*roles: Role):
     """
-    Returns a dependency that checks if the current user has the required role.
+    Returns a dependency that checks if the current user has one of the roles.
+    It reuses the request's resolved principal, so no extra decode or lookup.
     """
-    def dependency(current_user: User = Depends(get_current_user)):
-        if current_user.role != role:
-            raise HTTPException(status_code=403, detail=f"Requires {role} role")
+    allowed = frozenset(roles)
+
+    async def dependency(current_user: Principal = Depends(get_current_user)):
+        if current_user.role not in allowed:
+            raise HTTPException(status_code=403, detail=f"Requires {' or '.join(roles)} role")
         return current_user
     return Depends(dependency)
 
@@ -1,7 +1,11 @@
 # dependencies.py
 from fastapi import Depends
 from sqlmodel import Session
-from database import get_session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from database import get_session, get_async_session
 
 def get_session_dep() -> Session:
     return Depends(get_session)
+
+def get_async_session_dep() -> AsyncSession:
+    return Depends(get_async_session)
@@ -1,8 +1,16 @@
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
-from database import create_tables_database
-from routes import user_routes, document_routes,locations_routes, attendance_routes,leave_routes,onboarding_routes, calendar_routes,expenses_routes, project_routes, weekoff_routes
+from database import create_tables_database, dispose_engines
+from utils.redis_client import close_redis
+from utils.session_cache import start_invalidation_listener, stop_invalidation_listener
+from utils.session_store import start_session_store, stop_session_store
+from utils.email_outbox import email_outbox
+from utils.document_maintenance import start_document_sweeper, stop_document_sweeper
+from utils.hash_utils import password_pool
+from routes import user_routes, document_routes,locations_routes, attendance_routes,leave_routes,onboarding_routes, calendar_routes,expenses_routes, project_routes, weekoff_routes, internal_routes
 from middleware.cors import add_cors_middleware
+from middleware.read_your_writes import add_read_your_writes_middleware
+from middleware.sql_telemetry import add_sql_telemetry_middleware
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -28,7 +36,19 @@ app.add_middleware(
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     create_tables_database()
+    await start_session_store()
+    start_invalidation_listener()
+    email_outbox.start()
+    start_document_sweeper()
     yield
+    await stop_document_sweeper()
+    await email_outbox.stop()
+    await stop_invalidation_listener()
+    await stop_session_store()
+    await close_redis()
+    # Requests have drained by now; waits only for bcrypt calls still running
+    password_pool.shutdown()
+    await dispose_engines()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -36,6 +56,8 @@ app = FastAPI(lifespan=lifespan)
 #changed
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
+add_sql_telemetry_middleware(app)
+add_read_your_writes_middleware(app)
 add_cors_middleware(app)
 
 app.include_router(user_routes.router)
@@ -48,3 +70,4 @@ app.include_router(calendar_routes.router)
 app.include_router(expenses_routes.router)
 app.include_router(project_routes.router)
 app.include_router(weekoff_routes.router)
+app.include_router(internal_routes.router)
@@ -0,0 +1,23 @@
+# app/middleware/read_your_writes.py
+from fastapi import Request
+from database import READ_PRIMARY_COOKIE, READ_YOUR_WRITES_SECONDS
+
+MUTATING_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+def add_read_your_writes_middleware(app):
+    """
+    After a successful write, pin the client's reads to the primary for a few
+    seconds so replica lag never hides what it just saved.
+    """
+    @app.middleware("http")
+    async def pin_reads_after_write(request: Request, call_next):
+        response = await call_next(request)
+        if request.method in MUTATING_METHODS and response.status_code < 400:
+            response.set_cookie(
+                READ_PRIMARY_COOKIE,
+                "1",
+                max_age=READ_YOUR_WRITES_SECONDS,
+                httponly=True,
+                samesite="lax",
+            )
+        return response
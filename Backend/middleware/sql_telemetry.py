@@ -0,0 +1,36 @@
+# app/middleware/sql_telemetry.py
+import logging
+from fastapi import Request
+from utils.sql_telemetry import start_request, route_totals, N_PLUS_ONE_THRESHOLD
+
+logger = logging.getLogger("sql_telemetry")
+
+def add_sql_telemetry_middleware(app):
+    """
+    Tag every request with its statement count and DB time, and warn when the
+    same statement shape repeats often enough to look like an N+1 loop.
+    """
+    @app.middleware("http")
+    async def sql_telemetry(request: Request, call_next):
+        stats = start_request()
+        response = await call_next(request)
+
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", request.url.path)
+        repeated = stats.repeated_shapes()
+
+        route_totals.add(f"{request.method} {route_path}", stats, bool(repeated))
+        response.headers["X-DB-Query-Count"] = str(stats.count)
+        response.headers["X-DB-Time-ms"] = f"{stats.total_time * 1000:.2f}"
+
+        if repeated:
+            for shape, count in repeated:
+                logger.warning(
+                    f"N+1 suspected on {request.method} {route_path}: "
+                    f"{count} executions (threshold {N_PLUS_ONE_THRESHOLD}) of: {shape[:300]}"
+                )
+        logger.info(
+            f"{request.method} {route_path} -> {stats.count} queries, "
+            f"{stats.total_time * 1000:.2f} ms in DB"
+        )
+        return response
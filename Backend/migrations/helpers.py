@@ -0,0 +1,49 @@
+# app/migrations/helpers.py
+import logging
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+
+class MigrationDeferred(Exception):
+    """A migration can't run yet (e.g. its table doesn't exist); it stays unrecorded and is retried next start."""
+
+
+def table_exists(conn, table: str) -> bool:
+    return conn.execute(text("SELECT to_regclass(:t) IS NOT NULL"), {"t": table}).scalar()
+
+
+def require_tables(conn, *tables: str):
+    """Raise MigrationDeferred unless every one of `tables` exists."""
+    missing = [table for table in tables if not table_exists(conn, table)]
+    if missing:
+        raise MigrationDeferred(f"table {', '.join(missing)} does not exist")
+
+
+def create_index(conn, name: str, table: str, definition: str, unique: bool = False):
+    """
+    CREATE INDEX CONCURRENTLY, safe to repeat. `definition` is everything after
+    the table name, e.g. "(employee_id, date) INCLUDE (action)".
+
+    Must run on an AUTOCOMMIT connection. An INVALID index left behind by an
+    interrupted concurrent build is dropped and rebuilt. Raises
+    MigrationDeferred when `table` doesn't exist yet.
+    """
+    if not table_exists(conn, table):
+        raise MigrationDeferred(f"index {name}: table {table} does not exist")
+
+    valid = conn.execute(
+        text("""
+            SELECT i.indisvalid
+            FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid
+            WHERE c.relname = :name AND c.relkind = 'i'
+        """),
+        {"name": name},
+    ).scalar()
+    if valid is False:
+        logger.warning(f"Rebuilding invalid index {name}")
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+    conn.execute(text(
+        f"CREATE {'UNIQUE ' if unique else ''}INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} {definition}"
+    ))
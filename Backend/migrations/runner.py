@@ -0,0 +1,163 @@
+# app/migrations/runner.py
+"""
+Versioned, idempotent schema migrations.
+
+Each migration module exposes VERSION, NAME and upgrade(connection). Applied
+versions are recorded in schema_migrations; every upgrade is also written so
+that re-running it against an already migrated database is harmless. An
+upgrade that raises MigrationDeferred stops the run: it and every later
+version stay pending until the next start, so migrations never apply out
+of order.
+
+    python -m migrations.runner            # apply pending migrations
+    python -m migrations.runner --status   # list applied / pending versions
+    python -m migrations.runner --index-usage
+"""
+import logging
+import sys
+from sqlalchemy import text
+from migrations.helpers import MigrationDeferred
+from migrations import (
+    v001_hot_path_indexes,
+    v002_partition_attendance,
+    v003_attendance_unique_day,
+    v004_attendance_monthly_summary,
+    v005_reporting_lines,
+    v006_session_store,
+    v007_login_principals,
+    v008_email_outbox,
+    v009_document_blob_store,
+    v010_document_status_index,
+    v011_document_file_metadata,
+    v012_email_outbox_retention,
+    v013_sessions_unique_session_id,
+)
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS = [
+    v001_hot_path_indexes,
+    v002_partition_attendance,
+    v003_attendance_unique_day,
+    v004_attendance_monthly_summary,
+    v005_reporting_lines,
+    v006_session_store,
+    v007_login_principals,
+    v008_email_outbox,
+    v009_document_blob_store,
+    v010_document_status_index,
+    v011_document_file_metadata,
+    v012_email_outbox_retention,
+    v013_sessions_unique_session_id,
+]
+
+# Arbitrary key for pg_advisory_lock so concurrent workers don't migrate in parallel
+MIGRATION_LOCK_KEY = 724311
+
+
+def _ensure_version_table(conn):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+    """))
+
+
+def applied_versions(conn) -> set:
+    _ensure_version_table(conn)
+    return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def apply_migrations(engine):
+    """Run every migration newer than what the database has recorded."""
+    # AUTOCOMMIT so migrations may use CREATE INDEX CONCURRENTLY; each upgrade
+    # opens its own transaction where it needs one.
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        try:
+            done = applied_versions(conn)
+            for migration in sorted(MIGRATIONS, key=lambda m: m.VERSION):
+                if migration.VERSION in done:
+                    continue
+                logger.info(f"Applying migration {migration.VERSION}: {migration.NAME}")
+                try:
+                    migration.upgrade(conn)
+                except MigrationDeferred as e:
+                    # Not recorded, so the next start retries it; upgrades are idempotent.
+                    # Later migrations may build on this one, so they wait too.
+                    logger.warning(
+                        f"Migration {migration.VERSION} ({migration.NAME}) deferred, "
+                        f"later migrations wait for it: {e}"
+                    )
+                    break
+                conn.execute(
+                    text("""
+                        INSERT INTO schema_migrations (version, name) VALUES (:version, :name)
+                        ON CONFLICT (version) DO NOTHING
+                    """),
+                    {"version": migration.VERSION, "name": migration.NAME},
+                )
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+
+
+def migration_status(engine) -> list:
+    with engine.connect() as conn:
+        done = applied_versions(conn)
+        conn.commit()
+    return [
+        {"version": m.VERSION, "name": m.NAME, "applied": m.VERSION in done}
+        for m in sorted(MIGRATIONS, key=lambda m: m.VERSION)
+    ]
+
+
+INDEX_USAGE_QUERY = text("""
+    SELECT
+        s.relname AS table_name,
+        s.indexrelname AS index_name,
+        s.idx_scan AS scans,
+        s.idx_tup_read AS tuples_read,
+        s.idx_tup_fetch AS tuples_fetched,
+        pg_relation_size(s.indexrelid) AS size_bytes,
+        i.indisvalid AS is_valid,
+        i.indisunique AS is_unique
+    FROM pg_stat_user_indexes s
+    JOIN pg_index i ON i.indexrelid = s.indexrelid
+    ORDER BY s.relname, s.idx_scan DESC, s.indexrelname
+""")
+
+
+def index_usage_rows(rows) -> list:
+    return [
+        {
+            "table": r.table_name,
+            "index": r.index_name,
+            "scans": r.scans,
+            "tuples_read": r.tuples_read,
+            "tuples_fetched": r.tuples_fetched,
+            "size_bytes": r.size_bytes,
+            "valid": r.is_valid,
+            "unique": r.is_unique,
+            "unused": r.scans == 0 and not r.is_unique,
+        }
+        for r in rows
+    ]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    from database import engine
+
+    if "--status" in sys.argv:
+        for m in migration_status(engine):
+            print(f"{m['version']:>4}  {'applied' if m['applied'] else 'pending':<8} {m['name']}")
+    elif "--index-usage" in sys.argv:
+        with engine.connect() as conn:
+            for row in index_usage_rows(conn.execute(INDEX_USAGE_QUERY)):
+                print(f"{row['table']:<28} {row['index']:<48} scans={row['scans']:<10} "
+                      f"size={row['size_bytes']:<10} {'UNUSED' if row['unused'] else ''}")
+    else:
+        apply_migrations(engine)
+        print("Migrations applied")
@@ -0,0 +1,39 @@
+# app/migrations/v001_hot_path_indexes.py
+"""Indexes for the predicates the attendance, expense, leave and calendar routes filter on."""
+from migrations.helpers import create_index
+
+VERSION = 1
+NAME = "hot_path_indexes"
+
+# (index name, table, definition)
+INDEXES = [
+    # /attendance/* lookups by employee and date range; INCLUDE lets month summaries stay index-only
+    ("ix_attendance_employee_date", "attendance", "(employee_id, date) INCLUDE (action, hours)"),
+    ("ix_attendance_projects_attendance", "attendance_projects", "(attendance_id) INCLUDE (project_id)"),
+
+    # expense lists: per employee, newest first, filtered by status
+    ("ix_expense_requests_employee_created", "expense_requests", "(employee_id, created_at DESC) INCLUDE (status)"),
+    ("ix_expense_requests_status", "expense_requests", "(status)"),
+    ("ix_expense_history_request_created", "expense_history", "(request_id, created_at)"),
+
+    # leave history and approval queues
+    ("ix_leave_management_employee", "leave_management", "(employee_id)"),
+    ("ix_leave_management_statuses", "leave_management", "(manager_status, hr_status)"),
+    # partial: only the small pending slices the approval screens read
+    ("ix_leave_management_pending_manager", "leave_management",
+     "(employee_id) WHERE manager_status = 'Pending'"),
+    ("ix_leave_management_pending_hr", "leave_management",
+     "(employee_id) WHERE manager_status = 'Approved' AND hr_status = 'Pending'"),
+
+    # reporting lines, resolved from the manager/HR side
+    ("ix_employee_managers_manager", "employee_managers", "(manager_id) INCLUDE (employee_id)"),
+    ("ix_employee_hrs_hr", "employee_hrs", "(hr_id) INCLUDE (employee_id)"),
+
+    # holidays per location when counting leave days
+    ("ix_master_calendar_location_date", "master_calendar", "(location_id, holiday_date)"),
+]
+
+
+def upgrade(conn):
+    for name, table, definition in INDEXES:
+        create_index(conn, name, table, definition)
@@ -0,0 +1,67 @@
+# app/migrations/v002_partition_attendance.py
+"""
+Convert `attendance` into a table range-partitioned by month on `date`, so
+month-scoped queries prune to a single partition as history grows.
+
+The primary key becomes (id, date) because a partitioned table's unique
+constraints must include the partition key. attendance_projects keeps its
+attendance_id column but loses the foreign key to attendance, which
+Postgres cannot enforce against (id) alone on a partitioned table.
+"""
+from datetime import date
+from sqlalchemy import text
+from migrations.helpers import require_tables
+from utils.attendance_partitions import attendance_is_partitioned, ensure_attendance_partitions
+
+VERSION = 2
+NAME = "partition_attendance_by_month"
+
+
+def upgrade(conn):
+    require_tables(conn, "attendance", "employees")
+    with conn.engine.begin() as tx:
+        if attendance_is_partitioned(tx):
+            return
+
+        tx.execute(text("LOCK TABLE attendance IN ACCESS EXCLUSIVE MODE"))
+
+        # attendance_projects -> attendance FK cannot point at a partitioned table's id
+        fk_names = tx.execute(text("""
+            SELECT conname FROM pg_constraint
+            WHERE contype = 'f'
+              AND conrelid = to_regclass('attendance_projects')
+              AND confrelid = 'attendance'::regclass
+        """)).scalars().all()
+        for fk in fk_names:
+            tx.execute(text(f'ALTER TABLE attendance_projects DROP CONSTRAINT "{fk}"'))
+
+        tx.execute(text("ALTER TABLE attendance RENAME TO attendance_unpartitioned"))
+        tx.execute(text("ALTER TABLE attendance_unpartitioned RENAME CONSTRAINT attendance_pkey TO attendance_unpartitioned_pkey"))
+        tx.execute(text("ALTER INDEX IF EXISTS ix_attendance_employee_date RENAME TO ix_attendance_unpartitioned_employee_date"))
+
+        tx.execute(text("""
+            CREATE TABLE attendance (
+                LIKE attendance_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS,
+                PRIMARY KEY (id, date)
+            ) PARTITION BY RANGE (date)
+        """))
+        tx.execute(text("ALTER TABLE attendance ADD FOREIGN KEY (employee_id) REFERENCES employees (id)"))
+        tx.execute(text("CREATE INDEX ix_attendance_employee_date ON attendance (employee_id, date) INCLUDE (action, hours)"))
+        tx.execute(text("CREATE TABLE attendance_default PARTITION OF attendance DEFAULT"))
+
+        # The id sequence must survive dropping the old table
+        tx.execute(text("""
+            DO $$
+            DECLARE seq text := pg_get_serial_sequence('attendance_unpartitioned', 'id');
+            BEGIN
+                IF seq IS NOT NULL THEN
+                    EXECUTE format('ALTER SEQUENCE %s OWNED BY attendance.id', seq);
+                END IF;
+            END $$
+        """))
+
+        first_day = tx.execute(text("SELECT MIN(date) FROM attendance_unpartitioned")).scalar()
+        ensure_attendance_partitions(tx, first_month=first_day or date.today())
+
+        tx.execute(text("INSERT INTO attendance SELECT * FROM attendance_unpartitioned"))
+        tx.execute(text("DROP TABLE attendance_unpartitioned"))
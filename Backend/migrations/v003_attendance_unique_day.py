@@ -0,0 +1,38 @@
+# app/migrations/v003_attendance_unique_day.py
+"""
+One attendance row per employee per day, enforced by a unique index so the
+bulk timesheet save can upsert with ON CONFLICT (employee_id, date).
+Existing duplicates keep their most recently updated row.
+"""
+from sqlalchemy import text
+from migrations.helpers import require_tables
+
+VERSION = 3
+NAME = "attendance_unique_employee_day"
+
+
+def upgrade(conn):
+    require_tables(conn, "attendance", "attendance_projects")
+    with conn.engine.begin() as tx:
+        tx.execute(text("""
+            WITH ranked AS (
+                SELECT id, row_number() OVER (
+                    PARTITION BY employee_id, date ORDER BY updated_at DESC, id DESC
+                ) AS rn
+                FROM attendance
+            ),
+            dropped AS (
+                DELETE FROM attendance a USING ranked r
+                WHERE a.id = r.id AND r.rn > 1
+                RETURNING a.id
+            )
+            DELETE FROM attendance_projects ap USING dropped d
+            WHERE ap.attendance_id = d.id
+        """))
+        # Unique (employee_id, date) includes the partition key, so it is allowed
+        # on the partitioned table; INCLUDE keeps month summaries index-only.
+        tx.execute(text("""
+            CREATE UNIQUE INDEX IF NOT EXISTS ux_attendance_employee_date
+            ON attendance (employee_id, date) INCLUDE (action, hours)
+        """))
+        tx.execute(text("DROP INDEX IF EXISTS ix_attendance_employee_date"))
@@ -0,0 +1,28 @@
+# app/migrations/v004_attendance_monthly_summary.py
+"""Create and backfill attendance_monthly_summary from existing attendance."""
+from sqlalchemy import text
+from sqlmodel import Session
+from migrations.helpers import require_tables
+from utils.attendance_summary import rebuild_monthly_summary
+
+VERSION = 4
+NAME = "attendance_monthly_summary"
+
+
+def upgrade(conn):
+    require_tables(conn, "attendance", "employees")
+    with Session(conn.engine) as session:
+        session.execute(text("""
+            CREATE TABLE IF NOT EXISTS attendance_monthly_summary (
+                employee_id INTEGER NOT NULL REFERENCES employees (id),
+                month DATE NOT NULL,
+                present INTEGER NOT NULL DEFAULT 0,
+                wfh INTEGER NOT NULL DEFAULT 0,
+                leave INTEGER NOT NULL DEFAULT 0,
+                hours INTEGER NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                PRIMARY KEY (employee_id, month)
+            )
+        """))
+        rebuild_monthly_summary(session)
+        session.commit()
@@ -0,0 +1,106 @@
+# app/migrations/v005_reporting_lines.py
+"""
+Create the reporting_lines closure table and refresh_reporting_lines(), the
+function that keeps it in step with employee_master / employee_managers /
+employee_hrs, then populate it.
+
+refresh_reporting_lines(ids) recomputes the rows of the given employees and of
+everyone already below them; refresh_reporting_lines(NULL) rebuilds everything.
+"manager" rows follow manager links transitively; "hr" rows give an HR their
+directly assigned employees (depth 1) plus everyone reporting up to those
+employees through managers.
+"""
+from sqlalchemy import text
+from migrations.helpers import create_index, require_tables
+
+VERSION = 5
+NAME = "reporting_lines_closure"
+
+# Guards against runaway recursion if the assignment data ever contains a cycle
+MAX_DEPTH = 20
+
+REFRESH_FUNCTION = f"""
+    CREATE OR REPLACE FUNCTION refresh_reporting_lines(p_employee_ids INTEGER[] DEFAULT NULL)
+    RETURNS VOID LANGUAGE plpgsql AS $fn$
+    DECLARE
+        affected INTEGER[];
+    BEGIN
+        IF p_employee_ids IS NULL THEN
+            affected := ARRAY(SELECT id FROM employees);
+            DELETE FROM reporting_lines;
+        ELSE
+            -- Downward links of these employees are unchanged, so the current
+            -- closure still tells us who sits below them
+            affected := ARRAY(
+                SELECT unnest(p_employee_ids)
+                UNION
+                SELECT descendant_id FROM reporting_lines
+                WHERE relation = 'manager' AND ancestor_id = ANY(p_employee_ids)
+            );
+            DELETE FROM reporting_lines WHERE descendant_id = ANY(affected);
+        END IF;
+
+        INSERT INTO reporting_lines (ancestor_id, relation, descendant_id, depth)
+        WITH RECURSIVE
+        manager_edges AS (
+            SELECT manager_id AS ancestor_id, employee_id AS descendant_id FROM employee_managers
+            UNION
+            SELECT m.id, em.emp_id
+            FROM employee_master em
+            CROSS JOIN LATERAL (VALUES (em.manager1_id), (em.manager2_id), (em.manager3_id)) AS m(id)
+            WHERE m.id IS NOT NULL
+        ),
+        hr_edges AS (
+            SELECT hr_id AS ancestor_id, employee_id AS descendant_id FROM employee_hrs
+            UNION
+            SELECT h.id, em.emp_id
+            FROM employee_master em
+            CROSS JOIN LATERAL (VALUES (em.hr1_id), (em.hr2_id)) AS h(id)
+            WHERE h.id IS NOT NULL
+        ),
+        chain (ancestor_id, descendant_id, depth, path) AS (
+            SELECT e.ancestor_id, e.descendant_id, 1, ARRAY[e.descendant_id, e.ancestor_id]
+            FROM manager_edges e
+            WHERE e.descendant_id = ANY(affected)
+            UNION ALL
+            SELECT e.ancestor_id, c.descendant_id, c.depth + 1, c.path || e.ancestor_id
+            FROM chain c
+            JOIN manager_edges e ON e.descendant_id = c.ancestor_id
+            WHERE e.ancestor_id <> ALL(c.path) AND c.depth < {MAX_DEPTH}
+        ),
+        lines AS (
+            SELECT ancestor_id, 'manager' AS relation, descendant_id, depth FROM chain
+            UNION ALL
+            SELECT h.ancestor_id, 'hr', h.descendant_id, 1
+            FROM hr_edges h
+            WHERE h.descendant_id = ANY(affected)
+            UNION ALL
+            SELECT h.ancestor_id, 'hr', c.descendant_id, c.depth + 1
+            FROM chain c
+            JOIN hr_edges h ON h.descendant_id = c.ancestor_id
+        )
+        SELECT ancestor_id, relation, descendant_id, MIN(depth)
+        FROM lines
+        WHERE ancestor_id <> descendant_id
+        GROUP BY ancestor_id, relation, descendant_id;
+    END
+    $fn$
+"""
+
+
+def upgrade(conn):
+    require_tables(conn, "employees", "employee_master", "employee_managers", "employee_hrs")
+    with conn.engine.begin() as tx:
+        tx.execute(text("""
+            CREATE TABLE IF NOT EXISTS reporting_lines (
+                ancestor_id INTEGER NOT NULL REFERENCES employees (id),
+                relation VARCHAR NOT NULL,
+                descendant_id INTEGER NOT NULL REFERENCES employees (id),
+                depth INTEGER NOT NULL,
+                PRIMARY KEY (ancestor_id, relation, descendant_id)
+            )
+        """))
+        tx.execute(text(REFRESH_FUNCTION))
+    create_index(conn, "ix_reporting_lines_descendant_id", "reporting_lines", "(descendant_id)")
+    with conn.engine.begin() as tx:
+        tx.execute(text("SELECT refresh_reporting_lines(NULL)"))
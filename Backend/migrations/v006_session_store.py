@@ -0,0 +1,23 @@
+# app/migrations/v006_session_store.py
+"""
+UNLOGGED session_store table for SESSION_STORE=postgres. Unlogged tables skip
+WAL (cheap writes, not replicated, emptied after a crash), which is fine for
+a cache of the durable `sessions` table.
+"""
+from sqlalchemy import text
+from migrations.helpers import create_index
+
+VERSION = 6
+NAME = "unlogged_session_store"
+
+
+def upgrade(conn):
+    conn.execute(text("""
+        CREATE UNLOGGED TABLE IF NOT EXISTS session_store (
+            session_id TEXT PRIMARY KEY,
+            payload JSONB NOT NULL,
+            revoked BOOLEAN NOT NULL DEFAULT FALSE,
+            expires_at TIMESTAMPTZ NOT NULL
+        )
+    """))
+    create_index(conn, "ix_session_store_expires_at", "session_store", "(expires_at)")
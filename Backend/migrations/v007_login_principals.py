@@ -0,0 +1,32 @@
+# app/migrations/v007_login_principals.py
+"""
+login_principals: employees and onboarding candidates behind one email-keyed
+view, so /users/login resolves either kind of account in a single query.
+
+It is a UNION ALL view, so `WHERE email = :email` is pushed into both
+branches and each is answered by its own email index.
+"""
+from sqlalchemy import text
+from migrations.helpers import create_index, require_tables
+
+VERSION = 7
+NAME = "login_principals_view"
+
+# kind_rank orders employees ahead of candidates when an address is in both
+LOGIN_PRINCIPALS_VIEW = """
+    CREATE OR REPLACE VIEW login_principals AS
+    SELECT 'user'::text AS kind, 0 AS kind_rank, id, company_email AS email, password_hash,
+           role, name, o_status, login_status, location_id
+    FROM employees
+    UNION ALL
+    SELECT 'candidate'::text, 1, id, email, password,
+           role, name, o_status, login_status, NULL::integer
+    FROM onboarding_employees
+"""
+
+
+def upgrade(conn):
+    require_tables(conn, "employees", "onboarding_employees")
+    create_index(conn, "ix_employees_company_email", "employees", "(company_email)")
+    create_index(conn, "ix_onboarding_employees_email", "onboarding_employees", "(email)")
+    conn.execute(text(LOGIN_PRINCIPALS_VIEW))
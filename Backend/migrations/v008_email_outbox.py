@@ -0,0 +1,13 @@
+# app/migrations/v008_email_outbox.py
+"""Partial index for the email_outbox claim query: workers only ever scan unsent rows."""
+from migrations.helpers import create_index
+
+VERSION = 8
+NAME = "email_outbox_claim_index"
+
+
+def upgrade(conn):
+    create_index(
+        conn, "ix_email_outbox_unsent", "email_outbox",
+        "(id) INCLUDE (next_attempt_at, claimed_at) WHERE status IN ('pending', 'sending')",
+    )
@@ -0,0 +1,44 @@
+# app/migrations/v009_document_blob_store.py
+"""
+Create document_files and drain the per-type BYTEA columns of documents and
+onboarding_emp_docs into the content-addressed blob store.
+
+Up to DOCUMENT_DRAIN_STARTUP_ROWS rows holding bytes are drained right here.
+More than that would hold the migration lock through startup for as long as
+the copy takes, so the migration is deferred instead (later migrations wait
+for it) until `python -m utils.document_maintenance --drain` has moved them;
+the next run then finds nothing left and records it. The (now empty) columns
+are left in place.
+"""
+from sqlalchemy import text
+from migrations.helpers import MigrationDeferred
+from utils.document_maintenance import DOCUMENT_DRAIN_STARTUP_ROWS, drain_all, pending_rows
+
+VERSION = 9
+NAME = "document_blob_store"
+
+
+def upgrade(conn):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS document_files (
+            source VARCHAR(20) NOT NULL,
+            employee_id INTEGER NOT NULL,
+            doc_type VARCHAR(64) NOT NULL,
+            sha256 VARCHAR(64) NOT NULL,
+            size_bytes INTEGER NOT NULL,
+            mime_type VARCHAR(100) NOT NULL,
+            extension VARCHAR(16),
+            page_count INTEGER,
+            uploaded_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (source, employee_id, doc_type)
+        )
+    """))
+    # The drain records them, and may run while v011 (which adds them) waits on this migration
+    conn.execute(text("ALTER TABLE document_files ADD COLUMN IF NOT EXISTS extension VARCHAR(16)"))
+    conn.execute(text("ALTER TABLE document_files ADD COLUMN IF NOT EXISTS page_count INTEGER"))
+    pending = pending_rows(conn)
+    if pending > DOCUMENT_DRAIN_STARTUP_ROWS:
+        raise MigrationDeferred(
+            f"{pending} rows still hold document bytes; run `python -m utils.document_maintenance --drain`"
+        )
+    drain_all(conn.engine)
@@ -0,0 +1,13 @@
+# app/migrations/v010_document_status_index.py
+"""Covering index for the document status listings: upload flags come from the index alone."""
+from migrations.helpers import create_index
+
+VERSION = 10
+NAME = "document_status_index"
+
+
+def upgrade(conn):
+    create_index(
+        conn, "ix_document_files_status", "document_files",
+        "(source, employee_id) INCLUDE (doc_type, uploaded_at)",
+    )
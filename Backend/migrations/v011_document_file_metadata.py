@@ -0,0 +1,59 @@
+# app/migrations/v011_document_file_metadata.py
+"""
+Record extension and page count on document_files, so previews and listings
+describe a file from its row instead of reading it.
+
+Rows stored before this migration are backfilled: the extension from the
+already-detected mime type, the page count of each PDF by reading its blob
+once (per distinct sha256, so a file shared by several rows is read once).
+"""
+import logging
+from sqlalchemy import text
+from utils.document_store import PdfPageCounter, blob_store, extension_for
+
+logger = logging.getLogger(__name__)
+
+VERSION = 11
+NAME = "document_file_metadata"
+
+READ_CHUNK = 1024 * 1024
+
+
+def pdf_page_count(sha256: str):
+    counter = PdfPageCounter()
+    with open(blob_store.path(sha256), "rb") as f:
+        while chunk := f.read(READ_CHUNK):
+            counter.feed(chunk)
+    return counter.count()
+
+
+def upgrade(conn):
+    conn.execute(text("ALTER TABLE document_files ADD COLUMN IF NOT EXISTS extension VARCHAR(16)"))
+    conn.execute(text("ALTER TABLE document_files ADD COLUMN IF NOT EXISTS page_count INTEGER"))
+
+    mime_types = conn.execute(
+        text("SELECT DISTINCT mime_type FROM document_files WHERE extension IS NULL")
+    ).scalars().all()
+    for mime_type in mime_types:
+        conn.execute(
+            text("UPDATE document_files SET extension = :extension WHERE mime_type = :mime_type AND extension IS NULL"),
+            {"extension": extension_for(mime_type), "mime_type": mime_type},
+        )
+
+    pdfs = conn.execute(text("""
+        SELECT DISTINCT sha256 FROM document_files
+        WHERE mime_type = 'application/pdf' AND page_count IS NULL
+    """)).scalars().all()
+    counted = 0
+    for sha256 in pdfs:
+        if not blob_store.exists(sha256):
+            logger.warning(f"Blob {sha256} missing from {blob_store.root}; page count left empty")
+            continue
+        page_count = pdf_page_count(sha256)
+        if page_count:
+            conn.execute(
+                text("UPDATE document_files SET page_count = :page_count WHERE sha256 = :sha256"),
+                {"page_count": page_count, "sha256": sha256},
+            )
+            counted += 1
+    logger.info(f"Counted pages of {counted}/{len(pdfs)} stored PDFs")
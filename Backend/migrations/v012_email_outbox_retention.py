@@ -0,0 +1,21 @@
+# app/migrations/v012_email_outbox_retention.py
+"""
+Blank the bodies (OTPs, temporary passwords) of email_outbox rows that were
+sent or gave up before the workers started doing so themselves, and index
+finished rows by age for the retention purge.
+"""
+from sqlalchemy import text
+from migrations.helpers import MigrationDeferred, create_index, table_exists
+
+VERSION = 12
+NAME = "email_outbox_retention"
+
+
+def upgrade(conn):
+    if not table_exists(conn, "email_outbox"):
+        raise MigrationDeferred("table email_outbox does not exist")
+    conn.execute(text("UPDATE email_outbox SET body = '' WHERE status IN ('sent', 'failed') AND body <> ''"))
+    create_index(
+        conn, "ix_email_outbox_finished_created_at", "email_outbox",
+        "(created_at) WHERE status IN ('sent', 'failed')",
+    )
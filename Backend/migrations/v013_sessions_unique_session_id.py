@@ -0,0 +1,43 @@
+# app/migrations/v013_sessions_unique_session_id.py
+"""
+Unique index on sessions (session_id), which the write-behind flush needs for
+its ON CONFLICT (session_id) DO NOTHING. Skipped when the table already has
+one (e.g. session_id is its primary key). Duplicate rows are collapsed first,
+keeping a deactivated copy over an active one so no logout is lost.
+"""
+from sqlalchemy import text
+from migrations.helpers import create_index, require_tables
+
+VERSION = 13
+NAME = "sessions_unique_session_id"
+
+
+def upgrade(conn):
+    require_tables(conn, "sessions")
+    # A plain unique index on exactly (session_id) is what ON CONFLICT (session_id) can infer
+    has_unique = conn.execute(text("""
+        SELECT EXISTS (
+            SELECT 1
+            FROM pg_index i
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+            WHERE i.indrelid = 'sessions'::regclass
+              AND i.indisunique AND i.indisvalid
+              AND i.indnatts = 1 AND i.indpred IS NULL AND i.indexprs IS NULL
+              AND a.attname = 'session_id'
+        )
+    """)).scalar()
+    if has_unique:
+        return
+
+    with conn.engine.begin() as tx:
+        tx.execute(text("""
+            WITH ranked AS (
+                SELECT ctid, row_number() OVER (
+                    PARTITION BY session_id ORDER BY is_active, ctid
+                ) AS rn
+                FROM sessions
+            )
+            DELETE FROM sessions s USING ranked r
+            WHERE s.ctid = r.ctid AND r.rn > 1
+        """))
+    create_index(conn, "ux_sessions_session_id", "sessions", "(session_id)", unique=True)
@@ -1,22 +1,25 @@
 from sqlmodel import SQLModel, Field, Relationship
 from typing import Optional, List
 from datetime import datetime, date
+import datetime as dt
 from .user_model import User
 
 class AttendanceProject(SQLModel, table=True):
     __tablename__ = "attendance_projects"
 
     attendance_project_id: Optional[int] = Field(default=None, primary_key=True)
-    attendance_id: int = Field(foreign_key="attendance.id")
+    # No FK: attendance is partitioned and keyed on (id, date) (migration v002)
+    attendance_id: int
     project_id: int = Field(foreign_key="projects.project_id")
     sub_task: Optional[str]
 
 class Attendance(SQLModel, table=True):
     __tablename__ = "attendance"
 
-    id: Optional[int] = Field(default=None, primary_key=True)
+    # (id, date): a partitioned table's key must include the partition key (migration v002)
+    id: Optional[int] = Field(default=None, primary_key=True, sa_column_kwargs={"autoincrement": True})
     employee_id: int = Field(foreign_key="employees.id")
-    date: date
+    date: dt.date = Field(primary_key=True)
     day: Optional[str]
     action: Optional[str]
     status: Optional[str]
@@ -26,7 +29,23 @@ class Attendance(SQLModel, table=True):
 
     # Relationships
     employee: Optional[User] = Relationship(back_populates="attendances")
-    attendance_projects: List[AttendanceProject] = Relationship(back_populates="attendance")
+    attendance_projects: List[AttendanceProject] = Relationship(
+        back_populates="attendance",
+        sa_relationship_kwargs={"primaryjoin": "Attendance.id == foreign(AttendanceProject.attendance_id)"},
+    )
 
 # Link back relationships
 AttendanceProject.attendance = Relationship(back_populates="attendance_projects")
+
+
+class AttendanceMonthlySummary(SQLModel, table=True):
+    """Per employee per month counts, kept in step with every attendance write."""
+    __tablename__ = "attendance_monthly_summary"
+
+    employee_id: int = Field(primary_key=True, foreign_key="employees.id")
+    month: date = Field(primary_key=True)   # first day of the month
+    present: int = Field(default=0)
+    wfh: int = Field(default=0)
+    leave: int = Field(default=0)
+    hours: int = Field(default=0)
+    updated_at: datetime = Field(default_factory=datetime.now)
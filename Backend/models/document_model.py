@@ -6,21 +6,22 @@ from datetime import datetime
 class Document(SQLModel, table=True):
     __tablename__ = "documents"
 
+    # The per-type BYTEA columns were drained into the blob store
+    # (migration v009); file metadata lives in document_files
     employee_id: int = Field(primary_key=True)
-    aadhar: Optional[bytes] = None
-    pan: Optional[bytes] = None
-    latest_graduation_certificate: Optional[bytes] = None
-    updated_resume: Optional[bytes] = None
-    offer_letter: Optional[bytes] = None
-    latest_compensation_letter: Optional[bytes] = None
-    experience_relieving_letter: Optional[bytes] = None
-    latest_3_months_payslips: Optional[bytes] = None
-    form16_or_12b_or_taxable_income: Optional[bytes] = None
-    ssc_certificate: Optional[bytes] = None
-    hsc_certificate: Optional[bytes] = None
-    hsc_marksheet: Optional[bytes] = None
-    graduation_marksheet: Optional[bytes] = None
-    postgraduation_marksheet: Optional[bytes] = None
-    postgraduation_certificate: Optional[bytes] = None
-    passport: Optional[bytes] = None
-    uploaded_at: datetime = Field(default_factory=datetime.utcnow)
\ No newline at end of file
+    uploaded_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class DocumentFile(SQLModel, table=True):
+    __tablename__ = "document_files"
+
+    source: str = Field(primary_key=True, max_length=20)  # "employee" | "onboarding"
+    employee_id: int = Field(primary_key=True)
+    doc_type: str = Field(primary_key=True, max_length=64)
+    sha256: str = Field(max_length=64)  # address in utils.document_store.blob_store
+    size_bytes: int
+    mime_type: str = Field(max_length=100)
+    # Detected at upload; NULL on rows from before migration v011 until it backfills them
+    extension: Optional[str] = Field(default=None, max_length=16)
+    page_count: Optional[int] = None  # PDFs only, when it could be counted
+    uploaded_at: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,19 @@
+# app/models/email_outbox_model.py
+from sqlmodel import SQLModel, Field
+from typing import Optional
+from datetime import datetime
+
+class EmailOutbox(SQLModel, table=True):
+    __tablename__ = "email_outbox"
+    id: Optional[int] = Field(default=None, primary_key=True)
+    to_email: str = Field(max_length=255)
+    subject: str = Field(max_length=255)
+    body: str
+    subtype: str = Field(default="plain", max_length=10)
+    status: str = Field(default="pending", max_length=10)  # pending | sending | sent | failed
+    attempts: int = Field(default=0)
+    next_attempt_at: Optional[datetime] = None  # retry time set by the worker; NULL = send now
+    claimed_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.now)
+    sent_at: Optional[datetime] = None
@@ -16,3 +16,15 @@ class EmployeeHR(SQLModel, table=True):
     employee_id: int = Field(foreign_key="employees.id")
     hr_id: int = Field(foreign_key="employees.id")
     created_at: datetime = Field(default_factory=datetime.now)
+
+
+class ReportingLine(SQLModel, table=True):
+    """
+    Closure of the reporting hierarchy: one row per (ancestor, descendant) pair,
+    direct or transitive. Maintained by refresh_reporting_lines(); never edited by hand.
+    """
+    __tablename__ = "reporting_lines"
+    ancestor_id: int = Field(primary_key=True, foreign_key="employees.id")
+    relation: str = Field(primary_key=True)  # "manager" or "hr"
+    descendant_id: int = Field(primary_key=True, foreign_key="employees.id", index=True)
+    depth: int  # 1 = direct report
@@ -15,23 +15,8 @@ class candidate(SQLModel, table=True):
 class onboard_emp_doc(SQLModel, table=True):
     __tablename__ = "onboarding_emp_docs"
 
+    # Files are in the blob store now, metadata in document_files (migration v009)
     employee_id: int = Field(primary_key=True)
-    aadhar: Optional[bytes] = None
-    pan: Optional[bytes] = None
-    latest_graduation_certificate: Optional[bytes] = None
-    updated_resume: Optional[bytes] = None
-    offer_letter: Optional[bytes] = None
-    latest_compensation_letter: Optional[bytes] = None
-    experience_relieving_letter: Optional[bytes] = None
-    latest_3_months_payslips: Optional[bytes] = None
-    form16_or_12b_or_taxable_income: Optional[bytes] = None
-    ssc_certificate: Optional[bytes] = None
-    hsc_certificate: Optional[bytes] = None
-    hsc_marksheet: Optional[bytes] = None
-    graduation_marksheet: Optional[bytes] = None
-    postgraduation_marksheet: Optional[bytes] = None
-    postgraduation_certificate: Optional[bytes] = None
-    passport: Optional[bytes] = None
     uploaded_at: datetime = Field(default_factory=datetime.utcnow)
 
 
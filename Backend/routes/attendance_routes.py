@@ -4,12 +4,18 @@ from sqlalchemy import text
 from sqlmodel import select
 from typing import Dict, List
 from dependencies import get_session
+from database import get_read_session
 from auth import get_current_user
 from models.user_model import User
-from models.employee_assignment_model import EmployeeManager, EmployeeHR
+from utils.reporting_lines import get_reports, MANAGER, HR
 from datetime import datetime
-from schemas.attendance_schema import AttendanceCreate, AttendanceBase
+from schemas.attendance_schema import (
+    AttendanceCreate, AttendanceBase, WeeklyAttendanceEntry, DailyAttendanceRow, HrDailyAttendanceRow
+)
 from datetime import timedelta, date
+import json
+from utils.date_ranges import month_range, optional_month_range
+from utils.attendance_summary import refresh_monthly_summary
 
 router = APIRouter(prefix="/attendance", tags=["Attendance"])
 
@@ -48,9 +54,64 @@ def get_active_projects(
     ]
 
 
+# A submission's entries as rows; `cleared` marks days emptied in the form
+ATTENDANCE_INPUT = """
+    SELECT x.date, x.action, x.hours,
+           COALESCE(x.project_ids, '{}') AS project_ids,
+           COALESCE(x.sub_tasks, '{}') AS sub_tasks,
+           (COALESCE(btrim(x.action), '') = ''
+            AND COALESCE(x.hours, 0) = 0
+            AND COALESCE(cardinality(x.project_ids), 0) = 0) AS cleared
+    FROM jsonb_to_recordset(CAST(:entries AS jsonb))
+         AS x(date date, action text, hours int, project_ids int[], sub_tasks text[])
+"""
+
+# Cleared days are deleted with their project rows (attendance_projects has no
+# FK to the partitioned attendance table to cascade)
+CLEAR_ATTENDANCE_DAYS = text(f"""
+    WITH input AS ({ATTENDANCE_INPUT}),
+    removed AS (
+        DELETE FROM attendance a
+        USING input i
+        WHERE i.cleared AND a.employee_id = :employee_id AND a.date = i.date
+        RETURNING a.id
+    ),
+    removed_projects AS (
+        DELETE FROM attendance_projects ap
+        USING removed r
+        WHERE ap.attendance_id = r.id
+    )
+    SELECT COUNT(*) AS deleted FROM removed
+""")
+
+# The save_attendance() procedure still owns how a day and its project rows
+# are written; it is just called for every day in one statement instead of
+# one round trip per day. on_file reads the statement's own snapshot, which
+# the procedure's writes are not part of, so each saved day is reported as an
+# insert or an update of the rows this very statement wrote over
+SAVE_ATTENDANCE_DAYS = text(f"""
+    WITH input AS ({ATTENDANCE_INPUT}),
+    saved AS (
+        SELECT i.date, save_attendance(:employee_id, i.date, i.action, i.hours, i.project_ids, i.sub_tasks)
+        FROM input i
+        WHERE NOT i.cleared AND i.action = ANY(:valid_actions)
+        ORDER BY i.date
+    ),
+    on_file AS (
+        SELECT a.date FROM attendance a
+        WHERE a.employee_id = :employee_id AND a.date IN (SELECT date FROM input)
+    )
+    SELECT
+        COUNT(*) FILTER (WHERE f.date IS NULL) AS inserted,
+        COUNT(*) FILTER (WHERE f.date IS NOT NULL) AS updated
+    FROM saved s
+    LEFT JOIN on_file f ON f.date = s.date
+""")
+
+
 # Save Attendance with projects & subtasks
 @router.post("/")
-async def save_attendance(
+def save_attendance(
     data: Dict[str, AttendanceCreate],
     employee_id: int = Query(None),
     manager_id: int = Query(None),
@@ -62,49 +123,34 @@ async def save_attendance(
     if not user_id:
         raise HTTPException(status_code=400, detail="employee_id, manager_id, or hr_id is required")
 
-    try:
-        for date_str, entry in data.items():
-            if (not entry.action or entry.action.strip() == "") and \
-               (not entry.hours or entry.hours == 0) and \
-               (not entry.project_ids or len(entry.project_ids) == 0):
-                session.execute(
-                    text("DELETE FROM attendance WHERE employee_id = :emp_id AND date = :date"),
-                    {"emp_id": user_id, "date": entry.date}
-                )
-                continue  # skip save_attendance
-            
-            if entry.action not in VALID_ACTIONS:
-                continue
-
-            project_ids = entry.project_ids or []
-            sub_tasks = entry.sub_tasks or []
-            # if len(project_ids) != len(sub_tasks):
-            #     raise HTTPException(
-            #         status_code=400,
-            #         detail=f"project_ids and sub_tasks length mismatch for date {entry.date}"
-            #     )
-
-            session.execute(
-                text("""SELECT save_attendance(
-                    :employee_id,
-                    :date,
-                    :action,
-                    :hours,
-                    :project_ids,
-                    :sub_tasks
-                )"""),
-                {
-                    "employee_id": user_id,
-                    "date": entry.date,
-                    "action": entry.action,
-                    "hours": entry.hours,
-                    "project_ids": project_ids,
-                    "sub_tasks": sub_tasks
-                }
-            )
+    # One entry per date (last one wins), empty entries clear the day
+    entries = {}
+    for date_str, entry in data.items():
+        entries[entry.date] = {
+            "date": entry.date.isoformat(),
+            "action": entry.action,
+            "hours": entry.hours,
+            "project_ids": entry.project_ids or [],
+            "sub_tasks": entry.sub_tasks or [],
+        }
 
+    try:
+        params = {
+            "employee_id": user_id,
+            "entries": json.dumps(list(entries.values())),
+            "valid_actions": VALID_ACTIONS,
+        }
+        deleted = session.execute(CLEAR_ATTENDANCE_DAYS, params).scalar_one()
+        saved = session.execute(SAVE_ATTENDANCE_DAYS, params).one()
+        refresh_monthly_summary(session, user_id, entries.keys())
         session.commit()
-        return {"success": True, "message": "Attendance submitted successfully"}
+        return {
+            "success": True,
+            "message": "Attendance submitted successfully",
+            "inserted": saved.inserted,
+            "updated": saved.updated,
+            "deleted": deleted,
+        }
 
     except HTTPException:
         raise
@@ -114,7 +160,29 @@ async def save_attendance(
 
 
 
-@router.get("/weekly")
+# Per attendance row: its projects and subtasks as JSON arrays, so reads get one
+# row per (employee, date) instead of one per attendance_projects row
+PROJECTS_LATERAL = """
+    LEFT JOIN LATERAL (
+        SELECT
+            COALESCE(
+                json_agg(json_build_object('label', p.project_name, 'value', p.project_name)
+                         ORDER BY p.project_name) FILTER (WHERE p.project_name IS NOT NULL),
+                '[]'
+            ) AS projects,
+            COALESCE(
+                json_agg(json_build_object('project', p.project_name, 'subTask', ap.sub_task)
+                         ORDER BY p.project_name) FILTER (WHERE ap.sub_task <> ''),
+                '[]'
+            ) AS sub_tasks
+        FROM attendance_projects ap
+        LEFT JOIN projects p ON ap.project_id = p.project_id
+        WHERE ap.attendance_id = a.id
+    ) pj ON TRUE
+"""
+
+
+@router.get("/weekly", response_model=Dict[str, WeeklyAttendanceEntry])
 def get_weekly_attendance(
     employee_id: int = Query(None),
     manager_id: int = Query(None),
@@ -129,40 +197,36 @@ def get_weekly_attendance(
     monday = today - timedelta(days=today.weekday())
     sunday = monday + timedelta(days=6)
 
-    query = text("""
-        SELECT a.id as attendance_id, a.date, a.action, a.status, a.hours,
-               p.project_name, ap.sub_task
+    query = text(f"""
+        SELECT a.date, a.action, a.hours, pj.projects, pj.sub_tasks
         FROM attendance a
-        LEFT JOIN attendance_projects ap ON a.id = ap.attendance_id
-        LEFT JOIN projects p ON ap.project_id = p.project_id
+        {PROJECTS_LATERAL}
         WHERE a.employee_id = :emp_id
         AND a.date BETWEEN :monday AND :sunday
-        ORDER BY a.date, p.project_name
+        ORDER BY a.date
     """)
 
-    result = session.execute(query, {"emp_id": user_id, "monday": monday, "sunday": sunday}).fetchall()
-    # same processing as before...
-    attendance = {}
-    for row in result:
-        key = str(row.date)
-        if key not in attendance:
-            attendance[key] = {"action": row.action, "hours": row.hours, "status": row.action, "projects": [], "subTasks": []}
-        if row.project_name:
-            attendance[key]["projects"].append({"value": row.project_name, "label": row.project_name})
-        if row.sub_task:
-            attendance[key]["subTasks"].append({"project": row.project_name, "subTask": row.sub_task})
-
-    return attendance
+    result = session.execute(query, {"emp_id": user_id, "monday": monday, "sunday": sunday})
+    return {
+        str(row.date): {
+            "action": row.action,
+            "hours": row.hours,
+            "status": row.action,
+            "projects": row.projects,
+            "subTasks": row.sub_tasks,
+        }
+        for row in result
+    }
 
 
 
 from collections import defaultdict
 
 
-@router.get("/daily")
+@router.get("/daily", response_model=List[DailyAttendanceRow])
 def get_daily_attendance(
     year: int,
-    month: int,
+    month: int = Query(..., ge=1, le=12),
     employee_id: int = Query(None),
     manager_id: int = Query(None),
     hr_id: int = Query(None),
@@ -175,28 +239,12 @@ def get_daily_attendance(
         employee_ids = [employee_id]
 
     elif manager_id:
-        # Fetch employees reporting to this manager
-        mgr_employees = session.exec(
-            select(EmployeeManager.employee_id).where(EmployeeManager.manager_id == manager_id)
-        ).all()
-        employee_ids = [e[0] if isinstance(e, tuple) else e for e in mgr_employees]
+        # Everyone reporting to this manager, directly or through other managers
+        employee_ids = get_reports(session, manager_id, MANAGER)
 
     elif hr_id:
-        # Fetch managers assigned to this HR
-        hr_managers = session.exec(
-            select(EmployeeHR.manager_id).where(EmployeeHR.hr_id == hr_id)
-        ).all()
-        manager_ids = [m[0] if isinstance(m, tuple) else m for m in hr_managers]
-
-        # Fetch employees reporting to those managers
-        if manager_ids:
-            mgr_employees = session.exec(
-                select(EmployeeManager.employee_id).where(EmployeeManager.manager_id.in_(manager_ids))
-            ).all()
-            employee_ids = [e[0] if isinstance(e, tuple) else e for e in mgr_employees]
-
-        # Include managers themselves
-        employee_ids.extend(manager_ids)
+        # Employees assigned to this HR plus everyone reporting up to them
+        employee_ids = get_reports(session, hr_id, HR)
 
     else:
         raise HTTPException(status_code=400, detail="employee_id, manager_id, or hr_id must be provided")
@@ -205,65 +253,69 @@ def get_daily_attendance(
         return []
 
     # Fetch attendance for selected employees
-    query = text("""
-        SELECT 
-            u.id as employee_id,
+    query = text(f"""
+        SELECT
+            u.id AS employee_id,
             u.name,
-            u.company_email,
-            a.id as attendance_id, 
-            a.date, 
-            a.action, 
-            a.status, 
+            u.company_email AS email,
+            a.date,
+            to_char(a.date, 'FMDay') AS day,
+            a.action AS status,
             a.hours,
-            p.project_name, 
-            ap.sub_task
-        FROM employees u
-        LEFT JOIN attendance a ON u.id = a.employee_id
-            AND EXTRACT(YEAR FROM a.date) = :year
-            AND EXTRACT(MONTH FROM a.date) = :month
-        LEFT JOIN attendance_projects ap ON a.id = ap.attendance_id
-        LEFT JOIN projects p ON ap.project_id = p.project_id
-        WHERE u.id = ANY(:employee_ids)
-        ORDER BY u.name, a.date, p.project_name
+            pj.projects,
+            pj.sub_tasks AS "subTasks"
+        FROM attendance a
+        JOIN employees u ON u.id = a.employee_id
+        {PROJECTS_LATERAL}
+        WHERE a.employee_id = ANY(:employee_ids)
+            AND a.date >= :month_start
+            AND a.date < :month_end
+        ORDER BY u.name, a.date
     """)
 
-    result = session.execute(
+    month_start, month_end = month_range(year, month)
+    return session.execute(
         query,
-        {"employee_ids": employee_ids, "year": year, "month": month}
-    ).fetchall()
-
-    attendance_list = []
-
-    for row in result:
-        if not row.date:
-        # Skip rows with no attendance
-            continue
-
-        att = {
-        "employee_id": row.employee_id,
-        "name": row.name,
-        "email": row.company_email,
-        "date": str(row.date),
-        "day": row.date.strftime("%A"),
-        "status": row.action,
-        "hours": row.hours,
-        "projects": [],
-        "subTasks": []
-    }
-
-        if row.project_name:
-            att["projects"].append({"label": row.project_name, "value": row.project_name})
-
-        if row.sub_task:
-            att["subTasks"].append({"project": row.project_name, "subTask": row.sub_task})
-
-        attendance_list.append(att)
+        {"employee_ids": employee_ids, "month_start": month_start, "month_end": month_end}
+    ).mappings().all()
+
+# Reads the maintained monthly summary for whole months, one row per employee per
+# month instead of every day. A range ending mid-month (no month given: up to and
+# including today) takes that last partial month straight from attendance, so
+# future-dated days in the current month stay out of the counts
+MONTHLY_SUMMARY_QUERY = text("""
+    SELECT u.id AS employee_id, u.name, u.company_email,
+           COALESCE(s.present, 0) + COALESCE(t.present, 0) AS present,
+           COALESCE(s.wfh, 0) + COALESCE(t.wfh, 0) AS wfh,
+           COALESCE(s.leave, 0) + COALESCE(t.leave, 0) AS leave,
+           COALESCE(s.hours, 0) + COALESCE(t.hours, 0) AS hours
+    FROM employees u
+    LEFT JOIN LATERAL (
+        SELECT SUM(m.present) AS present, SUM(m.wfh) AS wfh,
+               SUM(m.leave) AS leave, SUM(m.hours) AS hours
+        FROM attendance_monthly_summary m
+        WHERE m.employee_id = u.id
+            AND m.month >= :month_start
+            AND m.month < date_trunc('month', CAST(:month_end AS date))
+    ) s ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT COUNT(*) FILTER (WHERE a.action = 'Present') AS present,
+               COUNT(*) FILTER (WHERE a.action = 'WFH') AS wfh,
+               COUNT(*) FILTER (WHERE a.action = 'Leave') AS leave,
+               SUM(a.hours) AS hours
+        FROM attendance a
+        WHERE a.employee_id = u.id
+            AND a.date >= GREATEST(date_trunc('month', CAST(:month_end AS date))::date, CAST(:month_start AS date))
+            AND a.date < :month_end
+    ) t ON TRUE
+    WHERE u.id = ANY(:employee_ids)
+    ORDER BY u.name
+""")
 
-    return attendance_list
 
 @router.get("/mgr-assigned")
 async def get_assigned_mgr_employees_summary(
-    month: int = None,
+    month: int = Query(None, ge=1, le=12),
     year: int = None,
     manager_id: int = Query(None),
     employee_id: int = Query(None),
@@ -271,22 +323,11 @@ async def get_assigned_mgr_employees_summary(
 ):
     try:
         # Determine date range
-        if month and year:
-            month_start = date(year, month, 1)
-            if month == 12:
-                month_end = date(year + 1, 1, 1)
-            else:
-                month_end = date(year, month + 1, 1)
-        else:
-            month_start = date(1900, 1, 1)
-            month_end = datetime.now().date() + timedelta(days=1)
+        month_start, month_end = optional_month_range(year, month)
 
         # If manager_id is provided, get their employees
         if manager_id:
-            employee_ids = session.exec(
-                select(EmployeeManager.employee_id).where(EmployeeManager.manager_id == manager_id)
-            ).all()
-            employee_ids = [e[0] if isinstance(e, tuple) else e for e in employee_ids]
+            employee_ids = get_reports(session, manager_id, MANAGER)
         elif employee_id:
             employee_ids = [employee_id]
         else:
@@ -296,18 +337,7 @@ async def get_assigned_mgr_employees_summary(
             return []
 
         # Fetch attendance summary
-        query = text("""
-            SELECT u.id AS employee_id, u.name, u.company_email,
-                   COUNT(*) FILTER (WHERE a.action='Present') AS present,
-                   COUNT(*) FILTER (WHERE a.action='WFH') AS wfh,
-                   COUNT(*) FILTER (WHERE a.action='Leave') AS leave
-            FROM employees u
-            LEFT JOIN attendance a ON u.id = a.employee_id
-            AND a.date >= :month_start AND a.date < :month_end
-            WHERE u.id = ANY(:employee_ids)
-            GROUP BY u.id, u.name, u.company_email
-            ORDER BY u.name
-        """)
+        query = MONTHLY_SUMMARY_QUERY
 
         result = session.execute(
             query,
@@ -325,7 +355,8 @@ async def get_assigned_mgr_employees_summary(
                 "email": r.company_email,
                 "present": r.present or 0,
                 "wfh": r.wfh or 0,
-                "leave": r.leave or 0
+                "leave": r.leave or 0,
+                "hours": r.hours or 0
             }
             for r in result
         ]
@@ -337,47 +368,21 @@ async def get_assigned_mgr_employees_summary(
 @router.get("/hr-assigned")
 async def get_assigned_hr_employees_summary(
     hr_id: int = Query(..., description="HR ID to fetch assigned employees for"),
-    month: int = None,
+    month: int = Query(None, ge=1, le=12),
     year: int = None,
     session: Session = Depends(get_session),
 ):
     try:
         # Determine month range
-        if month and year:
-            month_start = date(year, month, 1)
-            month_end = date(year + (month // 12), (month % 12) + 1, 1)
-        else:
-            month_start = date(1900, 1, 1)
-            month_end = datetime.now().date() + timedelta(days=1)
-
-        # Fetch employees assigned to this HR
-        employee_ids = session.exec(
-            select(EmployeeHR.employee_id).where(EmployeeHR.hr_id == hr_id)
-        ).all()
+        month_start, month_end = optional_month_range(year, month)
 
-        # flatten list
-        employee_ids = [e[0] if isinstance(e, tuple) else e for e in employee_ids]
+        # Employees assigned to this HR plus everyone reporting up to them
+        employee_ids = get_reports(session, hr_id, HR)
 
         if not employee_ids:
             return []
 
-        query = text("""
-            SELECT 
-                u.id AS employee_id,
-                u.name,
-                u.company_email,
-                COUNT(*) FILTER (WHERE a.action='Present') AS present,
-                COUNT(*) FILTER (WHERE a.action='WFH') AS wfh,
-                COUNT(*) FILTER (WHERE a.action='Leave') AS leave
-            FROM employees u
-            LEFT JOIN attendance a 
-                ON u.id = a.employee_id
-                AND a.date >= :month_start 
-                AND a.date < :month_end
-            WHERE u.id = ANY(:employee_ids)
-            GROUP BY u.id, u.name, u.company_email
-            ORDER BY u.name
-        """)
+        query = MONTHLY_SUMMARY_QUERY
 
         result = session.execute(
             query,
@@ -395,7 +400,8 @@ async def get_assigned_hr_employees_summary(
                 "email": r.company_email,
                 "present": r.present or 0,
                 "wfh": r.wfh or 0,
-                "leave": r.leave or 0
+                "leave": r.leave or 0,
+                "hours": r.hours or 0
             }
             for r in result
         ]
@@ -408,14 +414,14 @@ async def get_assigned_hr_employees_summary(
 
 
 
-@router.get("/hr-daily")
+@router.get("/hr-daily", response_model=List[HrDailyAttendanceRow])
 def get_daily_attendance(
     year: int,
-    month: int,
+    month: int = Query(..., ge=1, le=12),
     employee_id: int = Query(None),
     manager_id: int = Query(None),
     hr_id: int = Query(None),
-    session: Session = Depends(get_session)
+    session: Session = Depends(get_read_session)
 ):
     employee_ids = []
 
@@ -425,27 +431,11 @@ def get_daily_attendance(
 
     # If manager_id is provided
     elif manager_id:
-        mgr_employees = session.exec(
-            select(EmployeeManager.employee_id).where(EmployeeManager.manager_id == manager_id)
-        ).all()
-        employee_ids = [e[0] if isinstance(e, tuple) else e for e in mgr_employees]
+        employee_ids = get_reports(session, manager_id, MANAGER)
 
-    # If hr_id is provided
+    # If hr_id is provided: their employees and everyone reporting up to them
     elif hr_id:
-        hr_managers = session.exec(
-            select(EmployeeHR.employee_id).where(EmployeeHR.hr_id == hr_id)
-        ).all()
-        manager_ids = [m[0] if isinstance(m, tuple) else m for m in hr_managers]
-
-        # Employees under those managers
-        if manager_ids:
-            mgr_employees = session.exec(
-                select(EmployeeManager.employee_id).where(EmployeeManager.manager_id.in_(manager_ids))
-            ).all()
-            employee_ids = [e[0] if isinstance(e, tuple) else e for e in mgr_employees]
-
-        # Include the managers themselves
-        employee_ids.extend(manager_ids)
+        employee_ids = get_reports(session, hr_id, HR)
 
     else:
         raise HTTPException(status_code=400, detail="employee_id, manager_id, or hr_id must be provided")
@@ -454,66 +444,29 @@ def get_daily_attendance(
         return []
 
     # Fetch attendance with projects and subtasks
-    query = text("""
-        SELECT 
+    query = text(f"""
+        SELECT
             u.id AS employee_id,
             u.name,
-            u.company_email,
-            u.role,
-            a.id AS attendance_id,
+            u.company_email AS email,
+            COALESCE(u.role, 'Employee') AS type,
             a.date,
-            a.action,
-            a.status,
+            to_char(a.date, 'FMDay') AS day,
+            a.action AS status,
             a.hours,
-            p.project_name,
-            ap.sub_task
-        FROM employees u
-        LEFT JOIN attendance a ON u.id = a.employee_id
-            AND EXTRACT(YEAR FROM a.date) = :year
-            AND EXTRACT(MONTH FROM a.date) = :month
-        LEFT JOIN attendance_projects ap ON a.id = ap.attendance_id
-        LEFT JOIN projects p ON ap.project_id = p.project_id
-        WHERE u.id = ANY(:employee_ids)
-        ORDER BY u.name, a.date, p.project_name
+            pj.projects,
+            pj.sub_tasks AS "subTasks"
+        FROM attendance a
+        JOIN employees u ON u.id = a.employee_id
+        {PROJECTS_LATERAL}
+        WHERE a.employee_id = ANY(:employee_ids)
+            AND a.date >= :month_start
+            AND a.date < :month_end
+        ORDER BY u.name, a.date
     """)
 
-    result = session.execute(
+    month_start, month_end = month_range(year, month)
+    return session.execute(
         query,
-        {"employee_ids": employee_ids, "year": year, "month": month}
-    ).fetchall()
-
-    # Aggregate projects and subtasks
-    attendance_dict = {}
-    for row in result:
-        if not row.date:
-            continue  # skip if no attendance
-
-        key = (row.employee_id, row.date)
-        if key not in attendance_dict:
-            attendance_dict[key] = {
-                "employee_id": row.employee_id,
-                "name": row.name,
-                "email": row.company_email,
-                "type": row.role or "Employee",
-                "date": str(row.date),
-                "day": row.date.strftime("%A"),
-                "status": row.action,
-                "hours": row.hours,
-                "projects": [],
-                "subTasks": []
-            }
-
-        if row.project_name:
-            attendance_dict[key]["projects"].append({
-                "label": row.project_name,
-                "value": row.project_name
-            })
-
-        if row.sub_task:
-            attendance_dict[key]["subTasks"].append({
-                "project": row.project_name,
-                "subTask": row.sub_task
-            })
-
-    attendance_list = list(attendance_dict.values())
-    return attendance_list
+        {"employee_ids": employee_ids, "month_start": month_start, "month_end": month_end}
+    ).mappings().all()
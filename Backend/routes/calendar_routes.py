@@ -1,8 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from database import get_session
+from sqlalchemy import text
+from datetime import date
+from database import get_async_session
 import logging
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from schemas.calendar_schema import HolidayCreate,MasterCalendar
 
@@ -12,37 +14,38 @@ router = APIRouter(prefix="/calendar", tags=["calendar"])
 @router.post("/add")
 async def add_holiday( 
     holiday: HolidayCreate,
-    session: Session = Depends(get_session)):
+    session: AsyncSession = Depends(get_async_session)):
     try:
-        with session.connection().connection.cursor() as cur:
-            cur.execute(
-                """
+        await session.execute(
+            text("""
                 INSERT INTO master_calendar (location_id, holiday_date, holiday_name)
-                VALUES (%s, %s, %s)
+                VALUES (:location_id, :holiday_date, :holiday_name)
                 ON CONFLICT (location_id, holiday_date) DO NOTHING
-                """,
-                (holiday.location_id, holiday.holiday_date, holiday.holiday_name)
-            )
-        session.commit()
+            """),
+            {
+                "location_id": holiday.location_id,
+                "holiday_date": date.fromisoformat(holiday.holiday_date),
+                "holiday_name": holiday.holiday_name,
+            }
+        )
+        await session.commit()
         return {"status": "success", "message": "Holiday added"}
     except Exception as e:
-        session.rollback()
+        await session.rollback()
         logger.error(f"Error adding holiday: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error adding holiday: {str(e)}")
 
 
 @router.get("/")
-async def get_holidays(location_id: int = None, session: Session = Depends(get_session)):
+async def get_holidays(location_id: int = None, session: AsyncSession = Depends(get_async_session)):
     try:
         query = "SELECT id, location_id, holiday_date, holiday_name FROM master_calendar"
-        params = []
+        params = {}
         if location_id:
-            query += " WHERE location_id = %s"
-            params.append(location_id)
+            query += " WHERE location_id = :location_id"
+            params["location_id"] = location_id
 
-        with session.connection().connection.cursor() as cur:
-            cur.execute(query, params)
-            rows = cur.fetchall()
+        rows = (await session.execute(text(query), params)).all()
 
         holidays = [
             {"id": row[0], "location_id": row[1], "holiday_date": str(row[2]), "holiday_name": row[3]}
@@ -56,25 +59,27 @@ async def get_holidays(location_id: int = None, session: Session = Depends(get_s
 
 
 @router.delete("/{holiday_id}")
-async def delete_holiday(holiday_id: int, session: Session = Depends(get_session)):
+async def delete_holiday(holiday_id: int, session: AsyncSession = Depends(get_async_session)):
     try:
-        with session.connection().connection.cursor() as cur:
-            cur.execute("DELETE FROM master_calendar WHERE id = %s", (holiday_id,))
-        session.commit()
+        await session.execute(
+            text("DELETE FROM master_calendar WHERE id = :holiday_id"),
+            {"holiday_id": holiday_id}
+        )
+        await session.commit()
         return {"status": "success", "message": "Holiday deleted"}
     except Exception as e:
-        session.rollback()
+        await session.rollback()
         logger.error(f"Error deleting holiday: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error deleting holiday: {str(e)}")
 
 @router.get("/by-location/{location_id}")
-async def get_holidays_by_location(location_id: int, session: Session = Depends(get_session)):
+async def get_holidays_by_location(location_id: int, session: AsyncSession = Depends(get_async_session)):
     """
     Get holidays only for a given location_id.
     """
     try:
         query = select(MasterCalendar).where(MasterCalendar.location_id == location_id)
-        holidays = session.exec(query).all()
+        holidays = (await session.exec(query)).all()
 
         if not holidays:
             return {"status": "success", "data": []}
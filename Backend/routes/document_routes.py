@@ -1,18 +1,19 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends,Form,Request
-from fastapi.responses import JSONResponse,StreamingResponse
+from fastapi import APIRouter, UploadFile, HTTPException, Depends,Form,Request,Response,Query
+from fastapi.responses import JSONResponse
 from sqlmodel import Session, select
-from typing import List
-from models.document_model import Document
 from dependencies import get_session
 from auth import get_current_user  # your JWT dependency
-import psycopg2
 import traceback
 import logging
 from datetime import datetime
-import io
 from typing import Optional
 from models.user_model import User
 from schemas.document_schema import DocumentCreate, DocumentResponse, DraftResponse
+from utils.document_store import (
+    EMPLOYEE_DOCS,
+    blob_response, document_files, document_status, document_status_page, extension_for,
+    save_uploaded_documents,
+)
 
 router = APIRouter(prefix="/documents", tags=["Documents"])
 
@@ -26,62 +27,7 @@ async def upload_documents(
     session: Session = Depends(get_session)
 ):
     try:
-        # Parse the multipart form data
-        form_data = await request.form()
-        logger.info(f"Received form data keys: {list(form_data.keys())}")
-        
-        # Extract employeeId
-        employee_id = form_data.get("employeeId")
-        if not employee_id:
-            raise HTTPException(status_code=400, detail="employeeId is required")
-        
-        try:
-            employee_id = int(employee_id)
-        except ValueError:
-            raise HTTPException(status_code=400, detail="employeeId must be a valid integer")
-        
-        uploaded_files = {}
-        
-        with session.connection().connection.cursor() as cur:
-            # Iterate through all form fields
-            for field_name, field_value in form_data.items():
-                # Skip non-file fields
-                if field_name == "employeeId":
-                    continue
-                
-                logger.info(f"Processing field: {field_name}, type: {type(field_value)}")
-                
-                # Check if it's a file upload
-                if hasattr(field_value, 'read') and hasattr(field_value, 'filename'):
-                    if hasattr(field_value, 'size') and field_value.size > 0:
-                        logger.info(f"Uploading file: {field_value.filename} for field: {field_name}")
-                        file_data = await field_value.read()
-                        
-                        # Execute the stored procedure
-                        cur.execute(
-                            "SELECT upload_document(%s, %s, %s);",
-                            (employee_id, field_name, psycopg2.Binary(file_data))
-                        )
-                        result = cur.fetchone()
-                        logger.info(f"Database result for {field_name}: {result}")
-                        
-                        uploaded_files[field_name] = field_value.filename
-                    else:
-                        logger.warning(f"File {field_name} is empty or has no size attribute")
-        
-        # Only commit if we actually uploaded files
-        if uploaded_files:
-            session.commit()
-            logger.info(f"Successfully committed {len(uploaded_files)} files")
-        else:
-            logger.warning("No files were uploaded")
-        
-        return {
-            "message": f"Successfully uploaded {len(uploaded_files)} documents",
-            "uploaded_files": uploaded_files,
-            "employeeId": employee_id
-        }
-        
+        return await save_uploaded_documents(request, session, EMPLOYEE_DOCS)
     except HTTPException:
         # Re-raise HTTP exceptions as-is
         raise
@@ -96,125 +42,72 @@ async def upload_documents(
 #        pass
 
 @router.get("/all-documents")
-def all_documents(session: Session = Depends(get_session)):
-    employees = session.exec(select(User)).all()  # fetch all employees
-    result = []
-
-    for emp in employees:
-        doc = session.exec(select(Document).where(Document.employee_id == emp.id)).first()
-        documents_status = {}
-
-        if doc:
-            doc_fields = [
-                "aadhar",
-                "pan",
-                "latest_graduation_certificate",
-                "updated_resume",
-                "offer_letter",
-                "latest_compensation_letter",
-                "experience_relieving_letter",
-                "latest_3_months_payslips",
-                "form16_or_12b_or_taxable_income",
-                "ssc_certificate",
-                "hsc_certificate",
-                "hsc_marksheet",
-                "graduation_marksheet",
-                "postgraduation_marksheet",
-                "postgraduation_certificate",
-                "passport",
-            ]
-            # True = uploaded, False = not uploaded
-            documents_status = {field: bool(getattr(doc, field, None)) for field in doc_fields}
+def all_documents(
+    response: Response,
+    after_id: int = Query(0, description="Return employees with id greater than this (keyset cursor)"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size; all employees when omitted"),
+    session: Session = Depends(get_session),
+):
+    # One projection query: upload flags per employee, no file metadata or per-employee lookups
+    result = document_status_page(session, EMPLOYEE_DOCS, after_id, limit)
 
-        result.append({
-            "id": emp.id,
-            "name": emp.name,
-            "email": emp.email,
-            "role": emp.role,
-            "documents": documents_status
-        })
+    if limit is not None and len(result) == limit:
+        # Pass back as after_id for the next page
+        response.headers["X-Next-After-Id"] = str(result[-1]["id"])
 
     return result
     
 @router.get("/emp/{employee_id}")
 def list_documents(employee_id: int, session: Session = Depends(get_session)):
-    document = session.exec(
-        select(Document).where(Document.employee_id == employee_id)
-    ).first()
+    response = document_status(session, EMPLOYEE_DOCS, employee_id)
 
-    if not document:
+    if response is None:
         raise HTTPException(status_code=404, detail="No documents found for this employee")
 
-    # List all document columns
-    doc_fields = [
-        "aadhar",
-        "pan",
-        "latest_graduation_certificate",
-        "updated_resume",
-        "offer_letter",
-        "latest_compensation_letter",
-        "experience_relieving_letter",
-        "latest_3_months_payslips",
-        "form16_or_12b_or_taxable_income",
-        "ssc_certificate",
-        "hsc_certificate",
-        "hsc_marksheet",
-        "graduation_marksheet",
-        "postgraduation_marksheet",
-        "postgraduation_certificate",
-        "passport",
-    ]
-
-    response = {field: True if getattr(document, field) else False for field in doc_fields}
-    response["employeeId"] = employee_id
-    response["uploaded_at"] = document.uploaded_at
-
     return response
 
 
 
 
 @router.get("/{employee_id}/{doc_type}")
-def preview_document(employee_id: int, doc_type: str, session: Session = Depends(get_session)):
-    document = session.exec(
-        select(Document).where(Document.employee_id == employee_id)
-    ).first()
+def preview_document(employee_id: int, doc_type: str, request: Request, session: Session = Depends(get_session)):
+    files = document_files(session, EMPLOYEE_DOCS, employee_id)
+    session.release()  # the file is streamed without a connection held
 
-    if not document:
+    if not files:
         raise HTTPException(status_code=404, detail="No documents found for this employee")
 
     valid_fields = {
-        "aadhar": "aadhar.pdf",
-        "pan": "pan.pdf",
-        "latest_graduation_certificate": "graduation_certificate.pdf",
-        "updated_resume": "resume.pdf",
-        "offer_letter": "offer_letter.pdf",
-        "latest_compensation_letter": "compensation_letter.pdf",
-        "experience_relieving_letter": "relieving_letter.pdf",
-        "latest_3_months_payslips": "payslips.pdf",
-        "form16_or_12b_or_taxable_income": "form16.pdf",
-        "ssc_certificate": "ssc_certificate.pdf",
-        "hsc_certificate": "hsc_certificate.pdf",
-        "hsc_marksheet": "hsc_marksheet.pdf",
-        "graduation_marksheet": "graduation_marksheet.pdf",
-        "postgraduation_marksheet": "pg_marksheet.pdf",
-        "postgraduation_certificate": "pg_certificate.pdf",
-        "passport": "passport.pdf",
+        "aadhar": "aadhar",
+        "pan": "pan",
+        "latest_graduation_certificate": "graduation_certificate",
+        "updated_resume": "resume",
+        "offer_letter": "offer_letter",
+        "latest_compensation_letter": "compensation_letter",
+        "experience_relieving_letter": "relieving_letter",
+        "latest_3_months_payslips": "payslips",
+        "form16_or_12b_or_taxable_income": "form16",
+        "ssc_certificate": "ssc_certificate",
+        "hsc_certificate": "hsc_certificate",
+        "hsc_marksheet": "hsc_marksheet",
+        "graduation_marksheet": "graduation_marksheet",
+        "postgraduation_marksheet": "pg_marksheet",
+        "postgraduation_certificate": "pg_certificate",
+        "passport": "passport",
     }
 
     if doc_type not in valid_fields:
         raise HTTPException(status_code=400, detail="Invalid document type")
 
-    file_data = getattr(document, doc_type)
-    if not file_data:
+    file = files.get(doc_type)
+    if not file:
         raise HTTPException(status_code=404, detail=f"{doc_type} not uploaded")
 
+    # Type was detected when the file was stored
+    filename = f"{valid_fields[doc_type]}.{file.extension or extension_for(file.mime_type)}"
+
     # Inline preview instead of download
-    return StreamingResponse(
-        io.BytesIO(file_data),
-        media_type="application/pdf",  # Change to "image/jpeg" or "image/png" for images
-        headers={"Content-Disposition": f"inline; filename={valid_fields[doc_type]}"}
-    )
+    return blob_response(request, file, filename)
     
 @router.post("/save-draft", response_model=DraftResponse)
 async def save_draft(
@@ -1,17 +1,18 @@
 from datetime import datetime
 from typing import List, Optional
 from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Request
-from sqlmodel import Session, select, extract
-from database import get_session
+from sqlmodel import Session, select
+from database import get_session, get_read_session
 from models.expenses_model import ExpenseRequest, ExpenseAttachment, ExpenseHistory
 from utils.code import generate_request_code
 import os
 from auth import get_current_user, role_required
 from models.user_model import User
 from models.employee_master_model import EmployeeMaster
-from models.employee_assignment_model import EmployeeManager, EmployeeHR
+from utils.reporting_lines import get_reports, MANAGER, HR
 from fastapi import Query
 from sqlalchemy import func
+from utils.date_ranges import month_range
 
 router = APIRouter(prefix="/expenses", tags=["Expenses"])
 
@@ -102,17 +103,18 @@ def submit_expense(
 def list_my_expenses(
     employee_id: int,  # Get from frontend instead of current_user
     year: Optional[int] = None,
-    month: Optional[int] = None,
-    session: Session = Depends(get_session),
+    month: Optional[int] = Query(None, ge=1, le=12),
+    session: Session = Depends(get_read_session),
 ):
     query = session.query(ExpenseRequest).filter(
         ExpenseRequest.employee_id == employee_id
     )
 
     if year and month:
+        month_start, month_end = month_range(year, month)
         query = query.filter(
-            extract("year", ExpenseRequest.created_at) == year,
-            extract("month", ExpenseRequest.created_at) == month
+            ExpenseRequest.created_at >= month_start,
+            ExpenseRequest.created_at < month_end
         )
 
     expenses = query.order_by(ExpenseRequest.created_at.desc()).all()
@@ -167,20 +169,17 @@ def list_my_expenses(
 @router.get("/mgr-exp-list", response_model=List[dict])
 def list_all_expenses(
     request: Request,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
     manager_id: int = Query(..., description="Manager ID"),
     year: int = Query(..., description="Year of expenses"),
-    month: int = Query(..., description="Month of expenses"),
+    month: int = Query(..., ge=1, le=12, description="Month of expenses"),
 ):
-    # Get employees reporting to the manager
-    employee_ids = session.exec(
-        select(EmployeeManager.employee_id).where(EmployeeManager.manager_id == manager_id)
-    ).all()
-
-    employee_links = [e[0] if isinstance(e, tuple) else e for e in employee_ids]
+    # Employees whose expenses this manager approves
+    employee_links = get_reports(session, manager_id, MANAGER, max_depth=1)
     if not employee_links:
         return []
 
+    month_start, month_end = month_range(year, month)
     expenses = session.exec(
         select(ExpenseRequest).where(
             ExpenseRequest.employee_id.in_(employee_links),
@@ -190,8 +189,8 @@ def list_all_expenses(
                 "mgr_rejected",
                 "approved"
             ]),
-            func.extract("year", ExpenseRequest.created_at) == year,
-            func.extract("month", ExpenseRequest.created_at) == month
+            ExpenseRequest.created_at >= month_start,
+            ExpenseRequest.created_at < month_end
         ).order_by(ExpenseRequest.created_at.desc())
     ).all()
 
@@ -286,20 +285,16 @@ def list_hr_expenses(
     request: Request,
     hr_id: int = Query(..., description="HR ID from frontend"),  # use frontend HR ID
     year: int = Query(..., description="Year of expenses"),
-    month: int = Query(..., description="Month of expenses"),
-    session: Session = Depends(get_session),
+    month: int = Query(..., ge=1, le=12, description="Month of expenses"),
+    session: Session = Depends(get_read_session),
 ):
     # employees under this HR
-    employee_links = session.exec(
-        select(EmployeeMaster.emp_id).where(
-            (EmployeeMaster.hr1_id == hr_id) |
-            (EmployeeMaster.hr2_id == hr_id)
-        )
-    ).all()
+    employee_links = get_reports(session, hr_id, HR, max_depth=1)
 
     if not employee_links:
         return []
 
+    month_start, month_end = month_range(year, month)
     expenses = session.exec(
         select(ExpenseRequest)
         .where(
@@ -311,8 +306,8 @@ def list_hr_expenses(
                 "approved",
                 "carried_forward"
             ]),
-            extract("year", ExpenseRequest.created_at) == year,
-            extract("month", ExpenseRequest.created_at) == month
+            ExpenseRequest.created_at >= month_start,
+            ExpenseRequest.created_at < month_end
         )
         .order_by(ExpenseRequest.created_at.desc())
     ).all()
@@ -413,9 +408,9 @@ def update_hr_status(
 def list_acc_mgr_expenses(
     request: Request,
     acc_mgr_id: int = Query(..., description="Account Manager ID"),  # from frontend
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
     year: int = Query(..., description="Year of expenses"),
-    month: int = Query(..., description="Month of expenses"),
+    month: int = Query(..., ge=1, le=12, description="Month of expenses"),
 ):
     #account manager object
     acc_mgr = session.get(User, acc_mgr_id)
@@ -423,14 +418,15 @@ def list_acc_mgr_expenses(
         return []
 
     #Filter expenses for employees in the same location
+    month_start, month_end = month_range(year, month)
     expenses = session.exec(
         select(ExpenseRequest)
         .join(User, User.id == ExpenseRequest.employee_id)
         .where(
             User.location_id == acc_mgr.id,
             ExpenseRequest.status.in_(["pending_account_mgr_approval", "approved", "acc_mgr_rejected"]),
-            extract("year", ExpenseRequest.created_at) == year,
-            extract("month", ExpenseRequest.created_at) == month
+            ExpenseRequest.created_at >= month_start,
+            ExpenseRequest.created_at < month_end
         )
         .order_by(ExpenseRequest.created_at.desc())
     ).all()
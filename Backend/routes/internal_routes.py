@@ -0,0 +1,74 @@
+from fastapi import APIRouter, Depends, Query
+from sqlmodel.ext.asyncio.session import AsyncSession
+from database import get_pool_statistics, get_async_session
+from migrations.runner import INDEX_USAGE_QUERY, index_usage_rows
+from utils.sql_telemetry import route_totals
+from utils.session_cache import session_cache
+from utils.hash_utils import password_pool
+from utils.rate_limit import login_limiter
+from utils.email_outbox import outbox_status
+from utils.document_store import DOCUMENT_ORPHAN_MIN_AGE
+from utils.document_maintenance import sweep_orphan_blobs
+from auth import claims_cache, role_required
+
+# Operational stats (statement shapes, index usage, cache and limiter
+# counters) are not for every logged-in user
+router = APIRouter(prefix="/internal", tags=["Internal"], dependencies=[role_required("HR")])
+
+
+@router.get("/db-pool")
+async def db_pool_stats():
+    """
+    Connection pool usage for this worker: checked-out, idle and overflow
+    connections plus checkout wait-time percentiles.
+    """
+    return get_pool_statistics()
+
+
+@router.get("/sql-stats")
+async def sql_stats():
+    """Per-route statement counts, DB time and N+1 flags collected since this worker started."""
+    return route_totals.snapshot()
+
+
+@router.get("/index-usage")
+async def index_usage(session: AsyncSession = Depends(get_async_session)):
+    """Scan counts and sizes for every user index; `unused` marks non-unique indexes never scanned."""
+    result = await session.execute(INDEX_USAGE_QUERY)
+    return index_usage_rows(result.all())
+
+
+@router.get("/session-cache")
+async def session_cache_stats():
+    """Size and hit ratio of this worker's in-process session and JWT-claim caches."""
+    return {"sessions": session_cache.stats(), "claims": claims_cache.stats()}
+
+
+@router.get("/password-pool")
+async def password_pool_stats():
+    """bcrypt worker pool: queue depth, in-flight calls and average wait before a worker picks a call up."""
+    return password_pool.stats()
+
+
+@router.get("/login-limiter")
+async def login_limiter_stats():
+    """Login attempts admitted vs shed by the IP / account token buckets, and Redis fallbacks."""
+    return login_limiter.stats()
+
+
+@router.get("/email-outbox")
+async def email_outbox_stats(session: AsyncSession = Depends(get_async_session)):
+    """Outbox rows by delivery status plus this worker's send / retry / SMTP connection counters."""
+    return await outbox_status(session)
+
+
+@router.post("/document-blobs/sweep")
+async def sweep_document_blobs(
+    min_age: int = Query(DOCUMENT_ORPHAN_MIN_AGE, ge=0, description="Only remove blobs older than this many seconds"),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Delete stored document blobs no document_files row references (replaced or
+    abandoned uploads) now, instead of at the next DOCUMENT_SWEEP_INTERVAL sweep.
+    """
+    return await sweep_orphan_blobs(session, min_age)
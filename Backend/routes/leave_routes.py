@@ -8,7 +8,7 @@ from models.leave_model import LeaveManagement
 from models.user_model import User  # assuming you already have this
 from schemas.leave_schema import LeaveCreate, LeaveResponse, LeaveApprovalCreate
 from schemas.leave_balance_schema import LeaveBalanceResponse,LeaveBalance,LeaveBalanceUpdate
-from models.employee_assignment_model import EmployeeManager, EmployeeHR
+from utils.reporting_lines import reports_query, MANAGER, HR
 router = APIRouter()
 
 # ------------------ EMPLOYEE APPLY LEAVE ------------------ #
@@ -100,13 +100,17 @@ def get_all_leaves(employee_id: int, session: Session = Depends(get_session)):
 
 @router.get("/manager/pending-leaves/{manager_id}")
 def get_manager_pending_leaves(manager_id: int, session: Session = Depends(get_session)):
+    # Approval queues go to the direct approver only (depth 1 in reporting_lines)
     query = text("""
         SELECT lm.*, e.name AS employee_name, e.email AS employee_email
         FROM leave_management lm
         JOIN employees e ON lm.employee_id = e.id
-        JOIN employee_managers em ON e.id = em.employee_id
+        JOIN reporting_lines rl
+            ON rl.descendant_id = e.id
+            AND rl.ancestor_id = :manager_id
+            AND rl.relation = 'manager'
+            AND rl.depth = 1
         WHERE lm.manager_status = 'Pending'
-          AND em.manager_id = :manager_id
     """)
     rows = session.execute(query, {"manager_id": manager_id}).mappings().all()
     return [dict(row) for row in rows]
@@ -139,10 +143,13 @@ def get_hr_pending_leaves(hr_id: int, session: Session = Depends(get_session)):
         SELECT lm.*, e.name AS employee_name, e.email AS employee_email
         FROM leave_management lm
         JOIN employees e ON lm.employee_id = e.id
-        JOIN employee_hrs eh ON e.id = eh.employee_id
+        JOIN reporting_lines rl
+            ON rl.descendant_id = e.id
+            AND rl.ancestor_id = :hr_id
+            AND rl.relation = 'hr'
+            AND rl.depth = 1
         WHERE lm.manager_status = 'Approved'
           AND lm.hr_status = 'Pending'
-          AND eh.hr_id = :hr_id
     """)
     rows = session.execute(query, {"hr_id": hr_id}).mappings().all()
     return [dict(row) for row in rows]
@@ -177,9 +184,8 @@ def get_manager_leave_requests(manager_id: int, status: str = None, session: Ses
     """
     query = (
         select(LeaveManagement, User)
-        .join(EmployeeManager, EmployeeManager.employee_id == LeaveManagement.employee_id)
         .join(User, User.id == LeaveManagement.employee_id)
-        .where(EmployeeManager.manager_id == manager_id)
+        .where(LeaveManagement.employee_id.in_(reports_query(manager_id, MANAGER, max_depth=1)))
     )
 
     if status:
@@ -212,9 +218,8 @@ def get_hr_leave_requests(hr_id: int, status: str = None, session: Session = Dep
     """
     query = (
         select(LeaveManagement, User)
-        .join(EmployeeHR, EmployeeHR.employee_id == LeaveManagement.employee_id)
         .join(User, User.id == LeaveManagement.employee_id)
-        .where(EmployeeHR.hr_id == hr_id)
+        .where(LeaveManagement.employee_id.in_(reports_query(hr_id, HR, max_depth=1)))
         .where(LeaveManagement.manager_status == "Approved")  # ✅ only after manager approval
     )
     
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from database import get_session
+from sqlalchemy import text
+from sqlmodel.ext.asyncio.session import AsyncSession
+from database import get_async_session
 import logging
 
 logger = logging.getLogger(__name__)
@@ -8,11 +9,10 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/locations", tags=["Locations"])
 
 @router.get("/")
-async def get_locations(session: Session = Depends(get_session)):
+async def get_locations(session: AsyncSession = Depends(get_async_session)):
     try:
-        with session.connection().connection.cursor() as cur:
-            cur.execute("SELECT id, name FROM locations ORDER BY name ASC")
-            rows = cur.fetchall()
+        result = await session.execute(text("SELECT id, name FROM locations ORDER BY name ASC"))
+        rows = result.all()
 
         locations = [{"id": row[0], "name": row[1]} for row in rows]
 
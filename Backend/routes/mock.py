@@ -9,6 +9,8 @@ from models.user_model import User
 from models.attendance_model import Attendance
 from sqlalchemy import func
 from datetime import date
+from utils.date_ranges import month_range, optional_month_range
+from utils.attendance_summary import refresh_monthly_summary
 
 router = APIRouter(tags=["Attendance"])
 
@@ -23,10 +25,12 @@ async def save_attendance(
     try:
 
         employee_id = current_user.id 
+        saved_days = []
 
         for date_str, entry in data.items():
             if entry.action not in VALID_ACTIONS:
                 continue
+            saved_days.append(entry.date)
             session.execute(
                 text("""
                     SELECT save_attendance(
@@ -48,6 +52,7 @@ async def save_attendance(
                 }
             )
 
+        refresh_monthly_summary(session, employee_id, saved_days)
         session.commit()
         return {"success": True, "message": "Attendance submitted successfully"}
 
@@ -70,16 +75,17 @@ async def get_attendance(
 @router.get("/attendance/daily")
 async def get_daily_attendance(
     year: int = Query(..., description="Year filter"),
-    month: Optional[int] = Query(None, description="Month filter"),
+    month: Optional[int] = Query(None, ge=1, le=12, description="Month filter"),
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
     try:
         query = select(Attendance).where(Attendance.employee_id == current_user.id)
-        query = query.where(func.extract("year", Attendance.date) == year)
-
         if month:
-            query = query.where(func.extract("month", Attendance.date) == month)
+            month_start, month_end = month_range(year, month)
+        else:
+            month_start, month_end = date(year, 1, 1), date(year + 1, 1, 1)
+        query = query.where(Attendance.date >= month_start, Attendance.date < month_end)
 
         records = session.exec(query).all()
 
@@ -110,6 +116,7 @@ async def get_monthly_summary(
         now = datetime.now()
         month_start = now.replace(day=1).date()
 
+        # This month up to and including today; the summary table holds whole months
         result = session.execute(
             text("""
                 SELECT 
@@ -141,21 +148,13 @@ async def get_monthly_summary(
 
 @router.get("/attendance/hr-assigned")
 async def get_assigned_hr_employees_summary(
-    month: int = None,
+    month: int = Query(None, ge=1, le=12),
     year: int = None,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
     try:
-        if month and year:
-            month_start = date(year, month, 1)
-            if month == 12:
-                month_end = date(year + 1, 1, 1)
-            else:
-                month_end = date(year, month + 1, 1)
-        else:
-            month_start = date(1900, 1, 1)
-            month_end = datetime.now().date() + timedelta(days=1)
+        month_start, month_end = optional_month_range(year, month)
 
         query = text("""
                     SELECT 
@@ -166,9 +165,10 @@ async def get_assigned_hr_employees_summary(
                     COUNT(*) FILTER (WHERE a.action='WFH') AS wfh,
                     COUNT(*) FILTER (WHERE a.action='Leave') AS leave
                     FROM employees u
-                    JOIN employee_master em
-                        ON em.emp_id = u.id
-                        AND (:hr_id = em.hr1_id OR :hr_id = em.hr2_id)
+                    JOIN reporting_lines rl
+                        ON rl.descendant_id = u.id
+                        AND rl.ancestor_id = :hr_id
+                        AND rl.relation = 'hr'
                     LEFT JOIN attendance a 
                         ON u.id = a.employee_id
                         AND a.date >= :month_start 
@@ -208,21 +208,13 @@ async def get_assigned_hr_employees_summary(
 
 @router.get("/attendance/mgr-assigned")
 async def get_assigned_mgr_employees_summary(
-    month: int = None,
+    month: int = Query(None, ge=1, le=12),
     year: int = None,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
     try:
-        if month and year:
-            month_start = date(year, month, 1)
-            if month == 12:
-                month_end = date(year + 1, 1, 1)
-            else:
-                month_end = date(year, month + 1, 1)
-        else:
-            month_start = date(1900, 1, 1)
-            month_end = datetime.now().date() + timedelta(days=1)
+        month_start, month_end = optional_month_range(year, month)
 
         query = text("""
                     SELECT 
@@ -233,9 +225,10 @@ async def get_assigned_mgr_employees_summary(
                     COUNT(*) FILTER (WHERE a.action='WFH') AS wfh,
                     COUNT(*) FILTER (WHERE a.action='Leave') AS leave
                     FROM employees u
-                    JOIN employee_master em
-                        ON em.emp_id = u.id
-                        AND (:mgr_id = em.manager1_id OR :mgr_id = em.manager2_id OR :mgr_id = em.manager3_id)
+                    JOIN reporting_lines rl
+                        ON rl.descendant_id = u.id
+                        AND rl.ancestor_id = :mgr_id
+                        AND rl.relation = 'manager'
                     LEFT JOIN attendance a 
                         ON u.id = a.employee_id
                         AND a.date >= :month_start 
@@ -1,8 +1,8 @@
-from models.onboarding_model import candidate,onboard_emp_doc
+from models.onboarding_model import candidate
 from fastapi import APIRouter, Depends, HTTPException,Request
 from schemas.onboarding_schema import UserCreate,AssignEmployeeRequest,DocumentCreate,DocumentResponse,UsercreateResponse,EmployeeOnboardingRequest,EmployeeOnboardingResponse
 from database import get_session
-from fastapi.responses import JSONResponse,StreamingResponse
+from fastapi.responses import JSONResponse
 from utils.email import send_login_email,send_onboarding_email,send_credentials_email
 from auth import get_current_user, create_access_token, verify_password, role_required, hash_password
 from sqlalchemy.sql import text
@@ -10,12 +10,12 @@ from sqlmodel import Session, select
 from models.user_model import User
 import logging
 import traceback
-import psycopg2
-import io
 import secrets
 import string
-import filetype
-from passlib.context import CryptContext
+from utils.document_store import (
+    EMPLOYEE_DOCS, ONBOARDING_DOCS,
+    blob_response, document_files, document_status, extension_for, save_uploaded_documents,
+)
 
 
 
@@ -40,11 +40,13 @@ async def create_employee(
     query = query.bindparams(name=user.name, email=user.email, role=user.role, type=user.type)
     temp_password = session.exec(query).scalar()
 
-    session.commit() 
-
     if not temp_password:
         raise HTTPException(status_code=500, detail="Failed to create employee")
 
+    # Queued with the new candidate; the outbox workers send it after commit
+    send_login_email(session, user.email, temp_password)
+    session.commit()
+
     new_user = session.exec(select(candidate).where(candidate.email == candidate.email)).first()
     if not new_user:
         raise HTTPException(status_code=500, detail="Failed to retrieve created employee")
@@ -59,8 +61,6 @@ async def create_employee(
     if not result:
         raise HTTPException(status_code=500, detail="Failed to retrieve created employee")
 
-    await send_login_email(user.email, temp_password)
-
     return UsercreateResponse(
         id=result.id,
         name=result.name,
@@ -146,62 +146,7 @@ async def upload_documents(
     session: Session = Depends(get_session)
 ):
     try:
-        # Parse the multipart form data
-        form_data = await request.form()
-        logger.info(f"Received form data keys: {list(form_data.keys())}")
-        
-        # Extract employeeId
-        employee_id = form_data.get("employeeId")
-        if not employee_id:
-            raise HTTPException(status_code=400, detail="employeeId is required")
-        
-        try:
-            employee_id = int(employee_id)
-        except ValueError:
-            raise HTTPException(status_code=400, detail="employeeId must be a valid integer")
-        
-        uploaded_files = {}
-        
-        with session.connection().connection.cursor() as cur:
-            # Iterate through all form fields
-            for field_name, field_value in form_data.items():
-                # Skip non-file fields
-                if field_name == "employeeId":
-                    continue
-                
-                logger.info(f"Processing field: {field_name}, type: {type(field_value)}")
-                
-                # Check if it's a file upload
-                if hasattr(field_value, 'read') and hasattr(field_value, 'filename'):
-                    if hasattr(field_value, 'size') and field_value.size > 0:
-                        logger.info(f"Uploading file: {field_value.filename} for field: {field_name}")
-                        file_data = await field_value.read()
-                        
-                        # Execute the stored procedure
-                        cur.execute(
-                            "SELECT upload_onboarding_docs(%s, %s, %s);",
-                            (employee_id, field_name, psycopg2.Binary(file_data))
-                        )
-                        result = cur.fetchone()
-                        logger.info(f"Database result for {field_name}: {result}")
-                        
-                        uploaded_files[field_name] = field_value.filename
-                    else:
-                        logger.warning(f"File {field_name} is empty or has no size attribute")
-        
-        # Only commit if we actually uploaded files
-        if uploaded_files:
-            session.commit()
-            logger.info(f"Successfully committed {len(uploaded_files)} files")
-        else:
-            logger.warning("No files were uploaded")
-        
-        return {
-            "message": f"Successfully uploaded {len(uploaded_files)} documents",
-            "uploaded_files": uploaded_files,
-            "employeeId": employee_id
-        }
-        
+        return await save_uploaded_documents(request, session, ONBOARDING_DOCS)
     except HTTPException:
         # Re-raise HTTP exceptions as-is
         raise
@@ -214,47 +159,20 @@ async def upload_documents(
 
 @router.get("/doc/{employee_id}")
 def list_documents(employee_id: int, session: Session = Depends(get_session)):
-    document = session.exec(
-        select(onboard_emp_doc).where(onboard_emp_doc.employee_id == employee_id)
-    ).first()
+    response = document_status(session, ONBOARDING_DOCS, employee_id)
 
-    if not document:
+    if response is None:
         raise HTTPException(status_code=404, detail="No documents found for this employee")
 
-    # List all document columns
-    doc_fields = [
-        "aadhar",
-        "pan",
-        "latest_graduation_certificate",
-        "updated_resume",
-        "offer_letter",
-        "latest_compensation_letter",
-        "experience_relieving_letter",
-        "latest_3_months_payslips",
-        "form16_or_12b_or_taxable_income",
-        "ssc_certificate",
-        "hsc_certificate",
-        "hsc_marksheet",
-        "graduation_marksheet",
-        "postgraduation_marksheet",
-        "postgraduation_certificate",
-        "passport",
-    ]
-
-    response = {field: True if getattr(document, field) else False for field in doc_fields}
-    response["employeeId"] = employee_id
-    response["uploaded_at"] = document.uploaded_at
-
     return response
 
 
 @router.get("/doc/{employee_id}/{doc_type}")
-def preview_document(employee_id: int, doc_type: str, session: Session = Depends(get_session)):
-    document = session.exec(
-        select(onboard_emp_doc).where(onboard_emp_doc.employee_id == employee_id)
-    ).first()
+def preview_document(employee_id: int, doc_type: str, request: Request, session: Session = Depends(get_session)):
+    files = document_files(session, ONBOARDING_DOCS, employee_id)
+    session.release()  # the file is streamed without a connection held
 
-    if not document:
+    if not files:
         raise HTTPException(status_code=404, detail="No documents found for this employee")
 
     valid_fields = {
@@ -279,32 +197,14 @@ def preview_document(employee_id: int, doc_type: str, session: Session = Depends
     if doc_type not in valid_fields:
         raise HTTPException(status_code=400, detail="Invalid document type")
 
-    file_data = getattr(document, doc_type)
-    if not file_data:
+    file = files.get(doc_type)
+    if not file:
         raise HTTPException(status_code=404, detail=f"{doc_type} not uploaded")
 
-    # Default values
-    mime_type = "application/octet-stream"
-    extension = "bin"
-
-    # Detect PDF manually
-    if file_data.startswith(b"%PDF"):
-        mime_type = "application/pdf"
-        extension = "pdf"
-    else:
-        # Use filetype to detect other file types (images, docs, etc.)
-        kind = filetype.guess(file_data)
-        if kind:
-            mime_type = kind.mime        # e.g. "image/png"
-            extension = kind.extension   # e.g. "png"
-
-    filename = f"{valid_fields[doc_type]}.{extension}"
-
-    return StreamingResponse(
-        io.BytesIO(file_data),
-        media_type=mime_type,
-        headers={"Content-Disposition": f"inline; filename={filename}"}
-    )
+    # Type was detected when the file was stored
+    filename = f"{valid_fields[doc_type]}.{file.extension or extension_for(file.mime_type)}"
+
+    return blob_response(request, file, filename)
 
 # Get employee details endpoint
 @router.get("/details/{employee_id}")
@@ -430,6 +330,20 @@ async def approve_employee(onboarding_id: int, session: Session = Depends(get_se
             cur.execute("SELECT currval(pg_get_serial_sequence('employees','id'))")
             new_emp_id = cur.fetchone()[0]
 
+            # Onboarding documents move with the employee; only metadata rows
+            # are copied, the blobs are shared by content address
+            cur.execute(
+                """
+                INSERT INTO document_files (source, employee_id, doc_type, sha256, size_bytes, mime_type,
+                                            extension, page_count, uploaded_at)
+                SELECT %s, %s, doc_type, sha256, size_bytes, mime_type, extension, page_count, uploaded_at
+                FROM document_files
+                WHERE source = %s AND employee_id = %s
+                ON CONFLICT (source, employee_id, doc_type) DO NOTHING
+                """,
+                (EMPLOYEE_DOCS, new_emp_id, ONBOARDING_DOCS, onboarding_id),
+            )
+
         session.commit()
         return {
             "status": "success",
@@ -445,6 +359,10 @@ async def approve_employee(onboarding_id: int, session: Session = Depends(get_se
 @router.post("/hr/assign")
 async def assign_employee(data: AssignEmployeeRequest, session: Session = Depends(get_session)):
     try:
+        # Hash before the first statement so no connection is held during bcrypt
+        temp_password = generate_temp_password()
+        hashed_password = await hash_password(temp_password)
+
         with session.connection().connection.cursor() as cur:
             cur.execute(
                 "CALL assign_employee(%s, %s, %s, %s, %s, %s)",
@@ -457,29 +375,28 @@ async def assign_employee(data: AssignEmployeeRequest, session: Session = Depend
                     [data.hr1_id, data.hr2_id],
                 )
             )
-        temp_password = generate_temp_password()
-        hashed_password = hash_password(temp_password)
+            # Keep the reporting-line closure in step with the new assignment
+            cur.execute("SELECT refresh_reporting_lines(%s)", ([data.employee_id],))
 
-        # Store hashed password in employees table
-        with session.connection().connection.cursor() as cur:
+            # Store hashed password in employees table
             cur.execute(
                 "UPDATE employees SET password_hash = %s WHERE id = %s",
                 (hashed_password, data.employee_id)
             )
-        
-        session.commit()
-        with session.connection().connection.cursor() as cur:
             cur.execute("SELECT name FROM locations WHERE id = %s", (data.location_id,))
             location_row = cur.fetchone()
         location_name = location_row[0] if location_row else "Not Assigned"
 
-        await send_credentials_email(
+        # Queued in the same transaction as the assignment; sent by the outbox workers
+        send_credentials_email(
+            session,
             to_email=data.to_email,
             company_email=data.company_email,
             temp_password=temp_password,  # send plain text
             location=location_name,
             doj=str(data.doj)
         )
+        session.commit()
         return {
             "status": "success",
             "message": f"Employee {data.employee_id} assigned and credentials emailed"
@@ -491,13 +408,7 @@ async def assign_employee(data: AssignEmployeeRequest, session: Session = Depend
         raise HTTPException(status_code=500, detail=f"Error assigning employee: {str(e)}")
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 def generate_temp_password(length: int = 10) -> str:
     alphabet = string.ascii_letters + string.digits + "!@#$%^&*"
     return ''.join(secrets.choice(alphabet) for _ in range(length))
 
-# Hash password
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
-
@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy import text
 from typing import List, Dict
 from dependencies import get_session
+from database import get_read_session
 from auth import get_current_user
 from models.user_model import User
 from schemas.projects_schema import ProjectCreate, ProjectRead
@@ -54,7 +55,7 @@ def create_project(
 # Get all projects (for HR/Manager/AM)
 @router.get("/get_projects", response_model=List[ProjectRead])
 def get_all_projects(
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
     # current_user: User = Depends(get_current_user)
 ):
     # Fetch all projects
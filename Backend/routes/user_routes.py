@@ -1,11 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlmodel import Session, select
 from models.user_model import User
 from models.onboarding_model import candidate
 from schemas.user_schema import ResetPasswordResponse,ResetOnboardingPasswordRequest,UseronboardingResponse,UserCreate,VerifyOtpRequest,ChangePasswordRequest,ApproveDocsRequest,UsercreateResponse,UserHrAccept,HrApproveRequest, UserResponse, UserLogin, EmployeeOnboardingRequest,EmployeeOnboardingResponse,ResetPasswordRequest,EmployeeOnboardingRequest, ForgotPasswordRequest,Employee,AssignRequest,AssignResponse
 from utils.email import send_login_email,send_onboarding_email,forgot_password_mail
 from auth import get_current_user, create_access_token, verify_password, role_required, hash_password
-from database import get_session
+from database import get_session, get_async_session, get_async_read_session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from datetime import datetime, timedelta
 from sqlalchemy.sql import text
 from models.employee_master_model import EmployeeMaster
@@ -13,12 +14,14 @@ from models.employee_details_model import EmployeeDetails, Location
 from models.employee_assignment_model import EmployeeHR, EmployeeManager
 from schemas.employee_master_schema import EmployeeMasterCreate, EmployeeMasterResponse
 import logging
-from utils.hash_utils import hash_password
 import random
 from typing import Union
 from fastapi.security import OAuth2PasswordRequestForm
-from utils.redis_client import redis_client
 from utils.session_utils import create_session, invalidate_session
+from utils.rate_limit import login_limiter, retry_after_header
+from utils.otp_store import (
+    issue_otp, verify_otp as check_otp, clear_otp, is_verified, consume_verified, restore_verified, OTP_OK, OTP_LOCKED,
+)
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
@@ -46,62 +49,76 @@ async def hr_accept(data: HrApproveRequest, session: Session = Depends(get_sessi
         message="Employee onboarding approved by HR"
     )
 
+LOGIN_PRINCIPAL_QUERY = text("""
+    SELECT kind, id, email, password_hash, role, name, o_status, login_status, location_id
+    FROM login_principals
+    WHERE email = :email
+    ORDER BY kind_rank
+    LIMIT 1
+""")
+
+
 @router.post("/login", response_model=Union[UserResponse, UseronboardingResponse])
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), session: Session = Depends(get_session)):
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), session: AsyncSession = Depends(get_async_session)):
     email = form_data.username.strip().lower()
     password = form_data.password.strip()
-    
-    # ✅ Case 1: Onboarded User
-    db_user = session.exec(select(User).where(User.company_email == email)).first()
-    if db_user:
-        if not verify_password(password, db_user.password_hash):
-            raise HTTPException(status_code=401, detail="Invalid credentials")
 
-        #session_id, expires_at = create_session(db_user.id, db_user.role, "user", session)
+    # Shed bursts before any lookup or bcrypt work
+    retry_after = await login_limiter.check(request.client.host if request.client else None, email)
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many login attempts, try again later",
+            headers=retry_after_header(retry_after),
+        )
 
+    # Employee or candidate, in one round trip (login_principals view, migration v007)
+    principal = (await session.execute(LOGIN_PRINCIPAL_QUERY, {"email": email})).first()
+    await session.release()  # no connection held during bcrypt
+    if principal is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    if not await verify_password(password, principal.password_hash):
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    # ✅ Case 1: Onboarded User
+    if principal.kind == "user":
         access_token = create_access_token(
-            data={"sub": db_user.company_email, "role": db_user.role},
+            data={"sub": principal.email, "role": principal.role},
             expires_delta=timedelta(minutes=60)
         )
 
         return UserResponse(
-            employeeId=db_user.id,
-            name=db_user.name,
-            role=db_user.role,
-            email=db_user.company_email,
+            employeeId=principal.id,
+            name=principal.name,
+            role=principal.role,
+            email=principal.email,
             access_token=access_token,
-            onboarding_status=db_user.o_status,
-            login_status=db_user.login_status,
-            type=db_user.role,
-            location_id=db_user.location_id,
-            message=f"Welcome, {db_user.name}!"
+            onboarding_status=principal.o_status,
+            login_status=principal.login_status,
+            type=principal.role,
+            location_id=principal.location_id,
+            message=f"Welcome, {principal.name}!"
         )
 
     # ✅ Case 2: Candidate
-    onboarding_user = session.exec(select(candidate).where(candidate.email == email)).first()
-    if onboarding_user:
-        if not verify_password(password, onboarding_user.password):
-            raise HTTPException(status_code=401, detail="Invalid credentials")
-
-        session_id, expires_at = create_session(onboarding_user.id, onboarding_user.role, "candidate", session)
-
-        access_token = create_access_token(
-            data={"sub": onboarding_user.email, "session_id": session_id, "role": onboarding_user.role},
-            expires_delta=timedelta(minutes=60)
-        )
+    # Session goes to the session store; the `sessions` row is written behind
+    session_id, expires_at = await create_session(principal.id, principal.role, "candidate")
 
-        return UseronboardingResponse(
-            employeeId=onboarding_user.id,
-            name=onboarding_user.name,
-            email=onboarding_user.email,
-            onboarding_status=onboarding_user.o_status,
-            login_status=onboarding_user.login_status,
-            role=onboarding_user.role,
-            access_token=access_token,
-            type=onboarding_user.role,
-        )
+    access_token = create_access_token(
+        data={"sub": principal.email, "session_id": session_id, "role": principal.role},
+        expires_delta=timedelta(minutes=60)
+    )
 
-    raise HTTPException(status_code=404, detail="User not found")
+    return UseronboardingResponse(
+        employeeId=principal.id,
+        name=principal.name,
+        email=principal.email,
+        onboarding_status=principal.o_status,
+        login_status=principal.login_status,
+        role=principal.role,
+        access_token=access_token,
+        type=principal.role,
+    )
 
 @router.post("/reset-onboarding-password")
 async def reset_onboarding_password(
@@ -111,9 +128,10 @@ async def reset_onboarding_password(
     onboarding_user = session.get(candidate, req.employee_id)
     if not onboarding_user:
         raise HTTPException(status_code=404, detail="Onboarding employee not found")
+    session.release()
 
     # Hash password
-    hashed_pwd = hash_password(req.new_password)
+    hashed_pwd = await hash_password(req.new_password)
 
     onboarding_user.password = hashed_pwd
     onboarding_user.login_status = True
@@ -125,114 +143,96 @@ async def reset_onboarding_password(
 # Reset Password
 # ----------------------------
 
-from utils.hash_utils import hash_password  # make sure you use hashing (bcrypt, passlib)
 @router.post("/verify-otp")
-async def verify_otp(req: VerifyOtpRequest, session: Session = Depends(get_session)):
+async def verify_otp(req: VerifyOtpRequest):
     """
     Verify the OTP sent to the user's email
     """
-    try:
-        employee = session.exec(
-            select(User).where(User.email == req.email.lower())
-        ).first()
-
-        if not employee:
-            raise HTTPException(status_code=404, detail="Email not found")
-
-        if employee.reset_otp != req.otp:
-            raise HTTPException(status_code=400, detail="Invalid OTP")
+    result = await check_otp(req.email.lower(), req.otp)
+    if result == OTP_LOCKED:
+        raise HTTPException(status_code=429, detail="Too many attempts, request a new OTP")
+    if result != OTP_OK:
+        raise HTTPException(status_code=400, detail="Invalid or expired OTP")
 
-       
-
-        # Mark as verified (you can also store a flag in DB like otp_verified=True)
-        return {"status": "success", "message": "OTP verified successfully"}
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return {"status": "success", "message": "OTP verified successfully"}
 
 @router.post("/change-password")
 async def change_password(req: ChangePasswordRequest, session: Session = Depends(get_session)):
     """
     Change password after OTP verification
     """
-    try:
-        employee = session.exec(
-            select(User).where(User.email == req.email.lower())
-        ).first()
-
-        if not employee:
-            raise HTTPException(status_code=404, detail="Email not found")
+    email = req.email.lower()
+    employee = session.exec(select(User).where(User.email == email)).first()
+    if not employee:
+        raise HTTPException(status_code=404, detail="Email not found")
+    session.release()
 
-        # Optional: you can require otp_verified flag here if you set it in verify_otp
-        employee.password_hash = hash_password(req.new_password)
-        employee.reset_otp = None
-        employee.reset_otp_expires_at = None
+    # Checked before hashing so unverified requests don't cost a hash
+    if not await is_verified(email):
+        raise HTTPException(status_code=403, detail="Verify the OTP before changing the password")
+    password_hash = await hash_password(req.new_password)
 
+    # One password change per verified OTP: the flag is used up together with
+    # the update, and handed back if the update doesn't commit
+    if not await consume_verified(email):
+        raise HTTPException(status_code=403, detail="Verify the OTP before changing the password")
+    try:
+        employee.password_hash = password_hash
         session.add(employee)
         session.commit()
-        session.refresh(employee)
-
-        return {"status": "success", "message": "Password updated successfully"}
-
     except Exception as e:
         session.rollback()
+        await restore_verified(email)
         raise HTTPException(status_code=500, detail=str(e))
 
+    await clear_otp(email)
+    return {"status": "success", "message": "Password updated successfully"}
 
-@router.post("/forgot-password")
-async def forgot_password(req: ForgotPasswordRequest, session: Session = Depends(get_session)):
-    try:
-        employee = session.exec(select(User).where(User.email == req.email.lower())).first()
-        if not employee:
-            raise HTTPException(status_code=404, detail="Email not found")
 
-        # Generate OTP
-        otp = str(random.randint(100000, 999999))
-        employee.reset_otp = otp
-         # expires in 10 min
-
-        session.add(employee)
-        session.commit()
-        session.refresh(employee)
+@router.post("/forgot-password")
+async def forgot_password(req: ForgotPasswordRequest, session: AsyncSession = Depends(get_async_session)):
+    email = req.email.lower()
+    employee_id = (await session.exec(select(User.id).where(User.email == email))).first()
+    await session.release()
+    if employee_id is None:
+        raise HTTPException(status_code=404, detail="Email not found")
 
-        # Send OTP via email
-        email_sent = await forgot_password_mail(req.email, f"Your OTP is {otp}")
-        if not email_sent:
-            raise HTTPException(status_code=500, detail="Failed to send email")
+    # OTP lives in Redis with its own TTL and attempt counter; no employees row write
+    otp = await issue_otp(email)
 
-        return {"status": "success", "message": f"OTP sent to {req.email}"}
+    # Only queued here; the email_outbox workers send it
+    forgot_password_mail(session, req.email, f"Your OTP is {otp}")
+    await session.commit()
 
-    except Exception as e:
-        session.rollback()
-        raise HTTPException(status_code=500, detail=str(e))
+    return {"status": "success", "message": f"OTP sent to {req.email}"}
     
 @router.post("/reset-password", response_model=ResetPasswordResponse)
-def change_password(req: ResetPasswordRequest, session: Session = Depends(get_session)):
-    employee = session.exec(
+async def change_password(req: ResetPasswordRequest, session: AsyncSession = Depends(get_async_session)):
+    employee = (await session.exec(
         select(User).where(User.company_email == req.email.lower())
-    ).first()
+    )).first()
 
     if not employee:
         raise HTTPException(status_code=404, detail="Email not found")
+    await session.release()
 
     # Verify old password
-    if not verify_password(req.currentPassword, employee.password_hash):
+    if not await verify_password(req.currentPassword, employee.password_hash):
         raise HTTPException(status_code=400, detail="Invalid old password")
 
     # Update password
-    employee.password_hash = hash_password(req.new_password)
+    employee.password_hash = await hash_password(req.new_password)
     employee.login_status = True  # Set login status to true after password change
     session.add(employee)
-    session.commit()
-    session.refresh(employee)
+    await session.commit()
 
     return {"status": "success", "message": "Password changed successfully"}
 
 
 @router.get("/managers")
-async def display_managers(session: Session = Depends(get_session)):
+async def display_managers(session: AsyncSession = Depends(get_async_session)):
     statement = select(User.id, User.name).where(User.role == "Manager")
-    managers = session.exec(statement).all()
+    managers = (await session.exec(statement)).all()
     manager_list = [{"id": m[0], "name": m[1]} for m in managers]
     return {"managers": manager_list}
 
@@ -240,9 +240,9 @@ async def display_managers(session: Session = Depends(get_session)):
 # Get all HRs
 # ----------------------------
 @router.get("/hrs")
-async def display_hrs(session: Session = Depends(get_session)):
+async def display_hrs(session: AsyncSession = Depends(get_async_session)):
     statement = select(User.id, User.name).where(User.role == "HR")
-    hrs = session.exec(statement).all()
+    hrs = (await session.exec(statement)).all()
     hr_list = [{"id": h[0], "name": h[1]} for h in hrs]
     return {"HRs": hr_list}
 
@@ -250,7 +250,7 @@ async def display_hrs(session: Session = Depends(get_session)):
 # Get all employees with their assigned HRs and Managers
 # ----------------------------
 @router.get("/employees")
-async def display_employees(session: Session = Depends(get_session)):
+async def display_employees(session: AsyncSession = Depends(get_async_read_session)):
     query = text("""
         SELECT
             e.id AS employeeId,
@@ -271,7 +271,7 @@ async def display_employees(session: Session = Depends(get_session)):
         ORDER BY e.name;
     """)
 
-    result = session.execute(query).all()
+    result = (await session.execute(query)).all()
     employees = []
     for row in result:
         employees.append({
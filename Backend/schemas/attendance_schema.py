@@ -40,3 +40,34 @@ class AttendanceResponse(SQLModel):
     projects: List[str] = []
     subTasks: List[dict] = []
 
+
+
+# Attendance read rows: one per (employee, date), projects/subtasks aggregated in SQL
+class ProjectOption(SQLModel):
+    label: str
+    value: str
+
+class SubTaskEntry(SQLModel):
+    project: Optional[str]
+    subTask: str
+
+class WeeklyAttendanceEntry(SQLModel):
+    action: Optional[str]
+    hours: Optional[int]
+    status: Optional[str]
+    projects: List[ProjectOption] = []
+    subTasks: List[SubTaskEntry] = []
+
+class DailyAttendanceRow(SQLModel):
+    employee_id: int
+    name: Optional[str]
+    email: Optional[str]
+    date: date
+    day: str
+    status: Optional[str]
+    hours: Optional[int]
+    projects: List[ProjectOption] = []
+    subTasks: List[SubTaskEntry] = []
+
+class HrDailyAttendanceRow(DailyAttendanceRow):
+    type: str
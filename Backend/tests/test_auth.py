@@ -0,0 +1,73 @@
+from datetime import timedelta
+from types import SimpleNamespace
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from auth import create_access_token
+from database import get_async_session
+from routes import internal_routes
+from utils.session_cache import session_cache
+
+EMPLOYEES = {
+    "hr@example.com": SimpleNamespace(id=1, role="HR"),
+    "dev@example.com": SimpleNamespace(id=2, role="Employee"),
+}
+
+
+class FakeSession:
+    """Answers the employee lookup of session-less tokens."""
+
+    async def execute(self, query, params=None):
+        return SimpleNamespace(first=lambda: EMPLOYEES.get(params["email"]))
+
+
+@pytest.fixture
+def client():
+    async def fake_session():
+        yield FakeSession()
+
+    app = FastAPI()
+    app.include_router(internal_routes.router)
+    app.dependency_overrides[get_async_session] = fake_session
+    session_cache.clear()
+    return TestClient(app)
+
+
+def employee_token(email: str, role: str) -> str:
+    # What /users/login issues to an employee: no session_id claim
+    return create_access_token({"sub": email, "role": role}, timedelta(minutes=5))
+
+
+def test_hr_token_reaches_internal_routes(client):
+    response = client.get(
+        "/internal/login-limiter", headers={"Authorization": f"Bearer {employee_token('hr@example.com', 'HR')}"}
+    )
+    assert response.status_code == 200
+
+
+def test_bare_token_is_accepted(client):
+    response = client.get("/internal/login-limiter", headers={"Authorization": employee_token("hr@example.com", "HR")})
+    assert response.status_code == 200
+
+
+def test_non_hr_token_is_forbidden(client):
+    response = client.get(
+        "/internal/login-limiter",
+        headers={"Authorization": f"Bearer {employee_token('dev@example.com', 'Employee')}"},
+    )
+    assert response.status_code == 403
+
+
+def test_role_claim_must_match_the_employee(client):
+    response = client.get(
+        "/internal/login-limiter", headers={"Authorization": f"Bearer {employee_token('dev@example.com', 'HR')}"}
+    )
+    assert response.status_code == 401
+
+
+def test_unknown_employee_and_missing_token_are_unauthorized(client):
+    response = client.get(
+        "/internal/login-limiter", headers={"Authorization": f"Bearer {employee_token('gone@example.com', 'HR')}"}
+    )
+    assert response.status_code == 401
+    assert client.get("/internal/login-limiter").status_code == 401
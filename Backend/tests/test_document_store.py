@@ -0,0 +1,141 @@
+import asyncio
+import functools
+import hashlib
+import os
+import time
+from types import SimpleNamespace
+import pytest
+import database
+from utils import document_maintenance
+from utils.document_store import BlobStore, PdfPageCounter
+
+
+def make_pdf(pages: int, update: bytes = b"") -> bytes:
+    kids = b" ".join(b"%d 0 R" % (3 + i) for i in range(pages))
+    objects = [
+        b"1 0 obj\n<< /Type /Catalog /Pages 2 0 R >>\nendobj\n",
+        b"2 0 obj\n<< /Type /Pages /Kids [%s] /Count %d >>\nendobj\n" % (kids, pages),
+    ]
+    objects += [
+        b"%d 0 obj\n<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] >>\nendobj\n" % (3 + i)
+        for i in range(pages)
+    ]
+    return b"%PDF-1.7\n" + b"".join(objects) + b"trailer\n<< /Root 1 0 R >>\n%%EOF\n" + update
+
+
+# Incremental update rewriting two existing pages, as a viewer does when rotating them
+ROTATED = (
+    b"3 0 obj\n<< /Type /Page /Parent 2 0 R /Rotate 90 >>\nendobj\n"
+    b"4 0 obj\n<< /Type /Page /Parent 2 0 R /Rotate 90 >>\nendobj\n"
+    b"trailer\n<< /Root 1 0 R /Prev 9 >>\n%%EOF\n"
+)
+
+
+def count_pages(data: bytes, chunk_size: int):
+    counter = PdfPageCounter()
+    for i in range(0, len(data), chunk_size):
+        counter.feed(data[i:i + chunk_size])
+    return counter.count()
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 8, 13, 63, 64, 65, 1000, 1 << 20])
+def test_page_count_across_chunk_boundaries(chunk_size):
+    assert count_pages(make_pdf(12), chunk_size) == 12
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 20])
+def test_incremental_update_does_not_recount_pages(chunk_size):
+    assert count_pages(make_pdf(12, ROTATED), chunk_size) == 12
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 20])
+def test_distinct_page_objects_without_root_count(chunk_size):
+    data = make_pdf(12, ROTATED).replace(b" /Count 12", b"")
+    assert count_pages(data, chunk_size) == 12
+
+
+def test_pages_is_not_a_page():
+    data = b"1 0 obj\n<< /Type /Pages /Kids [] >>\nendobj\n"
+    assert count_pages(data, 4) is None
+
+
+def test_no_pages_is_none():
+    assert count_pages(b"%PDF-1.5\n% everything in object streams\n", 16) is None
+    assert count_pages(b"", 16) is None
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BlobStore(str(tmp_path))
+
+
+def test_put_is_content_addressed(store):
+    blob = store.put(make_pdf(3))
+    assert blob["sha256"] == hashlib.sha256(make_pdf(3)).hexdigest()
+    assert blob["mime_type"] == "application/pdf"
+    assert blob["extension"] == "pdf"
+    assert blob["page_count"] == 3
+    with open(store.path(blob["sha256"]), "rb") as f:
+        assert f.read() == make_pdf(3)
+    assert store.put(make_pdf(3)) == blob
+    assert os.listdir(store.tmp_dir) == []
+
+
+def test_sweep_removes_only_old_unreferenced_blobs(store):
+    kept = store.put(b"kept")["sha256"]
+    orphan = store.put(b"orphan")["sha256"]
+    fresh_orphan = store.put(b"fresh")["sha256"]
+    old = time.time() - 3600
+    for sha256 in (kept, orphan):
+        os.utime(store.path(sha256), (old, old))
+
+    assert store.sweep({kept}, min_age=60) == 1
+    assert store.exists(kept)
+    assert not store.exists(orphan)
+    assert store.exists(fresh_orphan)
+
+
+def test_reused_blob_is_touched_against_the_sweep(store):
+    sha256 = store.put(b"shared")["sha256"]
+    old = time.time() - 3600
+    os.utime(store.path(sha256), (old, old))
+    store.put(b"shared")
+    assert store.sweep(set(), min_age=60) == 0
+
+
+class FakeSession:
+    """Async session answering REFERENCED_BLOBS_QUERY with `referenced`."""
+
+    def __init__(self, referenced):
+        self.referenced = referenced
+
+    async def execute(self, query):
+        return SimpleNamespace(scalars=lambda: iter(self.referenced))
+
+    async def release(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+
+def test_periodic_sweep_removes_orphans(store, monkeypatch):
+    kept = store.put(b"kept")["sha256"]
+    orphan = store.put(b"orphan")["sha256"]
+    monkeypatch.setattr(document_maintenance, "blob_store", store)
+    monkeypatch.setattr(document_maintenance, "DOCUMENT_SWEEP_INTERVAL", 0.01)
+    monkeypatch.setattr(document_maintenance, "sweep_orphan_blobs",
+                        functools.partial(document_maintenance.sweep_orphan_blobs, min_age=0))
+    monkeypatch.setattr(database, "async_session_maker", lambda: FakeSession([kept]))
+
+    async def run():
+        document_maintenance.start_document_sweeper()
+        await asyncio.sleep(0.2)
+        await document_maintenance.stop_document_sweeper()
+
+    asyncio.run(run())
+    assert store.exists(kept)
+    assert not store.exists(orphan)
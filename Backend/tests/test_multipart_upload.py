@@ -0,0 +1,191 @@
+import asyncio
+import hashlib
+import os
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+from utils import multipart_upload
+from utils.document_store import EMPLOYEE_DOCS, ONBOARDING_DOCS, blob_store, parse_employee_id, save_uploaded_documents
+from utils.multipart_upload import receive_upload
+
+BOUNDARY = "----test-boundary"
+PDF = b"%PDF-1.4\n1 0 obj\n<< /Type /Page >>\nendobj\n%%EOF\n"
+
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(blob_store, "root", str(tmp_path))
+    monkeypatch.setattr(blob_store, "tmp_dir", str(tmp_path / "tmp"))
+    return blob_store
+
+
+def stored_files(store):
+    return sorted(name for _, _, names in os.walk(store.root) for name in names)
+
+
+def multipart(*parts, close=True) -> bytes:
+    body = b""
+    for name, filename, data in parts:
+        disposition = f'form-data; name="{name}"'
+        if filename is not None:
+            disposition += f'; filename="{filename}"'
+        body += f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n\r\n".encode() + data + b"\r\n"
+    return body + (f"--{BOUNDARY}--\r\n".encode() if close else b"")
+
+
+def make_request(body: bytes, chunk_size: int = 65536, content_type=None, content_length=True) -> Request:
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)] or [b""]
+    headers = [(b"content-type", (content_type or f"multipart/form-data; boundary={BOUNDARY}").encode())]
+    if content_length:
+        headers.append((b"content-length", str(len(body)).encode()))
+
+    async def receive():
+        if chunks:
+            return {"type": "http.request", "body": chunks.pop(0), "more_body": bool(chunks)}
+        return {"type": "http.disconnect"}
+
+    return Request({"type": "http", "method": "POST", "path": "/upload", "headers": headers}, receive)
+
+
+def upload(body: bytes, **kwargs):
+    before_files = kwargs.pop("before_files", None)
+    return asyncio.run(receive_upload(make_request(body, **kwargs), ["aadhar", "pan"], before_files=before_files))
+
+
+def status_of(body: bytes, **kwargs) -> int:
+    with pytest.raises(HTTPException) as error:
+        upload(body, **kwargs)
+    return error.value.status_code
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 4096])
+def test_fields_and_files(store, chunk_size):
+    resume = os.urandom(5000)
+    fields, files = upload(
+        multipart(("employeeId", None, b"42"), ("aadhar", "a.pdf", PDF), ("pan", "p.bin", resume)),
+        chunk_size=chunk_size,
+    )
+    assert fields == {"employeeId": "42"}
+    assert set(files) == {"aadhar", "pan"}
+    filename, blob = files["aadhar"]
+    assert filename == "a.pdf"
+    assert blob["sha256"] == hashlib.sha256(PDF).hexdigest()
+    assert (blob["size_bytes"], blob["mime_type"], blob["page_count"]) == (len(PDF), "application/pdf", 1)
+    assert files["pan"][1]["sha256"] == hashlib.sha256(resume).hexdigest()
+    with open(store.path(files["pan"][1]["sha256"]), "rb") as f:
+        assert f.read() == resume
+    assert os.listdir(store.tmp_dir) == []
+
+
+def test_empty_file_part_is_skipped(store):
+    fields, files = upload(multipart(("employeeId", None, b"1"), ("pan", "", b"")))
+    assert files == {}
+    assert stored_files(store) == []
+
+
+def test_not_multipart_is_400():
+    assert status_of(b"{}", content_type="application/json") == 400
+    assert status_of(b"", content_type="multipart/form-data") == 400  # no boundary
+
+
+def test_unknown_file_field_is_400_and_stores_nothing(store):
+    assert status_of(multipart(("aadhar", "a.pdf", PDF), ("salary", "s.pdf", PDF))) == 400
+    # The file before the rejected one was finished; nothing is half-written
+    assert stored_files(store) == [hashlib.sha256(PDF).hexdigest()]
+
+
+def test_duplicate_file_field_is_400_before_storing_it(store):
+    second = os.urandom(5000)
+    assert status_of(multipart(("aadhar", "a.pdf", PDF), ("aadhar", "b.bin", second)), chunk_size=256) == 400
+    assert stored_files(store) == [hashlib.sha256(PDF).hexdigest()]
+
+
+def test_empty_duplicate_is_skipped_like_any_empty_part(store):
+    fields, files = upload(multipart(("aadhar", "a.pdf", PDF), ("aadhar", "", b"")))
+    assert files["aadhar"][0] == "a.pdf"
+
+
+def test_truncated_body_is_400(store):
+    body = multipart(("aadhar", "a.pdf", PDF * 100), close=False)[:-50]
+    assert status_of(body, chunk_size=64) == 400
+    assert stored_files(store) == []
+
+
+def test_malformed_body_is_400(store):
+    assert status_of(b"garbage that is not multipart\r\n" * 10) == 400
+    assert stored_files(store) == []
+
+
+def test_file_over_limit_is_413_and_temp_file_removed(store, monkeypatch):
+    monkeypatch.setattr(multipart_upload, "UPLOAD_MAX_FILE_BYTES", 1000)
+    assert status_of(multipart(("aadhar", "a.pdf", os.urandom(5000))), chunk_size=256) == 413
+    assert stored_files(store) == []
+
+
+def test_declared_length_over_limit_is_413_before_reading(store, monkeypatch):
+    monkeypatch.setattr(multipart_upload, "UPLOAD_MAX_REQUEST_BYTES", 1000)
+    assert status_of(multipart(("aadhar", "a.pdf", os.urandom(5000)))) == 413
+    assert stored_files(store) == []
+
+
+def test_streamed_length_over_limit_is_413(store, monkeypatch):
+    # Chunked bodies have no Content-Length; the running total is checked instead
+    monkeypatch.setattr(multipart_upload, "UPLOAD_MAX_REQUEST_BYTES", 1000)
+    body = multipart(("aadhar", "a.pdf", os.urandom(5000)))
+    assert status_of(body, chunk_size=256, content_length=False) == 413
+    assert stored_files(store) == []
+
+
+def test_field_over_limit_is_413(monkeypatch):
+    monkeypatch.setattr(multipart_upload, "UPLOAD_MAX_FIELD_BYTES", 10)
+    assert status_of(multipart(("employeeId", None, b"1" * 11))) == 413
+
+
+@pytest.mark.parametrize("employee_id", [None, b"abc"])
+def test_invalid_employee_id_stores_nothing(store, employee_id):
+    parts = [("aadhar", "a.pdf", PDF)]
+    if employee_id is not None:
+        parts.insert(0, ("employeeId", None, employee_id))
+    assert status_of(multipart(*parts), before_files=parse_employee_id) == 400
+    assert stored_files(store) == []
+
+
+def test_before_files_only_sees_fields_ahead_of_the_files(store):
+    # employeeId arrives in the same chunk, but after the file
+    body = multipart(("aadhar", "a.pdf", PDF), ("employeeId", None, b"7"))
+    assert status_of(body, before_files=parse_employee_id) == 400
+    assert stored_files(store) == []
+
+
+class FakeSession:
+    def __init__(self):
+        self.executed = []
+        self.commits = 0
+
+    def execute(self, statement, params):
+        self.executed.append(params)
+
+    def commit(self):
+        self.commits += 1
+
+
+@pytest.mark.parametrize("source", [EMPLOYEE_DOCS, ONBOARDING_DOCS])
+def test_save_uploaded_documents_upserts_one_row_per_file(store, source):
+    session = FakeSession()
+    body = multipart(("employeeId", None, b"42"), ("aadhar", "a.pdf", PDF), ("pan", "", b""))
+    response = asyncio.run(save_uploaded_documents(make_request(body), session, source))
+    assert response["employeeId"] == 42
+    assert response["uploaded_files"] == {"aadhar": "a.pdf"}
+    [rows] = session.executed
+    assert [(row["source"], row["employee_id"], row["doc_type"], row["sha256"]) for row in rows] == [
+        (source, 42, "aadhar", hashlib.sha256(PDF).hexdigest())
+    ]
+    assert session.commits == 1
+
+
+def test_save_uploaded_documents_without_files_writes_nothing(store):
+    session = FakeSession()
+    body = multipart(("employeeId", None, b"42"))
+    response = asyncio.run(save_uploaded_documents(make_request(body), session, EMPLOYEE_DOCS))
+    assert response["uploaded_files"] == {}
+    assert session.executed == [] and session.commits == 0
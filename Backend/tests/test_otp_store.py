@@ -0,0 +1,146 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+pytest.importorskip("fakeredis")
+
+from database import get_session  # noqa: E402
+from utils import otp_store, redis_client  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def memory_redis(monkeypatch):
+    monkeypatch.setattr(redis_client, "REDIS_URL", "memory://")
+    monkeypatch.setattr(redis_client, "_client", None)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_correct_otp_verifies_once():
+    otp = run(otp_store.issue_otp("a@example.com"))
+    assert run(otp_store.verify_otp("a@example.com", otp)) == otp_store.OTP_OK
+    # Used up by the successful verify
+    assert run(otp_store.verify_otp("a@example.com", otp)) == otp_store.OTP_EXPIRED
+
+
+def test_attempts_are_exhausted(monkeypatch):
+    monkeypatch.setattr(otp_store, "OTP_MAX_ATTEMPTS", 3)
+    otp = run(otp_store.issue_otp("b@example.com"))
+    wrong = "000000" if otp != "000000" else "111111"
+    results = [run(otp_store.verify_otp("b@example.com", wrong)) for _ in range(3)]
+    assert results == [otp_store.OTP_INVALID] * 3
+    # The attempt after the last allowed one discards the OTP, even if correct
+    assert run(otp_store.verify_otp("b@example.com", otp)) == otp_store.OTP_LOCKED
+    assert run(otp_store.verify_otp("b@example.com", otp)) == otp_store.OTP_EXPIRED
+
+
+def test_reissue_resets_attempts(monkeypatch):
+    monkeypatch.setattr(otp_store, "OTP_MAX_ATTEMPTS", 1)
+    run(otp_store.issue_otp("c@example.com"))
+    run(otp_store.verify_otp("c@example.com", "bad"))
+    otp = run(otp_store.issue_otp("c@example.com"))
+    assert run(otp_store.verify_otp("c@example.com", otp)) == otp_store.OTP_OK
+
+
+def test_unknown_email_is_expired_and_not_left_without_ttl():
+    assert run(otp_store.verify_otp("nobody@example.com", "123456")) == otp_store.OTP_EXPIRED
+    ttl = run(redis_client.get_redis().ttl("otp:nobody@example.com"))
+    assert 0 < ttl <= otp_store.OTP_TTL_SECONDS
+
+
+def test_verified_flag_is_consumed_once():
+    otp = run(otp_store.issue_otp("d@example.com"))
+    assert run(otp_store.consume_verified("d@example.com")) is False
+    run(otp_store.verify_otp("d@example.com", otp))
+    assert run(otp_store.consume_verified("d@example.com")) is True
+    assert run(otp_store.consume_verified("d@example.com")) is False
+
+
+def test_restored_flag_verifies_again():
+    otp = run(otp_store.issue_otp("e@example.com"))
+    run(otp_store.verify_otp("e@example.com", otp))
+    assert run(otp_store.consume_verified("e@example.com")) is True
+    assert run(otp_store.is_verified("e@example.com")) is False
+    run(otp_store.restore_verified("e@example.com"))
+    assert run(otp_store.is_verified("e@example.com")) is True
+
+
+class FakeSession:
+    """The sync session change_password uses: one employee lookup, then a commit."""
+
+    def __init__(self, employee, fail_commit=False):
+        self.employee = employee
+        self.fail_commit = fail_commit
+        self.committed = False
+
+    def exec(self, query):
+        return SimpleNamespace(first=lambda: self.employee)
+
+    def release(self):
+        pass
+
+    def add(self, obj):
+        pass
+
+    def commit(self):
+        if self.fail_commit:
+            raise RuntimeError("database is down")
+        self.committed = True
+
+    def rollback(self):
+        pass
+
+
+@pytest.fixture
+def change_password(monkeypatch):
+    from routes import user_routes
+
+    async def fast_hash(password):
+        return f"hashed:{password}"
+
+    monkeypatch.setattr(user_routes, "hash_password", fast_hash)
+
+    def call(session, email="f@example.com"):
+        app = FastAPI()
+        app.include_router(user_routes.router)
+        app.dependency_overrides[get_session] = lambda: session
+        with TestClient(app) as client:
+            return client.post("/users/change-password", json={"email": email, "new_password": "n3w-Secret!"})
+
+    return call
+
+
+def verified(email="f@example.com"):
+    otp = run(otp_store.issue_otp(email))
+    run(otp_store.verify_otp(email, otp))
+
+
+def test_change_password_needs_a_verified_otp(change_password):
+    session = FakeSession(SimpleNamespace(password_hash="old"))
+    assert change_password(session).status_code == 403
+    assert not session.committed
+
+
+def test_unknown_email_keeps_the_verified_flag(change_password):
+    verified()
+    assert change_password(FakeSession(None)).status_code == 404
+    assert run(otp_store.is_verified("f@example.com")) is True
+
+
+def test_change_password_uses_up_the_flag(change_password):
+    verified()
+    employee = SimpleNamespace(password_hash="old")
+    session = FakeSession(employee)
+    assert change_password(session).status_code == 200
+    assert session.committed and employee.password_hash == "hashed:n3w-Secret!"
+    assert change_password(FakeSession(employee)).status_code == 403
+
+
+def test_failed_update_hands_the_flag_back(change_password):
+    verified()
+    assert change_password(FakeSession(SimpleNamespace(password_hash="old"), fail_commit=True)).status_code == 500
+    assert run(otp_store.is_verified("f@example.com")) is True
@@ -0,0 +1,54 @@
+import asyncio
+import pytest
+from utils.rate_limit import LoginRateLimiter, MemoryBuckets
+
+
+def test_burst_then_empty():
+    buckets = MemoryBuckets(100)
+    limit = [("acct", 3, 1.0)]
+    assert [buckets.take(0.0, limit)[0] for _ in range(3)] == [0, 0, 0]
+    index, wait = buckets.take(0.0, limit)
+    assert index == 1
+    assert wait == pytest.approx(1.0)
+
+
+def test_refills_at_rate_up_to_capacity():
+    buckets = MemoryBuckets(100)
+    limit = [("acct", 2, 0.5)]  # one token every 2 seconds
+    buckets.take(0.0, limit)
+    buckets.take(0.0, limit)
+    assert buckets.take(1.0, limit) == (1, pytest.approx(1.0))
+    assert buckets.take(2.0, limit)[0] == 0
+    # A long idle period refills to capacity, not beyond
+    assert [buckets.take(100.0, limit)[0] for _ in range(3)] == [0, 0, 1]
+
+
+def test_rejected_request_takes_no_token_from_other_buckets():
+    buckets = MemoryBuckets(100)
+    account = ("acct", 1, 0.01)
+    ip = ("ip", 2, 0.01)
+    assert buckets.take(0.0, [account, ip])[0] == 0
+    assert buckets.take(0.0, [account, ip])[0] == 1
+    # The IP still has the token the rejected attempt didn't take
+    assert buckets.take(0.0, [ip])[0] == 0
+    assert buckets.take(0.0, [ip])[0] == 1
+
+
+def test_limiter_skips_redis_while_it_is_down():
+    limiter = LoginRateLimiter()
+    limiter.enabled = True
+    limiter.redis_retry_seconds = 60
+    calls = []
+
+    async def redis_down(now, buckets):
+        calls.append(now)
+        raise ConnectionError("down")
+
+    limiter._take_redis = redis_down
+
+    async def attempts():
+        return [await limiter.check("10.0.0.1", f"user{i}@example.com") for i in range(5)]
+
+    assert asyncio.run(attempts()) == [None] * 5
+    assert len(calls) == 1
+    assert limiter.stats()["redis_fallbacks"] == 5
@@ -0,0 +1,32 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from utils.sql_telemetry import install_sql_telemetry, start_request
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    install_sql_telemetry(engine)
+    return engine
+
+
+def test_counts_statements_and_shapes(engine):
+    stats = start_request()
+    with engine.connect() as conn:
+        for i in range(3):
+            conn.execute(text(f"SELECT {i}"))
+    assert stats.count == 3
+    assert stats.shapes == {"SELECT ?": 3}
+    assert stats.total_time > 0
+
+
+def test_failed_statement_leaves_no_state_on_the_connection(engine):
+    stats = start_request()
+    with engine.connect() as conn:
+        with pytest.raises(OperationalError):
+            conn.execute(text("SELECT * FROM missing_table"))
+        conn.execute(text("SELECT 1"))
+        assert not any("start" in str(key) for key in conn.info)
+    assert stats.count == 1
+    assert stats.repeated_shapes(threshold=0) == [("SELECT ?", 1)]
@@ -0,0 +1,70 @@
+import logging
+from datetime import date
+from sqlalchemy import text
+from utils.date_ranges import month_range, month_starts
+
+logger = logging.getLogger(__name__)
+
+# Future months kept pre-created so inserts never land in the default partition
+PARTITION_MONTHS_AHEAD = 12
+
+
+def partition_name(month_start: date) -> str:
+    return f"attendance_y{month_start.year}m{month_start.month:02d}"
+
+
+def attendance_is_partitioned(conn) -> bool:
+    return conn.execute(text(
+        "SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass('attendance')"
+    )).scalar() or False
+
+
+def _existing_partitions(conn) -> set:
+    rows = conn.execute(text("""
+        SELECT c.relname
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'attendance'::regclass
+    """))
+    return {r[0] for r in rows}
+
+
+def ensure_attendance_partitions(conn, first_month: date = None, months_ahead: int = PARTITION_MONTHS_AHEAD):
+    """
+    Create any missing monthly partitions from `first_month` (default: this
+    month) up to `months_ahead` months from now. Rows already sitting in
+    attendance_default for a new month are moved into it before attaching.
+    Runs inside the caller's transaction.
+    """
+    if not attendance_is_partitioned(conn):
+        return
+
+    today = date.today()
+    first_month = first_month or today
+    last_month = date(today.year + (today.month - 1 + months_ahead) // 12,
+                      (today.month - 1 + months_ahead) % 12 + 1, 1)
+    existing = _existing_partitions(conn)
+
+    for month_start in month_starts(first_month, last_month):
+        name = partition_name(month_start)
+        if name in existing:
+            continue
+        start, end = month_range(month_start.year, month_start.month)
+        conn.execute(text(
+            f"CREATE TABLE {name} (LIKE attendance INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        ))
+        conn.execute(
+            text(f"""
+                WITH moved AS (
+                    DELETE FROM attendance_default
+                    WHERE date >= :start AND date < :end
+                    RETURNING *
+                )
+                INSERT INTO {name} SELECT * FROM moved
+            """),
+            {"start": start, "end": end},
+        )
+        conn.execute(text(
+            f"ALTER TABLE attendance ATTACH PARTITION {name} "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        ))
+        logger.info(f"Created attendance partition {name}")
@@ -0,0 +1,85 @@
+"""
+Maintenance for attendance_monthly_summary, the per-employee monthly read
+model behind the attendance summary endpoints.
+
+    python -m utils.attendance_summary --rebuild [employee_id ...]
+"""
+import sys
+from datetime import date
+from typing import Iterable, List, Optional
+from sqlalchemy import text
+
+SUMMARY_COLUMNS = """
+    COUNT(a.id) FILTER (WHERE a.action = 'Present') AS present,
+    COUNT(a.id) FILTER (WHERE a.action = 'WFH') AS wfh,
+    COUNT(a.id) FILTER (WHERE a.action = 'Leave') AS leave,
+    COALESCE(SUM(a.hours), 0) AS hours
+"""
+
+SUMMARY_UPSERT = """
+    ON CONFLICT (employee_id, month) DO UPDATE
+        SET present = EXCLUDED.present,
+            wfh = EXCLUDED.wfh,
+            leave = EXCLUDED.leave,
+            hours = EXCLUDED.hours,
+            updated_at = NOW()
+"""
+
+
+def refresh_monthly_summary(session, employee_id: int, days: Iterable[date]):
+    """
+    Recompute the summary rows for the months touched by `days`. Call it in the
+    same transaction as the attendance write so the two never disagree.
+    """
+    months = sorted({date(d.year, d.month, 1) for d in days})
+    if not months:
+        return
+    session.execute(
+        text(f"""
+            INSERT INTO attendance_monthly_summary (employee_id, month, present, wfh, leave, hours, updated_at)
+            SELECT :employee_id, m.month, {SUMMARY_COLUMNS}, NOW()
+            FROM unnest(CAST(:months AS date[])) AS m(month)
+            LEFT JOIN attendance a
+                ON a.employee_id = :employee_id
+                AND a.date >= m.month
+                AND a.date < (m.month + INTERVAL '1 month')::date
+            GROUP BY m.month
+            {SUMMARY_UPSERT}
+        """),
+        {"employee_id": employee_id, "months": months},
+    )
+
+
+def rebuild_monthly_summary(session, employee_ids: Optional[List[int]] = None):
+    """Backfill / repair the summary from attendance, for everyone or just `employee_ids`."""
+    params = {}
+    scope = "TRUE"
+    if employee_ids:
+        scope = "employee_id = ANY(:employee_ids)"
+        params["employee_ids"] = employee_ids
+
+    session.execute(text(f"DELETE FROM attendance_monthly_summary WHERE {scope}"), params)
+    session.execute(
+        text(f"""
+            INSERT INTO attendance_monthly_summary (employee_id, month, present, wfh, leave, hours, updated_at)
+            SELECT a.employee_id, date_trunc('month', a.date)::date, {SUMMARY_COLUMNS}, NOW()
+            FROM attendance a
+            WHERE {scope}
+            GROUP BY a.employee_id, date_trunc('month', a.date)
+        """),
+        params,
+    )
+
+
+if __name__ == "__main__":
+    from sqlmodel import Session
+    from database import engine
+
+    if "--rebuild" not in sys.argv:
+        print(__doc__)
+        sys.exit(1)
+    ids = [int(arg) for arg in sys.argv[1:] if arg.isdigit()]
+    with Session(engine) as session:
+        rebuild_monthly_summary(session, ids or None)
+        session.commit()
+    print(f"Rebuilt attendance_monthly_summary for {'employees ' + str(ids) if ids else 'all employees'}")
@@ -0,0 +1,27 @@
+from datetime import date, datetime, timedelta
+from typing import Optional, Tuple
+
+
+def month_range(year: int, month: int) -> Tuple[date, date]:
+    """
+    Half-open [start, end) range for a calendar month, so queries can use
+    `col >= start AND col < end` (index-friendly) instead of EXTRACT(...).
+    """
+    start = date(year, month, 1)
+    end = date(year + month // 12, month % 12 + 1, 1)
+    return start, end
+
+
+def optional_month_range(year: Optional[int], month: Optional[int]) -> Tuple[date, date]:
+    """month_range when both are given, otherwise everything up to and including today."""
+    if year and month:
+        return month_range(year, month)
+    return date(1900, 1, 1), datetime.now().date() + timedelta(days=1)
+
+
+def month_starts(first: date, last: date):
+    """First day of every month from `first`'s month through `last`'s month."""
+    current = date(first.year, first.month, 1)
+    while current <= last:
+        yield current
+        current = month_range(current.year, current.month)[1]
@@ -0,0 +1,174 @@
+"""
+Batch jobs for the document blob store (utils.document_store).
+
+    python -m utils.document_maintenance --drain   move the per-type BYTEA columns of
+                                                   documents / onboarding_emp_docs into the store
+    python -m utils.document_maintenance --sweep   delete blobs no document_files row references
+
+    DOCUMENT_DRAIN_BATCH          employees drained per transaction
+    DOCUMENT_DRAIN_STARTUP_ROWS   rows migration v009 drains itself; above that it waits for --drain
+    DOCUMENT_SWEEP_INTERVAL       seconds between orphan sweeps in each app worker (0 = only on demand)
+
+The drain works in keyset batches, each in its own transaction: blobs are
+written, their document_files rows inserted and the drained columns set to
+NULL before the batch commits, so an interrupted run simply resumes with the
+rows that still hold bytes, and a second drain running alongside skips the
+rows the first one has locked and emptied.
+"""
+import asyncio
+import logging
+import os
+import sys
+from sqlalchemy import text
+from utils.document_store import (
+    DOC_TYPES, DOCUMENT_ORPHAN_MIN_AGE, EMPLOYEE_DOCS, ONBOARDING_DOCS, REFERENCED_BLOBS_QUERY,
+    blob_store, document_file_params,
+)
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_DRAIN_BATCH = int(os.getenv("DOCUMENT_DRAIN_BATCH", 20))
+DOCUMENT_DRAIN_STARTUP_ROWS = int(os.getenv("DOCUMENT_DRAIN_STARTUP_ROWS", 200))
+DOCUMENT_SWEEP_INTERVAL = float(os.getenv("DOCUMENT_SWEEP_INTERVAL", 24 * 3600))
+
+# (table, document_files.source)
+BLOB_TABLES = [
+    ("documents", EMPLOYEE_DOCS),
+    ("onboarding_emp_docs", ONBOARDING_DOCS),
+]
+
+# An upload made after the deploy (already in document_files) is newer than the drained bytes
+INSERT_DRAINED_FILE = text("""
+    INSERT INTO document_files (source, employee_id, doc_type, sha256, size_bytes, mime_type,
+                                extension, page_count, uploaded_at)
+    VALUES (:source, :employee_id, :doc_type, :sha256, :size_bytes, :mime_type,
+            :extension, :page_count, :uploaded_at)
+    ON CONFLICT (source, employee_id, doc_type) DO NOTHING
+""")
+
+
+def blob_columns(conn, table: str) -> list:
+    rows = conn.execute(
+        text("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_name = :table AND data_type = 'bytea'
+        """),
+        {"table": table},
+    )
+    present = {row[0] for row in rows}
+    return [column for column in DOC_TYPES if column in present]
+
+
+def pending_rows(conn) -> int:
+    """Rows of BLOB_TABLES that still hold bytes (IS NOT NULL doesn't read the values)."""
+    pending = 0
+    for table, _ in BLOB_TABLES:
+        columns = blob_columns(conn, table)
+        if columns:
+            has_blob = " OR ".join(f"{column} IS NOT NULL" for column in columns)
+            pending += conn.execute(text(f"SELECT COUNT(*) FROM {table} WHERE {has_blob}")).scalar()
+    return pending
+
+
+def drain_table(engine, table: str, source: str, batch_size: int = DOCUMENT_DRAIN_BATCH) -> int:
+    """Move every non-NULL blob of `table` into the store; returns the number of files moved."""
+    with engine.connect() as conn:
+        columns = blob_columns(conn, table)
+    if not columns:
+        return 0
+
+    has_blob = " OR ".join(f"{column} IS NOT NULL" for column in columns)
+    select_batch = text(f"""
+        SELECT employee_id, uploaded_at, {", ".join(columns)}
+        FROM {table}
+        WHERE employee_id > :after AND ({has_blob})
+        ORDER BY employee_id
+        LIMIT :batch
+        FOR UPDATE
+    """)
+    clear_batch = text(f"""
+        UPDATE {table} SET {", ".join(f"{column} = NULL" for column in columns)}
+        WHERE employee_id = ANY(:ids)
+    """)
+
+    moved, after = 0, -1
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(select_batch, {"after": after, "batch": batch_size}).mappings().all()
+            if not rows:
+                break
+            files = []
+            for row in rows:
+                for column in columns:
+                    if row[column] is None:
+                        continue
+                    blob = blob_store.put(bytes(row[column]))
+                    files.append(document_file_params(source, row["employee_id"], column, blob, row["uploaded_at"]))
+            if files:
+                conn.execute(INSERT_DRAINED_FILE, files)
+            conn.execute(clear_batch, {"ids": [row["employee_id"] for row in rows]})
+            moved += len(files)
+            after = rows[-1]["employee_id"]
+        logger.info(f"Drained {moved} files from {table} (through employee {after})")
+    return moved
+
+
+def drain_all(engine) -> int:
+    return sum(drain_table(engine, table, source) for table, source in BLOB_TABLES)
+
+
+async def sweep_orphan_blobs(session, min_age: float = DOCUMENT_ORPHAN_MIN_AGE) -> dict:
+    """Delete blobs no document_files row references, once older than `min_age` seconds."""
+    referenced = set((await session.execute(REFERENCED_BLOBS_QUERY)).scalars())
+    await session.release()
+    removed = await asyncio.to_thread(blob_store.sweep, referenced, min_age)
+    return {"referenced": len(referenced), "removed": removed}
+
+
+_sweeper = None
+
+
+async def _sweep_forever():
+    # database imports the migrations, which import this module
+    from database import async_session_maker
+
+    while True:
+        await asyncio.sleep(DOCUMENT_SWEEP_INTERVAL)
+        try:
+            async with async_session_maker() as session:
+                result = await sweep_orphan_blobs(session)
+            if result["removed"]:
+                logger.info(f"Swept {result['removed']} unreferenced document blobs")
+        except Exception as e:
+            logger.warning(f"Document blob sweep failed: {e}")
+
+
+def start_document_sweeper():
+    global _sweeper
+    if DOCUMENT_SWEEP_INTERVAL > 0 and _sweeper is None:
+        _sweeper = asyncio.create_task(_sweep_forever())
+
+
+async def stop_document_sweeper():
+    global _sweeper
+    if _sweeper is not None:
+        _sweeper.cancel()
+        await asyncio.gather(_sweeper, return_exceptions=True)
+        _sweeper = None
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    from database import engine
+
+    if "--drain" in sys.argv:
+        moved = drain_all(engine)
+        print(f"Drained {moved} files into {blob_store.root}; the next migration run records v009")
+    elif "--sweep" in sys.argv:
+        with engine.connect() as conn:
+            referenced = set(conn.execute(REFERENCED_BLOBS_QUERY).scalars())
+        removed = blob_store.sweep(referenced)
+        print(f"Removed {removed} unreferenced blobs ({len(referenced)} referenced)")
+    else:
+        print(__doc__)
+        sys.exit(1)
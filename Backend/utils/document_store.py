@@ -0,0 +1,480 @@
+"""
+Content-addressed storage for uploaded documents.
+
+File bytes live on disk under DOCUMENT_STORE_DIR, named by their sha256 and
+sharded by its first two hex pairs (ab/cd/abcd...), so identical uploads
+are stored once and a path never changes once written. Postgres keeps only
+metadata in document_files (see models.document_model.DocumentFile), one
+row per (source, employee, document type). Type, extension, size, page count
+and checksum are worked out once while the upload is written, so previews and
+listings never open the file to describe it.
+
+    DOCUMENT_STORE_DIR        root of the blob tree (not under the public /uploads mount)
+    DOCUMENT_CACHE_MAX_AGE    seconds a browser may reuse a preview before revalidating it
+    DOCUMENT_CHUNK_SIZE       bytes read from disk per chunk when streaming a preview
+    DOCUMENT_ORPHAN_MIN_AGE   seconds a blob no document_files row references is kept before a sweep removes it
+
+Blobs are written before their row, and a re-upload points the row at a new
+blob, so unreferenced blobs accumulate; BlobStore.sweep() removes them, run
+periodically by utils.document_maintenance.
+"""
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import time
+from datetime import datetime
+from typing import Optional
+import filetype
+from fastapi import HTTPException
+from sqlalchemy import text
+from starlette.requests import Request
+from starlette.responses import FileResponse, Response
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_STORE_DIR = os.getenv("DOCUMENT_STORE_DIR", "storage/documents")
+DOCUMENT_CACHE_MAX_AGE = int(os.getenv("DOCUMENT_CACHE_MAX_AGE", 0))
+DOCUMENT_CHUNK_SIZE = int(os.getenv("DOCUMENT_CHUNK_SIZE", 256 * 1024))
+DOCUMENT_ORPHAN_MIN_AGE = int(os.getenv("DOCUMENT_ORPHAN_MIN_AGE", 24 * 3600))
+
+# document_files.source: which upload flow a document belongs to
+EMPLOYEE_DOCS = "employee"
+ONBOARDING_DOCS = "onboarding"
+
+# Per-employee row each flow keeps next to its files (employee_id, uploaded_at)
+DOCUMENT_TABLES = {
+    EMPLOYEE_DOCS: "documents",
+    ONBOARDING_DOCS: "onboarding_emp_docs",
+}
+
+# Document types an employee / candidate can upload, in display order
+DOC_TYPES = [
+    "aadhar",
+    "pan",
+    "latest_graduation_certificate",
+    "updated_resume",
+    "offer_letter",
+    "latest_compensation_letter",
+    "experience_relieving_letter",
+    "latest_3_months_payslips",
+    "form16_or_12b_or_taxable_income",
+    "ssc_certificate",
+    "hsc_certificate",
+    "hsc_marksheet",
+    "graduation_marksheet",
+    "postgraduation_marksheet",
+    "postgraduation_certificate",
+    "passport",
+]
+
+# Bytes filetype needs to recognise a format
+SNIFF_BYTES = 261
+
+
+def detect_mime(head: bytes) -> str:
+    if head.startswith(b"%PDF"):
+        return "application/pdf"
+    kind = filetype.guess(head)
+    return kind.mime if kind else "application/octet-stream"
+
+
+def extension_for(mime_type: str) -> str:
+    kind = filetype.get_type(mime=mime_type) if mime_type != "application/octet-stream" else None
+    return kind.extension if kind else "bin"
+
+
+class PdfPageCounter:
+    """
+    Counts pages as chunks stream past, without a PDF parser. Objects are
+    tracked by number, so an incremental update that rewrites a page replaces
+    it instead of adding another: the count is /Count of the root /Pages
+    object (the one without /Parent) as last written, or failing that the
+    number of distinct objects last written as /Type /Page. Pages kept inside
+    compressed object streams aren't seen, and then count() is None rather
+    than a wrong number.
+    """
+    TOKENS = re.compile(
+        rb"(?<![0-9])(?P<obj>\d{1,10})\s{1,8}\d{1,5}\s{1,8}obj(?![A-Za-z])"
+        rb"|(?P<endobj>endobj)"
+        rb"|/Type\s{0,8}/(?P<type>Pages|Page)(?![A-Za-z])"
+        rb"|/Count\s{1,8}(?P<count>\d{1,10})"
+        rb"|(?P<parent>/Parent)(?![A-Za-z])"
+    )
+    MARGIN = 64  # longer than any token, so one starting before it is never cut off by the chunk's end
+
+    def __init__(self):
+        self._buffer = b""
+        self._objects = {}  # object number -> its last definition, for page tree objects only
+        self._current = None  # object being read: {"number", "type", "count", "parent"}
+
+    def feed(self, chunk: bytes):
+        self._buffer += chunk
+        resume = self._scan(len(self._buffer) - self.MARGIN)
+        # Keep what may still hold (the start of) a token
+        self._buffer = self._buffer[max(resume, len(self._buffer) - self.MARGIN, 0):]
+
+    def _scan(self, limit: int) -> int:
+        """Apply tokens starting before `limit`; returns where the next scan resumes."""
+        resume = 0
+        for match in self.TOKENS.finditer(self._buffer):
+            if match.start() >= limit:
+                break
+            resume = match.end()
+            if match["obj"] is not None:
+                self._end_object()
+                self._current = {"number": int(match["obj"]), "type": None, "count": None, "parent": False}
+            elif match["endobj"] is not None:
+                self._end_object()
+            elif self._current is None:
+                continue  # trailer, xref etc.
+            elif match["type"] is not None:
+                self._current["type"] = match["type"]
+            elif match["count"] is not None:
+                self._current["count"] = int(match["count"])
+            else:
+                self._current["parent"] = True
+        return resume
+
+    def _end_object(self):
+        current, self._current = self._current, None
+        if current is None:
+            return
+        if current["type"] is not None:
+            self._objects[current["number"]] = current
+        else:
+            # Rewritten as something else; an earlier page definition no longer counts
+            self._objects.pop(current["number"], None)
+
+    def count(self) -> Optional[int]:
+        self._buffer = self._buffer[self._scan(len(self._buffer) + 1):]
+        self._end_object()
+        roots = [
+            obj for obj in self._objects.values()
+            if obj["type"] == b"Pages" and not obj["parent"] and obj["count"] is not None
+        ]
+        if len(roots) == 1:
+            return roots[0]["count"] or None
+        pages = sum(1 for obj in self._objects.values() if obj["type"] == b"Page")
+        return pages or None
+
+
+class BlobWriter:
+    """
+    Incremental write into the store: bytes go to a temp file while the
+    sha256 is computed, and commit() moves the file to its content address.
+    """
+
+    def __init__(self, store: "BlobStore"):
+        self._store = store
+        self._hash = hashlib.sha256()
+        self._head = b""
+        self._pages = PdfPageCounter()
+        self.size = 0
+        self.sha256 = None
+        fd, self._tmp_path = tempfile.mkstemp(dir=store.tmp_dir, prefix="upload-")
+        self._file = os.fdopen(fd, "wb")
+
+    def write(self, chunk: bytes):
+        if len(self._head) < SNIFF_BYTES:
+            self._head += chunk[:SNIFF_BYTES - len(self._head)]
+        self._hash.update(chunk)
+        self._pages.feed(chunk)
+        self._file.write(chunk)
+        self.size += len(chunk)
+
+    @property
+    def head(self) -> bytes:
+        """First SNIFF_BYTES of the content, for type detection."""
+        return self._head
+
+    def commit(self) -> str:
+        """Make the blob durable at its content address; returns the sha256."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        sha256 = self.sha256 = self._hash.hexdigest()
+        path = self._store.path(sha256)
+        if os.path.exists(path):
+            # Same content already stored; touched so an orphan sweep leaves it for the row about to reference it
+            os.unlink(self._tmp_path)
+            os.utime(path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(self._tmp_path, path)
+        return sha256
+
+    def metadata(self) -> dict:
+        """What document_files records about the committed blob."""
+        mime_type = detect_mime(self._head)
+        return {
+            "sha256": self.sha256,
+            "size_bytes": self.size,
+            "mime_type": mime_type,
+            "extension": extension_for(mime_type),
+            "page_count": self._pages.count() if mime_type == "application/pdf" else None,
+        }
+
+    def abort(self):
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.unlink(self._tmp_path)
+
+
+class BlobStore:
+    def __init__(self, root: str = DOCUMENT_STORE_DIR):
+        self.root = root
+        self.tmp_dir = os.path.join(root, "tmp")
+
+    def path(self, sha256: str) -> str:
+        return os.path.join(self.root, sha256[:2], sha256[2:4], sha256)
+
+    def exists(self, sha256: str) -> bool:
+        return os.path.exists(self.path(sha256))
+
+    def writer(self) -> BlobWriter:
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        return BlobWriter(self)
+
+    def put(self, data: bytes) -> dict:
+        """Store `data`; returns its metadata (see BlobWriter.metadata)."""
+        writer = self.writer()
+        try:
+            writer.write(data)
+            writer.commit()
+        except BaseException:
+            writer.abort()
+            raise
+        return writer.metadata()
+
+    def sweep(self, referenced: set, min_age: float = DOCUMENT_ORPHAN_MIN_AGE) -> int:
+        """
+        Delete blobs whose sha256 is not in `referenced`, and abandoned temp
+        files, once older than `min_age` seconds (so an upload between its blob
+        and its row is never swept). Returns how many files were removed.
+        """
+        cutoff = time.time() - min_age
+        removed = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            in_tmp = os.path.abspath(dirpath) == os.path.abspath(self.tmp_dir)
+            for name in filenames:
+                if not in_tmp and name in referenced:
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    if os.stat(path).st_mtime < cutoff:
+                        os.unlink(path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+
+blob_store = BlobStore()
+
+REFERENCED_BLOBS_QUERY = text("SELECT DISTINCT sha256 FROM document_files")
+
+
+def parse_employee_id(fields: dict) -> int:
+    """employeeId form field of an upload, as an int; 400 when missing or not a number."""
+    employee_id = fields.get("employeeId")
+    if not employee_id:
+        raise HTTPException(status_code=400, detail="employeeId is required")
+    try:
+        return int(employee_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="employeeId must be a valid integer")
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against `etag`."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def blob_response(request: Request, file, filename: str) -> Response:
+    """
+    Serve a stored blob inline. The file is streamed from disk in
+    DOCUMENT_CHUNK_SIZE chunks with Content-Length, and Range requests get a
+    206 of just the requested bytes, so PDF viewers can load pages lazily.
+    The ETag is the content hash: a re-upload changes it, and a browser
+    holding the current copy gets a 304 without the file being opened.
+    `file` is a document_files row; type, size and page count come from it.
+    """
+    headers = {
+        "ETag": f'"{file.sha256}"',
+        "Cache-Control": f"private, max-age={DOCUMENT_CACHE_MAX_AGE}, must-revalidate",
+    }
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    headers["Content-Length"] = str(file.size_bytes)
+    if file.page_count:
+        headers["X-Page-Count"] = str(file.page_count)
+    response = FileResponse(
+        blob_store.path(file.sha256),
+        media_type=file.mime_type,
+        headers=headers,
+        filename=filename,
+        content_disposition_type="inline",
+    )
+    response.chunk_size = DOCUMENT_CHUNK_SIZE
+    return response
+
+
+UPSERT_DOCUMENT_FILE = text("""
+    INSERT INTO document_files (source, employee_id, doc_type, sha256, size_bytes, mime_type,
+                                extension, page_count, uploaded_at)
+    VALUES (:source, :employee_id, :doc_type, :sha256, :size_bytes, :mime_type,
+            :extension, :page_count, :uploaded_at)
+    ON CONFLICT (source, employee_id, doc_type) DO UPDATE
+        SET sha256 = EXCLUDED.sha256,
+            size_bytes = EXCLUDED.size_bytes,
+            mime_type = EXCLUDED.mime_type,
+            extension = EXCLUDED.extension,
+            page_count = EXCLUDED.page_count,
+            uploaded_at = EXCLUDED.uploaded_at
+""")
+
+
+def document_file_params(source: str, employee_id: int, doc_type: str, blob: dict,
+                         uploaded_at: Optional[datetime] = None) -> dict:
+    """Row for UPSERT_DOCUMENT_FILE from a stored blob's metadata."""
+    return {
+        "source": source, "employee_id": employee_id, "doc_type": doc_type,
+        **blob,
+        "uploaded_at": uploaded_at or datetime.utcnow(),
+    }
+
+
+DOCUMENT_FILES_QUERY = text("""
+    SELECT doc_type, sha256, size_bytes, mime_type, extension, page_count, uploaded_at
+    FROM document_files
+    WHERE source = :source AND employee_id = :employee_id
+""")
+
+
+async def save_uploaded_documents(request: Request, session, source: str) -> dict:
+    """
+    The upload endpoint of either flow: stream the multipart body (employeeId,
+    then one file per DOC_TYPES field) into the blob store and upsert a
+    document_files row per file. The session only checks a connection out for
+    the upsert. Returns the response body.
+    """
+    # multipart_upload writes through this module's BlobWriter
+    from utils.multipart_upload import receive_upload
+
+    # employeeId is checked before the first file is stored, not after the whole body
+    fields, files = await receive_upload(request, DOC_TYPES, before_files=parse_employee_id)
+    logger.info(f"Received form data keys: {list(fields) + list(files)}")
+    employee_id = parse_employee_id(fields)
+
+    uploaded_files = {}
+    stored_files = []
+    for field_name, (filename, blob) in files.items():
+        stored_files.append(document_file_params(source, employee_id, field_name, blob))
+        uploaded_files[field_name] = filename
+
+    # Only commit if we actually uploaded files
+    if stored_files:
+        session.execute(UPSERT_DOCUMENT_FILE, stored_files)
+        session.commit()
+        logger.info(f"Successfully committed {len(uploaded_files)} files")
+    else:
+        logger.warning("No files were uploaded")
+
+    return {
+        "message": f"Successfully uploaded {len(uploaded_files)} documents",
+        "uploaded_files": uploaded_files,
+        "employeeId": employee_id,
+    }
+
+
+def document_files(session, source: str, employee_id: int) -> dict:
+    """doc_type -> metadata row for every document `employee_id` has uploaded."""
+    rows = session.execute(DOCUMENT_FILES_QUERY, {"source": source, "employee_id": employee_id}).all()
+    return {row.doc_type: row for row in rows}
+
+
+# Upload flags per employee without touching file metadata beyond doc_type:
+# the lateral aggregate is answered from ix_document_files_status alone.
+# {table} is the flow's DOCUMENT_TABLES entry
+DOCUMENT_STATUS_PAGE_QUERY = """
+    SELECT e.id, e.name, e.email, e.role, d.uploaded,
+           EXISTS (SELECT 1 FROM {table} doc WHERE doc.employee_id = e.id) AS has_row
+    FROM employees e
+    LEFT JOIN LATERAL (
+        SELECT array_agg(f.doc_type) AS uploaded
+        FROM document_files f
+        WHERE f.source = :source AND f.employee_id = e.id
+    ) d ON TRUE
+    WHERE e.id > :after_id
+    ORDER BY e.id
+    LIMIT :limit
+"""
+
+
+def status_flags(uploaded) -> dict:
+    """{doc_type: True/False} for every DOC_TYPES entry."""
+    uploaded = set(uploaded or ())
+    return {field: field in uploaded for field in DOC_TYPES}
+
+
+def file_metadata(row) -> dict:
+    """Client-facing description of a document_files row."""
+    return {
+        "mime_type": row.mime_type,
+        "extension": row.extension or extension_for(row.mime_type),
+        "size_bytes": row.size_bytes,
+        "page_count": row.page_count,
+        "checksum": row.sha256,
+        "uploaded_at": row.uploaded_at,
+    }
+
+
+def document_status(session, source: str, employee_id: int) -> Optional[dict]:
+    """
+    Upload flags, latest uploaded_at and per-file metadata for one employee;
+    all flags False when only the flow's DOCUMENT_TABLES row exists, None
+    when there isn't one either.
+    """
+    files = document_files(session, source, employee_id)
+    if files:
+        uploaded_at = max(row.uploaded_at for row in files.values())
+    else:
+        uploaded_at = session.execute(
+            text(f"SELECT uploaded_at FROM {DOCUMENT_TABLES[source]} WHERE employee_id = :employee_id"),
+            {"employee_id": employee_id},
+        ).scalar()
+        if uploaded_at is None:
+            return None
+    response = status_flags(files)
+    response["employeeId"] = employee_id
+    response["uploaded_at"] = uploaded_at
+    response["files"] = {doc_type: file_metadata(row) for doc_type, row in files.items()}
+    return response
+
+
+def document_status_page(session, source: str, after_id: int, limit: Optional[int]) -> list:
+    """Employees with id > after_id in id order, each with its upload flags (keyset pagination)."""
+    rows = session.execute(
+        text(DOCUMENT_STATUS_PAGE_QUERY.format(table=DOCUMENT_TABLES[source])),
+        {"source": source, "after_id": after_id, "limit": limit},
+    ).all()
+    return [
+        {
+            "id": row.id,
+            "name": row.name,
+            "email": row.email,
+            "role": row.role,
+            # As before the blob store: all-False flags for an employee with a
+            # documents row but no files, an empty dict for one without a row
+            "documents": status_flags(row.uploaded) if row.uploaded or row.has_row else {},
+        }
+        for row in rows
+    ]
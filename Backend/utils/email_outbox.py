@@ -0,0 +1,303 @@
+"""
+Durable email outbox.
+
+Handlers only add a row to email_outbox inside their own transaction
+(enqueue_email), so a message is sent if and only if that transaction
+commits, and no request waits on SMTP. A pool of background workers claims
+pending rows in batches (FOR UPDATE SKIP LOCKED, so workers and processes
+never pick the same row), sends them over an SMTP connection each worker
+keeps open between batches, and records the outcome on the row. Failed sends
+are retried with exponential backoff until EMAIL_OUTBOX_MAX_ATTEMPTS.
+
+Bodies carry OTPs and temporary passwords, which are only stored hashed
+everywhere else and so can't be rendered later at send time. The body is
+therefore blanked in the same statement that marks a row sent or failed, and
+finished rows are deleted after EMAIL_OUTBOX_RETENTION_DAYS.
+
+    EMAIL_OUTBOX_WORKERS          sender tasks per process (0 = enqueue only)
+    EMAIL_OUTBOX_BATCH            rows claimed per worker per round
+    EMAIL_OUTBOX_POLL_INTERVAL    seconds a worker sleeps when the outbox is empty
+    EMAIL_OUTBOX_MAX_ATTEMPTS     sends tried before a message is marked failed
+    EMAIL_OUTBOX_BACKOFF_SECONDS  first retry delay, doubled on every further attempt
+    EMAIL_OUTBOX_CLAIM_TIMEOUT    seconds before a row stuck in "sending" (worker died) is retried
+    EMAIL_OUTBOX_RETENTION_DAYS   days sent / failed rows are kept (0 = never purged)
+    EMAIL_OUTBOX_PURGE_INTERVAL   seconds between retention purges
+    SMTP_IDLE_TIMEOUT             seconds an unused SMTP connection is kept open
+    MAIL_SERVER / MAIL_PORT / MAIL_STARTTLS / MAIL_SSL_TLS / MAIL_USERNAME / MAIL_PASSWORD / MAIL_FROM
+
+For local runs point it at an SMTP sink instead of a real server:
+
+    python -m aiosmtpd -n -l localhost:1025
+    MAIL_SERVER=localhost MAIL_PORT=1025 MAIL_STARTTLS=false MAIL_USERNAME=
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+from email.message import EmailMessage
+import aiosmtplib
+from sqlalchemy import text
+from database import async_session_maker
+from models.email_outbox_model import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+
+def _env_bool(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ["true", "1", "yes"]
+
+
+EMAIL_OUTBOX_WORKERS = int(os.getenv("EMAIL_OUTBOX_WORKERS", 2))
+EMAIL_OUTBOX_BATCH = int(os.getenv("EMAIL_OUTBOX_BATCH", 20))
+EMAIL_OUTBOX_POLL_INTERVAL = float(os.getenv("EMAIL_OUTBOX_POLL_INTERVAL", 1))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", 6))
+EMAIL_OUTBOX_BACKOFF_SECONDS = float(os.getenv("EMAIL_OUTBOX_BACKOFF_SECONDS", 30))
+EMAIL_OUTBOX_CLAIM_TIMEOUT = int(os.getenv("EMAIL_OUTBOX_CLAIM_TIMEOUT", 300))
+EMAIL_OUTBOX_RETENTION_DAYS = int(os.getenv("EMAIL_OUTBOX_RETENTION_DAYS", 30))
+EMAIL_OUTBOX_PURGE_INTERVAL = float(os.getenv("EMAIL_OUTBOX_PURGE_INTERVAL", 3600))
+EMAIL_OUTBOX_PURGE_BATCH = 1000
+SMTP_IDLE_TIMEOUT = float(os.getenv("SMTP_IDLE_TIMEOUT", 60))
+
+MAIL_SERVER = os.getenv("MAIL_SERVER", "smtp.gmail.com")
+MAIL_PORT = int(os.getenv("MAIL_PORT", 587))
+MAIL_STARTTLS = _env_bool("MAIL_STARTTLS", "true")
+MAIL_SSL_TLS = _env_bool("MAIL_SSL_TLS", "false")
+MAIL_USERNAME = os.getenv("MAIL_USERNAME", "your-email@example.com")
+MAIL_PASSWORD = os.getenv("MAIL_PASSWORD", "your-password")
+MAIL_FROM = os.getenv("MAIL_FROM", "your-email@example.com")
+
+CLAIM_QUERY = text("""
+    UPDATE email_outbox
+    SET status = 'sending', claimed_at = LOCALTIMESTAMP, attempts = attempts + 1
+    WHERE id IN (
+        SELECT id FROM email_outbox
+        WHERE (status = 'pending' AND (next_attempt_at IS NULL OR next_attempt_at <= LOCALTIMESTAMP))
+           OR (status = 'sending' AND claimed_at < LOCALTIMESTAMP - make_interval(secs => :claim_timeout))
+        ORDER BY id
+        LIMIT :batch
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, to_email, subject, body, subtype, attempts
+""")
+
+MARK_SENT_QUERY = text("""
+    UPDATE email_outbox
+    SET status = 'sent', sent_at = LOCALTIMESTAMP, last_error = NULL, body = ''
+    WHERE id = ANY(:ids)
+""")
+
+MARK_FAILED_QUERY = text("""
+    UPDATE email_outbox
+    SET status = CASE WHEN attempts >= :max_attempts THEN 'failed' ELSE 'pending' END,
+        next_attempt_at = LOCALTIMESTAMP + make_interval(secs => :delay),
+        last_error = :error,
+        body = CASE WHEN attempts >= :max_attempts THEN '' ELSE body END
+    WHERE id = :id
+""")
+
+PURGE_QUERY = text("""
+    DELETE FROM email_outbox
+    WHERE id IN (
+        SELECT id FROM email_outbox
+        WHERE status IN ('sent', 'failed')
+          AND created_at < LOCALTIMESTAMP - make_interval(days => :days)
+        LIMIT :batch
+    )
+""")
+
+STATUS_COUNTS_QUERY = text("SELECT status, COUNT(*) FROM email_outbox GROUP BY status")
+
+
+def enqueue_email(session, to_email: str, subject: str, body: str, subtype: str = "plain") -> EmailOutbox:
+    """
+    Add a message to the outbox in the caller's transaction (sync Session or
+    AsyncSession); it goes out once the caller commits.
+    """
+    row = EmailOutbox(to_email=to_email, subject=subject, body=body, subtype=subtype)
+    session.add(row)
+    return row
+
+
+def build_message(to_email: str, subject: str, body: str, subtype: str = "plain") -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = MAIL_FROM
+    message["To"] = to_email
+    message["Subject"] = subject
+    message.set_content(body, subtype=subtype)
+    return message
+
+
+def retry_delay(attempts: int) -> float:
+    """Backoff before the next attempt after `attempts` failed sends, with jitter."""
+    delay = EMAIL_OUTBOX_BACKOFF_SECONDS * 2 ** (attempts - 1)
+    return delay * random.uniform(0.8, 1.2)
+
+
+class SmtpConnection:
+    """One SMTP session, opened on first use and reused across batches."""
+
+    def __init__(self, stats: dict):
+        self._smtp = None
+        self._stats = stats
+        self.last_used = 0.0
+
+    async def _connect(self):
+        smtp = aiosmtplib.SMTP(
+            hostname=MAIL_SERVER, port=MAIL_PORT,
+            use_tls=MAIL_SSL_TLS, start_tls=MAIL_STARTTLS if not MAIL_SSL_TLS else False,
+        )
+        await smtp.connect()
+        if MAIL_USERNAME:
+            await smtp.login(MAIL_USERNAME, MAIL_PASSWORD)
+        self._smtp = smtp
+        self._stats["smtp_connects"] += 1
+
+    async def send(self, message: EmailMessage):
+        if self._smtp is None or not self._smtp.is_connected:
+            await self._connect()
+        self.last_used = time.monotonic()
+        await self._smtp.send_message(message)
+
+    async def close(self):
+        smtp, self._smtp = self._smtp, None
+        if smtp is not None and smtp.is_connected:
+            try:
+                await smtp.quit()
+            except Exception:
+                smtp.close()
+
+
+class EmailOutboxWorkers:
+    def __init__(self, workers: int = EMAIL_OUTBOX_WORKERS):
+        self.workers = workers
+        self._tasks = []
+        self._stopping = asyncio.Event()
+        self.stats = {
+            "claimed": 0, "sent": 0, "retried": 0, "failed": 0, "smtp_connects": 0, "batches": 0, "purged": 0,
+        }
+
+    async def _claim(self):
+        async with async_session_maker() as db:
+            rows = (await db.execute(
+                CLAIM_QUERY, {"batch": EMAIL_OUTBOX_BATCH, "claim_timeout": EMAIL_OUTBOX_CLAIM_TIMEOUT}
+            )).all()
+            await db.commit()
+        return rows
+
+    async def _record(self, sent_ids, failures):
+        async with async_session_maker() as db:
+            if sent_ids:
+                await db.execute(MARK_SENT_QUERY, {"ids": sent_ids})
+            if failures:
+                await db.execute(MARK_FAILED_QUERY, failures)
+            await db.commit()
+
+    async def send_batch(self, smtp: SmtpConnection) -> int:
+        """Claim, send and record one batch; returns how many rows were claimed."""
+        rows = await self._claim()
+        if not rows:
+            return 0
+        self.stats["claimed"] += len(rows)
+        self.stats["batches"] += 1
+
+        sent_ids, failures = [], []
+        server_down = None
+        for row in rows:
+            try:
+                if server_down is not None:
+                    raise server_down
+                await smtp.send(build_message(row.to_email, row.subject, row.body, row.subtype))
+                sent_ids.append(row.id)
+            except Exception as e:
+                if isinstance(e, aiosmtplib.SMTPConnectError):
+                    # Don't redial for every row of the batch; they all retry later
+                    server_down = e
+                # Start the next message on a fresh connection
+                await smtp.close()
+                failures.append({
+                    "id": row.id, "max_attempts": EMAIL_OUTBOX_MAX_ATTEMPTS,
+                    "delay": retry_delay(row.attempts), "error": str(e)[:500],
+                })
+                if row.attempts >= EMAIL_OUTBOX_MAX_ATTEMPTS:
+                    self.stats["failed"] += 1
+                    logger.error(f"Email {row.id} to {row.to_email} failed after {row.attempts} attempts: {e}")
+                else:
+                    self.stats["retried"] += 1
+                    logger.warning(f"Email {row.id} to {row.to_email} failed (attempt {row.attempts}), will retry: {e}")
+
+        await self._record(sent_ids, failures)
+        self.stats["sent"] += len(sent_ids)
+        return len(rows)
+
+    async def _run(self):
+        smtp = SmtpConnection(self.stats)
+        try:
+            while not self._stopping.is_set():
+                try:
+                    claimed = await self.send_batch(smtp)
+                except Exception as e:
+                    logger.warning(f"Email outbox round failed: {e}")
+                    claimed = 0
+                if claimed == EMAIL_OUTBOX_BATCH:
+                    continue  # more may be waiting
+                if smtp.last_used and time.monotonic() - smtp.last_used > SMTP_IDLE_TIMEOUT:
+                    await smtp.close()
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=EMAIL_OUTBOX_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            await smtp.close()
+
+    async def purge(self, days: int = EMAIL_OUTBOX_RETENTION_DAYS) -> int:
+        """Delete sent / failed rows created more than `days` ago; returns how many went."""
+        removed = 0
+        while True:
+            async with async_session_maker() as db:
+                result = await db.execute(PURGE_QUERY, {"days": days, "batch": EMAIL_OUTBOX_PURGE_BATCH})
+                await db.commit()
+            removed += result.rowcount
+            if result.rowcount < EMAIL_OUTBOX_PURGE_BATCH:
+                self.stats["purged"] += removed
+                return removed
+
+    async def _purge_forever(self):
+        while not self._stopping.is_set():
+            try:
+                removed = await self.purge()
+                if removed:
+                    logger.info(f"Purged {removed} email_outbox rows older than {EMAIL_OUTBOX_RETENTION_DAYS} days")
+            except Exception as e:
+                logger.warning(f"Email outbox purge failed: {e}")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=EMAIL_OUTBOX_PURGE_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if self._tasks:
+            return
+        self._stopping.clear()
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+        if self._tasks and EMAIL_OUTBOX_RETENTION_DAYS > 0:
+            self._tasks.append(asyncio.create_task(self._purge_forever()))
+
+    async def stop(self, timeout: float = 10):
+        """Let workers finish the batch in hand; rows still 'sending' after that are reclaimed later."""
+        if not self._tasks:
+            return
+        self._stopping.set()
+        _, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks = []
+
+
+email_outbox = EmailOutboxWorkers()
+
+
+async def outbox_status(session) -> dict:
+    counts = {status: count for status, count in (await session.execute(STATUS_COUNTS_QUERY)).all()}
+    return {"workers": email_outbox.workers, "rows": counts, **email_outbox.stats}
@@ -1,12 +1,79 @@
+"""
+Password hashing service.
+
+bcrypt costs 100-300 ms of CPU per call, so it never runs on the event loop:
+every hash/verify goes through a dedicated, bounded thread pool (bcrypt
+releases the GIL while it works). A login storm queues up here instead of
+stalling unrelated requests, and the queue depth is visible in stats().
+
+    PASSWORD_HASH_WORKERS   max concurrent bcrypt calls per worker process
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from passlib.context import CryptContext
 
 # Configure Passlib for bcrypt hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-def hash_password(password: str) -> str:
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+
+
+class PasswordWorkerPool:
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.max_queue_depth = 0
+        self.total_wait = 0.0
+
+    def _track(self, fn, submitted: float, *args):
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self.total_wait += time.perf_counter() - submitted
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+
+    async def run(self, fn, *args):
+        with self._lock:
+            self.queued += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queued)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._track, fn, time.perf_counter(), *args)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_depth": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "max_queue_depth": self.max_queue_depth,
+                "avg_wait_ms": round(self.total_wait / self.completed * 1000, 3) if self.completed else 0.0,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+password_pool = PasswordWorkerPool(PASSWORD_HASH_WORKERS)
+
+
+async def hash_password(password: str) -> str:
     """Hash a plain password"""
-    return pwd_context.hash(password)
+    return await password_pool.run(pwd_context.hash, password)
+
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify password against its hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    return await password_pool.run(pwd_context.verify, plain_password, hashed_password)
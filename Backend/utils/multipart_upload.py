@@ -0,0 +1,230 @@
+"""
+Streaming multipart uploads into the document blob store.
+
+request.form() spools every file of a request before the handler runs, and
+the handlers then read each file into memory. receive_upload() instead feeds
+request.stream() through python-multipart as it arrives: file bytes go
+straight into a BlobWriter (hashed, type-sniffed and page-counted on the way),
+and each finished file is fsynced and moved to its content address on a task
+of its own while the next part is still being received. Only the chunk in
+hand is held in memory, whatever the size or number of files.
+
+    UPLOAD_MAX_FILE_BYTES      largest single file accepted (413 beyond it)
+    UPLOAD_MAX_REQUEST_BYTES   largest request body accepted (413 beyond it)
+    UPLOAD_MAX_FIELD_BYTES     largest plain form field (employeeId etc.)
+"""
+import asyncio
+import logging
+import os
+from typing import Callable, Optional, Tuple
+from fastapi import HTTPException, Request
+from utils.document_store import BlobWriter, blob_store
+
+try:
+    from python_multipart import MultipartParser
+    from python_multipart.exceptions import FormParserError
+    from python_multipart.multipart import parse_options_header
+except ModuleNotFoundError:  # python-multipart < 0.0.13
+    from multipart import MultipartParser
+    from multipart.exceptions import FormParserError
+    from multipart.multipart import parse_options_header
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_MAX_FILE_BYTES = int(os.getenv("UPLOAD_MAX_FILE_BYTES", 20 * 1024 * 1024))
+UPLOAD_MAX_REQUEST_BYTES = int(os.getenv("UPLOAD_MAX_REQUEST_BYTES", 100 * 1024 * 1024))
+UPLOAD_MAX_FIELD_BYTES = int(os.getenv("UPLOAD_MAX_FIELD_BYTES", 64 * 1024))
+
+
+def _finish_blob(writer: BlobWriter) -> dict:
+    writer.commit()
+    return writer.metadata()
+
+
+class _UploadReceiver:
+    """
+    python-multipart callbacks run synchronously inside parser.write(), so
+    they only record file events; flush() then does the (threaded) disk work.
+    Plain fields are small and collected directly.
+    """
+
+    def __init__(self, file_fields, before_files: Optional[Callable[[dict], object]] = None):
+        self.file_fields = set(file_fields)
+        self.before_files = before_files
+        self.fields = {}
+        self._events = []
+        self._header_name = b""
+        self._header_value = b""
+        self._disposition = b""
+        self._field_name = None
+        self._field_data = None  # bytearray while a plain field is being read
+        self._file = None  # (field_name, filename) of the file part being written
+        self._writer: Optional[BlobWriter] = None
+        self._finishing = []  # (field_name, filename, task)
+        self._stored_fields = set()  # file fields with a non-empty part so far
+        self.complete = False  # closing boundary seen
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_end": self.on_end,
+        }
+
+    def on_part_begin(self):
+        self._disposition = b""
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        if self._header_name.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_name = self._header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._disposition)
+        if b"name" not in options:
+            raise HTTPException(status_code=400, detail="Multipart part without a field name")
+        self._field_name = options[b"name"].decode("utf-8", "replace")
+        if b"filename" in options:
+            if self.before_files is not None:
+                # Here, not in flush(): by then later fields of the same chunk are in self.fields
+                before_files, self.before_files = self.before_files, None
+                before_files(self.fields)
+            self._field_data = None
+            self._events.append(("file", self._field_name, options[b"filename"].decode("utf-8", "replace")))
+        else:
+            self._field_data = bytearray()
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self._field_data is None:
+            self._events.append(("data", data[start:end]))
+            return
+        if len(self._field_data) + end - start > UPLOAD_MAX_FIELD_BYTES:
+            raise HTTPException(status_code=413, detail=f"Field {self._field_name} is too large")
+        self._field_data += data[start:end]
+
+    def on_part_end(self):
+        if self._field_data is None:
+            self._events.append(("end",))
+        else:
+            self.fields[self._field_name] = self._field_data.decode("utf-8", "replace")
+
+    def on_end(self):
+        self.complete = True
+
+    async def flush(self):
+        """Apply the file events recorded by the last parser.write()."""
+        events, self._events = self._events, []
+        pending = []
+        for event in events:
+            if event[0] == "data":
+                pending.append(event[1])
+                continue
+            if pending:
+                await self._write(b"".join(pending))
+                pending = []
+            if event[0] == "file":
+                self._file = event[1:]
+            else:
+                self._end_file()
+        if pending:
+            await self._write(b"".join(pending))
+
+    async def _write(self, data: bytes):
+        field_name, filename = self._file
+        if self._writer is None:
+            # Checked on the first bytes, so empty file inputs are skipped as before
+            if field_name not in self.file_fields:
+                raise HTTPException(status_code=400, detail=f"Unknown document type: {field_name}")
+            # A second file for the same field would replace the first and leave its blob unreferenced
+            if field_name in self._stored_fields:
+                raise HTTPException(status_code=400, detail=f"Duplicate document type: {field_name}")
+            self._stored_fields.add(field_name)
+            logger.info(f"Uploading file: {filename} for field: {field_name}")
+            self._writer = blob_store.writer()
+        if self._writer.size + len(data) > UPLOAD_MAX_FILE_BYTES:
+            raise HTTPException(
+                status_code=413, detail=f"{field_name} is larger than {UPLOAD_MAX_FILE_BYTES} bytes"
+            )
+        await asyncio.to_thread(self._writer.write, data)
+
+    def _end_file(self):
+        field_name, filename = self._file
+        writer, self._file, self._writer = self._writer, None, None
+        if writer is None:
+            logger.warning(f"File {field_name} is empty")
+            return
+        # fsync + rename overlap with receiving the next part
+        task = asyncio.create_task(asyncio.to_thread(_finish_blob, writer))
+        self._finishing.append((field_name, filename, task))
+
+    async def files(self) -> dict:
+        results = await asyncio.gather(*(task for _, _, task in self._finishing))
+        return {
+            field_name: (filename, blob)
+            for (field_name, filename, _), blob in zip(self._finishing, results)
+        }
+
+    async def abort(self):
+        if self._writer is not None:
+            self._writer.abort()
+            self._writer = None
+        # Finished blobs stay in the store; identical content is reused by the next upload
+        await asyncio.gather(*(task for _, _, task in self._finishing), return_exceptions=True)
+
+
+async def receive_upload(
+    request: Request, file_fields, before_files: Optional[Callable[[dict], object]] = None
+) -> Tuple[dict, dict]:
+    """
+    Stream a multipart/form-data body into the blob store.
+
+    Returns (fields, files): plain form fields as strings, and for every
+    non-empty file part field_name -> (filename, blob metadata as returned by
+    BlobWriter.metadata()). A file part whose field name is not in
+    `file_fields`, or repeats one already received, is rejected with a 400
+    before any of its bytes are stored.
+    `before_files(fields)` is called with the fields received so far when the
+    first file part starts, so a request whose plain fields are invalid (it
+    raises) leaves nothing behind; those fields must therefore precede the
+    files in the body.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data body")
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > UPLOAD_MAX_REQUEST_BYTES:
+        raise HTTPException(status_code=413, detail=f"Upload is larger than {UPLOAD_MAX_REQUEST_BYTES} bytes")
+
+    receiver = _UploadReceiver(file_fields, before_files)
+    parser = MultipartParser(params[b"boundary"], receiver.callbacks())
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            # Chunked bodies carry no Content-Length to check up front
+            if received > UPLOAD_MAX_REQUEST_BYTES:
+                raise HTTPException(status_code=413, detail=f"Upload is larger than {UPLOAD_MAX_REQUEST_BYTES} bytes")
+            parser.write(chunk)
+            await receiver.flush()
+        parser.finalize()
+        await receiver.flush()
+        if not receiver.complete:
+            raise HTTPException(status_code=400, detail="Incomplete multipart body")
+        return receiver.fields, await receiver.files()
+    except FormParserError as e:
+        await receiver.abort()
+        raise HTTPException(status_code=400, detail=f"Malformed multipart body: {e}")
+    except BaseException:
+        await receiver.abort()
+        raise
@@ -0,0 +1,88 @@
+"""
+Forgot-password OTPs, kept in Redis instead of on the employees row.
+
+    otp:<email>           hash {digest, attempts}, expires after OTP_TTL_SECONDS
+    otp:verified:<email>  set once the OTP is verified; /users/change-password consumes it
+
+    OTP_TTL_SECONDS             how long an issued OTP stays valid
+    OTP_MAX_ATTEMPTS            wrong guesses before the OTP is discarded
+    OTP_VERIFIED_TTL_SECONDS    how long a verified OTP allows a password change
+"""
+import hashlib
+import hmac
+import os
+import secrets
+from utils.redis_client import get_redis
+
+OTP_TTL_SECONDS = int(os.getenv("OTP_TTL_SECONDS", 600))
+OTP_MAX_ATTEMPTS = int(os.getenv("OTP_MAX_ATTEMPTS", 5))
+OTP_VERIFIED_TTL_SECONDS = int(os.getenv("OTP_VERIFIED_TTL_SECONDS", 900))
+
+# verify() results
+OTP_OK = "ok"
+OTP_INVALID = "invalid"
+OTP_EXPIRED = "expired"
+OTP_LOCKED = "locked"
+
+
+def _digest(otp: str) -> str:
+    # Only a digest is stored, so a Redis dump doesn't hand out live codes
+    return hashlib.sha256(otp.encode()).hexdigest()
+
+
+async def issue_otp(email: str) -> str:
+    """Create a fresh 6-digit OTP for `email`, replacing any earlier one."""
+    otp = f"{secrets.randbelow(900000) + 100000}"
+    async with get_redis().pipeline(transaction=True) as pipe:
+        pipe.delete(f"otp:{email}", f"otp:verified:{email}")
+        pipe.hset(f"otp:{email}", mapping={"digest": _digest(otp), "attempts": 0})
+        pipe.expire(f"otp:{email}", OTP_TTL_SECONDS)
+        await pipe.execute()
+    return otp
+
+
+async def verify_otp(email: str, otp: str) -> str:
+    """Check `otp` and count the attempt; returns one of OTP_OK / OTP_INVALID / OTP_EXPIRED / OTP_LOCKED."""
+    redis = get_redis()
+    key = f"otp:{email}"
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.hget(key, "digest")
+        pipe.hincrby(key, "attempts", 1)
+        pipe.ttl(key)
+        digest, attempts, ttl = await pipe.execute()
+    if ttl == -1:
+        # The hash HINCRBY created for a missing OTP has no TTL yet (EXPIRE NX
+        # would do this in one step but needs Redis 7)
+        await redis.expire(key, OTP_TTL_SECONDS)
+    if digest is None:
+        return OTP_EXPIRED
+    if attempts > OTP_MAX_ATTEMPTS:
+        await redis.delete(key)
+        return OTP_LOCKED
+    if not hmac.compare_digest(digest, _digest(otp)):
+        return OTP_INVALID
+
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.delete(key)
+        pipe.set(f"otp:verified:{email}", 1, ex=OTP_VERIFIED_TTL_SECONDS)
+        await pipe.execute()
+    return OTP_OK
+
+
+async def is_verified(email: str) -> bool:
+    """Whether `email` has a verified OTP waiting, without using it up."""
+    return await get_redis().exists(f"otp:verified:{email}") > 0
+
+
+async def consume_verified(email: str) -> bool:
+    """Use up the verified-OTP flag for `email`; True only for the first caller after a verify."""
+    return await get_redis().getdel(f"otp:verified:{email}") is not None
+
+
+async def restore_verified(email: str):
+    """Hand back a flag consume_verified() took when the password change it guarded failed."""
+    await get_redis().set(f"otp:verified:{email}", 1, ex=OTP_VERIFIED_TTL_SECONDS)
+
+
+async def clear_otp(email: str):
+    await get_redis().delete(f"otp:{email}", f"otp:verified:{email}")
@@ -0,0 +1,178 @@
+"""
+Token-bucket admission control for /users/login.
+
+Every attempt takes one token from the caller's IP bucket and one from the
+account's bucket before any DB lookup or bcrypt work; an empty bucket is a
+cheap 429. Buckets live in Redis (one atomic Lua call for both) so all
+workers share them, and fall back to a per-process bucket table whenever
+Redis is unreachable. After a Redis failure the limiter stays on the
+in-process buckets for LOGIN_RATE_REDIS_RETRY_SECONDS before probing Redis
+again, so an outage doesn't add a socket timeout to every login.
+
+    LOGIN_RATE_LIMIT               1 (default) | 0 to disable
+    LOGIN_IP_BURST                 attempts an IP can make back to back
+    LOGIN_IP_PER_MINUTE            sustained attempts per minute per IP
+    LOGIN_ACCOUNT_BURST            attempts against one account back to back
+    LOGIN_ACCOUNT_PER_MINUTE       sustained attempts per minute per account
+    LOGIN_RATE_MEMORY_KEYS         max buckets held by the in-process fallback
+    LOGIN_RATE_REDIS_RETRY_SECONDS seconds to skip Redis after it fails
+"""
+import logging
+import math
+import os
+import threading
+import time
+from typing import Optional, Tuple
+from utils.redis_client import get_redis
+from utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+LOGIN_RATE_LIMIT = os.getenv("LOGIN_RATE_LIMIT", "1") != "0"
+LOGIN_IP_BURST = int(os.getenv("LOGIN_IP_BURST", 20))
+LOGIN_IP_PER_MINUTE = float(os.getenv("LOGIN_IP_PER_MINUTE", 10))
+LOGIN_ACCOUNT_BURST = int(os.getenv("LOGIN_ACCOUNT_BURST", 5))
+LOGIN_ACCOUNT_PER_MINUTE = float(os.getenv("LOGIN_ACCOUNT_PER_MINUTE", 2))
+LOGIN_RATE_MEMORY_KEYS = int(os.getenv("LOGIN_RATE_MEMORY_KEYS", 50000))
+LOGIN_RATE_REDIS_RETRY_SECONDS = float(os.getenv("LOGIN_RATE_REDIS_RETRY_SECONDS", 30))
+
+# KEYS: bucket hashes; ARGV: now, then (capacity, refill per second) per key.
+# Takes a token from every bucket only if all of them have one, so a request
+# rejected for its account doesn't also drain its IP bucket.
+# Returns {0, 0} when admitted, else {1-based index of the empty bucket, ms until a token}.
+TAKE_TOKENS_LUA = """
+local now = tonumber(ARGV[1])
+local levels = {}
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2])
+    local rate = tonumber(ARGV[i * 2 + 1])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    if tokens < 1 then
+        return {i, math.ceil((1 - tokens) / rate * 1000)}
+    end
+    levels[i] = tokens
+end
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2])
+    local rate = tonumber(ARGV[i * 2 + 1])
+    redis.call('HSET', key, 'tokens', levels[i] - 1, 'ts', now)
+    redis.call('PEXPIRE', key, math.ceil(capacity / rate * 1000))
+end
+return {0, 0}
+"""
+
+
+class MemoryBuckets:
+    """Per-process buckets used while Redis is down; idle buckets age out of the TTLCache."""
+
+    def __init__(self, maxsize: int):
+        self._buckets = TTLCache(maxsize, ttl=3600)
+        self._lock = threading.Lock()
+
+    def take(self, now: float, buckets) -> Tuple[int, float]:
+        with self._lock:
+            levels = []
+            for i, (key, capacity, rate) in enumerate(buckets, start=1):
+                tokens, ts = self._buckets.get(key, (capacity, now))
+                tokens = min(capacity, tokens + max(0.0, now - ts) * rate)
+                if tokens < 1:
+                    return i, (1 - tokens) / rate
+                levels.append(tokens)
+            for (key, capacity, rate), tokens in zip(buckets, levels):
+                self._buckets.set(key, (tokens - 1, now), ttl=capacity / rate)
+            return 0, 0.0
+
+
+class LoginRateLimiter:
+    def __init__(self):
+        self.enabled = LOGIN_RATE_LIMIT
+        self.ip_limit = (LOGIN_IP_BURST, LOGIN_IP_PER_MINUTE / 60)
+        self.account_limit = (LOGIN_ACCOUNT_BURST, LOGIN_ACCOUNT_PER_MINUTE / 60)
+        self._memory = MemoryBuckets(LOGIN_RATE_MEMORY_KEYS)
+        self._script = None
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.rejected_ip = 0
+        self.rejected_account = 0
+        self.redis_fallbacks = 0
+        self.redis_retry_seconds = LOGIN_RATE_REDIS_RETRY_SECONDS
+        self._redis_down = False
+        self._redis_retry_at = 0.0  # monotonic time before which Redis isn't tried
+
+    async def _take_redis(self, now: float, buckets) -> Tuple[int, float]:
+        if self._script is None:
+            self._script = get_redis().register_script(TAKE_TOKENS_LUA)
+        args = [now]
+        for _, capacity, rate in buckets:
+            args += [capacity, rate]
+        index, wait_ms = await self._script(keys=[key for key, _, _ in buckets], args=args)
+        return int(index), int(wait_ms) / 1000
+
+    async def check(self, ip: Optional[str], account: str) -> Optional[float]:
+        """
+        Take one login attempt for `ip` and `account`. Returns None when
+        admitted, otherwise the seconds until the next attempt would be.
+        """
+        if not self.enabled:
+            return None
+        buckets = [("login:rl:acct:" + account, *self.account_limit)]
+        if ip:
+            buckets.append(("login:rl:ip:" + ip, *self.ip_limit))
+        now = time.time()
+        index = None
+        if time.monotonic() >= self._redis_retry_at:
+            if self._redis_down:
+                # Half-open: concurrent attempts stay on memory while this one probes
+                self._redis_retry_at = time.monotonic() + self.redis_retry_seconds
+            try:
+                index, retry_after = await self._take_redis(now, buckets)
+                if self._redis_down:
+                    logger.info("Login rate limiter back on Redis")
+                self._redis_down = False
+                self._redis_retry_at = 0.0
+            except Exception as e:
+                self._redis_retry_at = time.monotonic() + self.redis_retry_seconds
+                if not self._redis_down:
+                    # Once per outage, not once per attempt
+                    logger.warning(f"Login rate limiter using in-process buckets, Redis unavailable: {e}")
+                    self._redis_down = True
+        if index is None:
+            with self._lock:
+                self.redis_fallbacks += 1
+            index, retry_after = self._memory.take(now, buckets)
+
+        with self._lock:
+            if index == 0:
+                self.admitted += 1
+                return None
+            if buckets[index - 1][0].startswith("login:rl:acct:"):
+                self.rejected_account += 1
+            else:
+                self.rejected_ip += 1
+        return max(retry_after, 0.001)
+
+    def stats(self) -> dict:
+        with self._lock:
+            rejected = self.rejected_ip + self.rejected_account
+            attempts = self.admitted + rejected
+            return {
+                "enabled": self.enabled,
+                "admitted": self.admitted,
+                "rejected_ip": self.rejected_ip,
+                "rejected_account": self.rejected_account,
+                "shed_ratio": round(rejected / attempts, 4) if attempts else None,
+                "redis_fallbacks": self.redis_fallbacks,
+                "redis_down": self._redis_down,
+                "ip_limit": {"burst": self.ip_limit[0], "per_minute": round(self.ip_limit[1] * 60, 3)},
+                "account_limit": {"burst": self.account_limit[0], "per_minute": round(self.account_limit[1] * 60, 3)},
+            }
+
+
+login_limiter = LoginRateLimiter()
+
+
+def retry_after_header(seconds: float) -> dict:
+    return {"Retry-After": str(max(1, math.ceil(seconds)))}
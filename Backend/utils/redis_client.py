@@ -1,16 +1,84 @@
-import redis
+"""
+Async Redis client over an explicit connection pool.
+
+The pool is created by init_redis() in the app lifespan (or lazily on first
+use by scripts) instead of at import time, and closed by close_redis().
+
+    REDIS_URL                  redis://[:password@]host:port/db (wins over the parts below);
+                               memory:// uses an in-process fakeredis for local runs
+    REDIS_HOST / REDIS_PORT / REDIS_PASSWORD / REDIS_DB
+    REDIS_MAX_CONNECTIONS      pool size per worker process
+    REDIS_SOCKET_TIMEOUT       seconds
+"""
+import logging
 import os
+from typing import Optional
+from redis.asyncio import ConnectionPool, Redis
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL")
+REDIS_HOST = os.getenv("REDIS_HOST", "redis-13624.c241.us-east-1-4.ec2.redns.redis-cloud.com")
+REDIS_PORT = int(os.getenv("REDIS_PORT", 13624))
+REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", "B2pWocAPdWkJdgD0nOwqEuJsDJLZcm1N")
+REDIS_DB = int(os.getenv("REDIS_DB", 0))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", 5))
+
+_pool: Optional[ConnectionPool] = None
+_client: Optional[Redis] = None
+
+
+def _create_pool() -> ConnectionPool:
+    options = dict(
+        max_connections=REDIS_MAX_CONNECTIONS,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+        health_check_interval=30,
+        decode_responses=True,
+    )
+    if REDIS_URL:
+        return ConnectionPool.from_url(REDIS_URL, **options)
+    return ConnectionPool(
+        host=REDIS_HOST, port=REDIS_PORT, password=REDIS_PASSWORD, db=REDIS_DB, **options
+    )
+
+
+def _memory_client() -> Redis:
+    try:
+        import fakeredis
+    except ImportError:
+        raise RuntimeError("REDIS_URL=memory:// needs the fakeredis package (pip install fakeredis)")
+    return fakeredis.FakeAsyncRedis(decode_responses=True)
+
+
+def get_redis() -> Redis:
+    """The process-wide client; creates the pool on first use."""
+    global _pool, _client
+    if _client is None:
+        if REDIS_URL and REDIS_URL.startswith("memory://"):
+            _client = _memory_client()
+        else:
+            _pool = _create_pool()
+            _client = Redis(connection_pool=_pool)
+    return _client
+
+
+async def init_redis() -> Redis:
+    client = get_redis()
+    try:
+        await client.ping()
+    except Exception as e:
+        # Auth falls back to the sessions table while Redis is unreachable
+        logger.error(f"Redis connection failed: {e}")
+    return client
+
 
-redis_client = redis.Redis(
-    host="redis-13624.c241.us-east-1-4.ec2.redns.redis-cloud.com",  # DNS only
-    port=13624,  # numeric port only
-    
-    password="B2pWocAPdWkJdgD0nOwqEuJsDJLZcm1N",
-    decode_responses=True
-)
-
-# quick test
-try:
-    print(redis_client.ping())
-except Exception as e:
-    print("Redis connection failed:", e)
+async def close_redis():
+    global _pool, _client
+    if _client is not None:
+        await _client.aclose()
+        if _pool is not None:
+            await _pool.disconnect()
+        _pool = None
+        _client = None
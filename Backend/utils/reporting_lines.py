@@ -0,0 +1,64 @@
+"""
+Reporting-line lookups backed by the reporting_lines closure table.
+
+Direct assignments live in employee_master (manager1..3, hr1..2),
+employee_managers and employee_hrs. The SQL function refresh_reporting_lines
+(migration v005) flattens them into one row per (ancestor, descendant), so
+"everyone under X" is a single primary-key range scan instead of a chain of
+per-level queries.
+
+    python -m utils.reporting_lines --rebuild [employee_id ...]
+"""
+import sys
+from typing import List, Optional
+from sqlalchemy import text
+from sqlmodel import select
+from models.employee_assignment_model import ReportingLine
+
+MANAGER = "manager"
+HR = "hr"
+
+
+def reports_query(ancestor_id: int, relation: str = MANAGER, max_depth: Optional[int] = None):
+    """SELECT of descendant ids, usable directly inside `.in_(...)`."""
+    query = select(ReportingLine.descendant_id).where(
+        ReportingLine.ancestor_id == ancestor_id,
+        ReportingLine.relation == relation,
+    )
+    if max_depth is not None:
+        query = query.where(ReportingLine.depth <= max_depth)
+    return query
+
+
+def get_reports(session, ancestor_id: int, relation: str = MANAGER, max_depth: Optional[int] = None) -> List[int]:
+    """All employees under `ancestor_id` (transitively unless `max_depth` is given)."""
+    return list(session.exec(reports_query(ancestor_id, relation, max_depth)).all())
+
+
+async def get_reports_async(session, ancestor_id: int, relation: str = MANAGER, max_depth: Optional[int] = None) -> List[int]:
+    return list((await session.exec(reports_query(ancestor_id, relation, max_depth))).all())
+
+
+def refresh_reporting_lines(session, employee_ids: Optional[List[int]] = None):
+    """
+    Recompute the closure rows below the given employees after their managers or
+    HRs changed; None rebuilds the whole table. Runs in the caller's transaction.
+    """
+    session.execute(
+        text("SELECT refresh_reporting_lines(CAST(:employee_ids AS INTEGER[]))"),
+        {"employee_ids": employee_ids},
+    )
+
+
+if __name__ == "__main__":
+    from sqlmodel import Session
+    from database import engine
+
+    if "--rebuild" not in sys.argv:
+        print(__doc__)
+        sys.exit(1)
+    ids = [int(arg) for arg in sys.argv[1:] if arg.isdigit()]
+    with Session(engine) as session:
+        refresh_reporting_lines(session, ids or None)
+        session.commit()
+    print(f"Rebuilt reporting_lines for {'employees ' + str(ids) if ids else 'all employees'}")
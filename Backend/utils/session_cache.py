@@ -0,0 +1,52 @@
+"""
+Per-process cache of decoded session payloads, in front of the session store.
+
+A logout removes the session from this worker's cache and the session store
+broadcasts the id (Redis pub/sub, Postgres NOTIFY); every worker's listener
+task drops it too.
+The TTL bounds how stale an entry can get if a message is ever missed.
+"""
+import asyncio
+import logging
+import os
+from utils.session_store import get_session_store
+from utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", 10000))
+SESSION_CACHE_TTL_SECONDS = float(os.getenv("SESSION_CACHE_TTL_SECONDS", 60))
+
+session_cache = TTLCache(SESSION_CACHE_SIZE, SESSION_CACHE_TTL_SECONDS)
+
+_listener = None
+
+
+async def _listen():
+    while True:
+        try:
+            await get_session_store().listen_invalidations(session_cache.pop)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Invalidations published while we were disconnected are lost; start clean
+            logger.warning(f"Session invalidation listener error, clearing session cache: {e}")
+            session_cache.clear()
+            await asyncio.sleep(1)
+
+
+def start_invalidation_listener():
+    global _listener
+    if _listener is None:
+        _listener = asyncio.create_task(_listen())
+
+
+async def stop_invalidation_listener():
+    global _listener
+    if _listener is not None:
+        _listener.cancel()
+        try:
+            await _listener
+        except asyncio.CancelledError:
+            pass
+        _listener = None
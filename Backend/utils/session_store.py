@@ -0,0 +1,389 @@
+"""
+Pluggable session storage.
+
+The store holds what auth reads on every request (payload + expiry); the
+`sessions` table stays the durable record and is written behind by
+SessionWriteBehind. Pick the backend per deployment:
+
+    SESSION_STORE                   redis (default) | memory | postgres
+                                    memory: single process only (local runs, benchmarks)
+                                    postgres: UNLOGGED session_store table, no Redis needed
+    SESSION_SWEEP_INTERVAL          seconds between expiry sweeps (memory / postgres)
+    SESSION_SWEEP_BATCH             entries removed per sweep batch
+    SESSION_WRITE_BEHIND            batched (default) | inline | off
+    SESSION_WRITE_BEHIND_INTERVAL   seconds between batched flushes to `sessions`
+    SESSION_WRITE_BEHIND_MAX_DELAY  longest backoff between flushes while the DB is failing
+    SESSION_WRITE_BEHIND_MAX_PENDING  queued writes kept for retry; the oldest are dropped beyond it
+"""
+import abc
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Optional, Tuple
+from sqlalchemy import text
+from database import async_engine, async_session_maker
+from utils.redis_client import get_redis, init_redis
+
+logger = logging.getLogger(__name__)
+
+SESSION_STORE = os.getenv("SESSION_STORE", "redis").lower()
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", 60))
+SESSION_SWEEP_BATCH = int(os.getenv("SESSION_SWEEP_BATCH", 1000))
+SESSION_WRITE_BEHIND = os.getenv("SESSION_WRITE_BEHIND", "batched").lower()
+SESSION_WRITE_BEHIND_INTERVAL = float(os.getenv("SESSION_WRITE_BEHIND_INTERVAL", 1))
+SESSION_WRITE_BEHIND_MAX_DELAY = float(os.getenv("SESSION_WRITE_BEHIND_MAX_DELAY", 60))
+SESSION_WRITE_BEHIND_MAX_PENDING = int(os.getenv("SESSION_WRITE_BEHIND_MAX_PENDING", 10000))
+SESSION_INVALIDATION_CHANNEL = os.getenv("SESSION_INVALIDATION_CHANNEL", "sessions:invalidate")
+
+# Stored in place of a logged-out session so auth rejects it without asking the DB
+REVOKED_SESSION = "__revoked__"
+
+
+class SessionStore(abc.ABC):
+    """
+    get() returns (payload, seconds_left): payload is the session dict,
+    REVOKED_SESSION after a logout, or None when the store doesn't know the id.
+    """
+    sweeps = False
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    @abc.abstractmethod
+    async def get(self, session_id: str) -> Tuple[Optional[object], Optional[float]]:
+        ...
+
+    @abc.abstractmethod
+    async def put(self, session_id: str, payload: dict, ttl_seconds: int):
+        ...
+
+    @abc.abstractmethod
+    async def revoke(self, session_id: str, ttl_seconds: int):
+        """Tombstone the session and tell every worker to drop its cached copy."""
+
+    async def sweep_expired(self, batch_size: int = SESSION_SWEEP_BATCH) -> int:
+        return 0
+
+    async def listen_invalidations(self, callback: Callable[[str], None]):
+        """Call `callback(session_id)` for every revoke published by any worker; runs until cancelled."""
+        await asyncio.Event().wait()
+
+
+class MemorySessionStore(SessionStore):
+    sweeps = True
+
+    def __init__(self):
+        self._data = {}  # session_id -> (monotonic expiry, payload)
+        self._listeners = []
+
+    async def get(self, session_id):
+        entry = self._data.get(session_id)
+        if entry is None:
+            return None, None
+        left = entry[0] - time.monotonic()
+        if left <= 0:
+            return None, None
+        return entry[1], left
+
+    async def put(self, session_id, payload, ttl_seconds):
+        self._data[session_id] = (time.monotonic() + ttl_seconds, payload)
+
+    async def revoke(self, session_id, ttl_seconds):
+        self._data[session_id] = (time.monotonic() + ttl_seconds, REVOKED_SESSION)
+        # One process: "broadcast" is a direct call
+        for callback in self._listeners:
+            callback(session_id)
+
+    async def listen_invalidations(self, callback):
+        self._listeners.append(callback)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            self._listeners.remove(callback)
+
+    async def sweep_expired(self, batch_size=SESSION_SWEEP_BATCH):
+        now = time.monotonic()
+        expired = [sid for sid, (expires, _) in list(self._data.items()) if expires <= now]
+        for i in range(0, len(expired), batch_size):
+            for sid in expired[i:i + batch_size]:
+                self._data.pop(sid, None)
+            await asyncio.sleep(0)  # let requests run between batches
+        return len(expired)
+
+
+class RedisSessionStore(SessionStore):
+    # Redis expires keys itself; nothing to sweep
+
+    async def start(self):
+        await init_redis()
+
+    async def get(self, session_id):
+        # Value and remaining lifetime in one round trip
+        async with get_redis().pipeline(transaction=False) as pipe:
+            pipe.get(session_id)
+            pipe.ttl(session_id)
+            data, ttl = await pipe.execute()
+        if data is None:
+            return None, None
+        if data == REVOKED_SESSION:
+            return REVOKED_SESSION, ttl
+        return json.loads(data), (ttl if ttl > 0 else None)
+
+    async def put(self, session_id, payload, ttl_seconds):
+        async with get_redis().pipeline(transaction=False) as pipe:
+            pipe.setex(session_id, ttl_seconds, json.dumps(payload))
+            await pipe.execute()
+
+    async def revoke(self, session_id, ttl_seconds):
+        async with get_redis().pipeline(transaction=False) as pipe:
+            pipe.set(session_id, REVOKED_SESSION, ex=ttl_seconds)
+            pipe.publish(SESSION_INVALIDATION_CHANNEL, session_id)
+            await pipe.execute()
+
+    async def listen_invalidations(self, callback):
+        async with get_redis().pubsub(ignore_subscribe_messages=True) as pubsub:
+            await pubsub.subscribe(SESSION_INVALIDATION_CHANNEL)
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    callback(message["data"])
+
+
+class PostgresSessionStore(SessionStore):
+    """
+    UNLOGGED table (migration v006): no WAL, so writes are cheap, and its
+    contents are lost on a crash. Auth then falls back to `sessions`.
+    Revokes are broadcast with NOTIFY.
+    """
+    sweeps = True
+
+    async def get(self, session_id):
+        async with async_session_maker() as db:
+            row = (await db.execute(
+                text("""
+                    SELECT payload, revoked, EXTRACT(EPOCH FROM expires_at - NOW()) AS ttl
+                    FROM session_store
+                    WHERE session_id = :sid AND expires_at > NOW()
+                """),
+                {"sid": session_id},
+            )).first()
+        if row is None:
+            return None, None
+        return (REVOKED_SESSION if row.revoked else row.payload), float(row.ttl)
+
+    async def _upsert(self, session_id, payload, revoked, ttl_seconds, notify=False):
+        async with async_session_maker() as db:
+            await db.execute(
+                text("""
+                    INSERT INTO session_store (session_id, payload, revoked, expires_at)
+                    VALUES (:sid, CAST(:payload AS JSONB), :revoked, NOW() + make_interval(secs => :ttl))
+                    ON CONFLICT (session_id) DO UPDATE
+                        SET payload = EXCLUDED.payload,
+                            revoked = EXCLUDED.revoked,
+                            expires_at = EXCLUDED.expires_at
+                """),
+                {"sid": session_id, "payload": json.dumps(payload), "revoked": revoked, "ttl": ttl_seconds},
+            )
+            if notify:
+                await db.execute(
+                    text("SELECT pg_notify(:channel, :sid)"),
+                    {"channel": SESSION_INVALIDATION_CHANNEL, "sid": session_id},
+                )
+            await db.commit()
+
+    async def put(self, session_id, payload, ttl_seconds):
+        await self._upsert(session_id, payload, False, ttl_seconds)
+
+    async def revoke(self, session_id, ttl_seconds):
+        await self._upsert(session_id, {}, True, ttl_seconds, notify=True)
+
+    async def sweep_expired(self, batch_size=SESSION_SWEEP_BATCH):
+        removed = 0
+        while True:
+            async with async_session_maker() as db:
+                result = await db.execute(
+                    text("""
+                        DELETE FROM session_store
+                        WHERE session_id IN (
+                            SELECT session_id FROM session_store
+                            WHERE expires_at <= NOW()
+                            LIMIT :batch
+                            FOR UPDATE SKIP LOCKED
+                        )
+                    """),
+                    {"batch": batch_size},
+                )
+                await db.commit()
+            removed += result.rowcount
+            if result.rowcount < batch_size:
+                return removed
+
+    async def listen_invalidations(self, callback):
+        queue = asyncio.Queue()
+        async with async_engine.connect() as conn:
+            raw = (await conn.get_raw_connection()).driver_connection
+            await raw.add_listener(
+                SESSION_INVALIDATION_CHANNEL, lambda _c, _pid, _ch, sid: queue.put_nowait(sid)
+            )
+            while True:
+                try:
+                    callback(await asyncio.wait_for(queue.get(), timeout=30))
+                except asyncio.TimeoutError:
+                    await conn.execute(text("SELECT 1"))  # raises if the LISTEN connection died
+
+
+class SessionWriteBehind:
+    """
+    Mirrors session creation / logout into the durable `sessions` table.
+    batched: queued and flushed every SESSION_WRITE_BEHIND_INTERVAL seconds in
+    two statements; inline: written before the call returns; off: not written.
+    A failed flush puts its batch back in the queue (up to
+    SESSION_WRITE_BEHIND_MAX_PENDING) and the next one backs off exponentially.
+    """
+
+    def __init__(self, mode: str = SESSION_WRITE_BEHIND, interval: float = SESSION_WRITE_BEHIND_INTERVAL,
+                 max_pending: int = SESSION_WRITE_BEHIND_MAX_PENDING):
+        self.mode = mode
+        self.interval = interval
+        self.max_pending = max_pending
+        self._inserts = []
+        self._deactivations = []
+        self._failures = 0
+        self._task = None
+
+    async def insert(self, session_id: str, payload: dict, expires_at: datetime):
+        if self.mode == "off":
+            return
+        self._inserts.append({
+            "sid": session_id, "uid": payload["user_id"], "role": payload["role"],
+            "utype": payload["user_type"], "exp": expires_at,
+        })
+        if self.mode == "inline":
+            await self.flush()
+
+    async def deactivate(self, session_id: str):
+        if self.mode == "off":
+            return
+        self._deactivations.append(session_id)
+        if self.mode == "inline":
+            await self.flush()
+
+    async def flush(self) -> bool:
+        """Write everything queued; returns False (and keeps the batch queued) if the DB write failed."""
+        inserts, self._inserts = self._inserts, []
+        deactivations, self._deactivations = self._deactivations, []
+        if not inserts and not deactivations:
+            return True
+        try:
+            async with async_session_maker() as db:
+                if inserts:
+                    # A retried batch may already be partly in the table
+                    await db.execute(
+                        text("""INSERT INTO sessions (session_id, user_id, role, user_type, expires_at)
+                                VALUES (:sid, :uid, :role, :utype, :exp)
+                                ON CONFLICT (session_id) DO NOTHING"""),
+                        inserts,
+                    )
+                if deactivations:
+                    await db.execute(
+                        text("UPDATE sessions SET is_active = FALSE WHERE session_id = ANY(:sids)"),
+                        {"sids": deactivations},
+                    )
+                await db.commit()
+        except Exception as e:
+            logger.error(f"sessions write-behind failed ({len(inserts)} inserts, {len(deactivations)} logouts): {e}")
+            self._requeue(inserts, deactivations)
+            self._failures += 1
+            return False
+        self._failures = 0
+        return True
+
+    def _requeue(self, inserts: list, deactivations: list):
+        # Older entries go back in front so a logout is never replayed before its insert
+        self._inserts = self._trim(inserts + self._inserts, "inserts")
+        self._deactivations = self._trim(deactivations + self._deactivations, "logouts")
+
+    def _trim(self, queue: list, what: str) -> list:
+        dropped = len(queue) - self.max_pending
+        if dropped > 0:
+            logger.error(f"sessions write-behind queue full, dropping {dropped} oldest {what}")
+            return queue[dropped:]
+        return queue
+
+    def _delay(self) -> float:
+        if not self._failures:
+            return self.interval
+        return min(self.interval * 2 ** self._failures, SESSION_WRITE_BEHIND_MAX_DELAY)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self._delay())
+            await self.flush()
+
+    async def start(self):
+        if self.mode == "batched" and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+STORES = {
+    "memory": MemorySessionStore,
+    "redis": RedisSessionStore,
+    "postgres": PostgresSessionStore,
+}
+
+_store: Optional[SessionStore] = None
+_sweeper = None
+write_behind = SessionWriteBehind()
+
+
+def get_session_store() -> SessionStore:
+    global _store
+    if _store is None:
+        if SESSION_STORE not in STORES:
+            raise ValueError(f"Unknown SESSION_STORE {SESSION_STORE!r}; expected one of {sorted(STORES)}")
+        _store = STORES[SESSION_STORE]()
+    return _store
+
+
+async def _sweep_forever(store: SessionStore):
+    while True:
+        await asyncio.sleep(SESSION_SWEEP_INTERVAL)
+        try:
+            removed = await store.sweep_expired()
+            if removed:
+                logger.info(f"Swept {removed} expired sessions from the {SESSION_STORE} store")
+        except Exception as e:
+            logger.warning(f"Session sweep failed: {e}")
+
+
+async def start_session_store():
+    global _sweeper
+    store = get_session_store()
+    await store.start()
+    await write_behind.start()
+    if store.sweeps and _sweeper is None:
+        _sweeper = asyncio.create_task(_sweep_forever(store))
+
+
+async def stop_session_store():
+    global _sweeper
+    if _sweeper is not None:
+        _sweeper.cancel()
+        _sweeper = None
+    await write_behind.stop()
+    await get_session_store().stop()
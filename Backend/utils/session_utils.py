@@ -1,38 +1,28 @@
-import uuid, datetime, json
-from utils.redis_client import redis_client
+import uuid, datetime
+from utils.session_cache import session_cache
+from utils.session_store import get_session_store, write_behind
 
-def create_session(user_id: int, role: str, user_type: str, db_session, ttl_seconds: int = 3600):
+
+async def create_session(user_id: int, role: str, user_type: str, ttl_seconds: int = 3600):
     session_id = str(uuid.uuid4())
     expires_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=ttl_seconds)
+    payload = {"user_id": user_id, "role": role, "user_type": user_type}
 
-    # Save in Redis
-    redis_client.setex(
-        session_id, ttl_seconds,
-        json.dumps({"user_id": user_id, "role": role, "user_type": user_type})
-    )
-
-    # Save in DB
-    from sqlalchemy import text
-
-    db_session.exec(
-        text("""INSERT INTO sessions (session_id, user_id, role, user_type, expires_at)
-           VALUES (:sid, :uid, :role, :utype, :exp)""").bindparams(
-               sid=session_id, uid=user_id, role=role, utype=user_type, exp=expires_at
-           )
-)
-    db_session.commit()
+    # Save in the session store (Redis / memory / unlogged table)
+    await get_session_store().put(session_id, payload, ttl_seconds)
 
+    # Save in DB, off the request path unless SESSION_WRITE_BEHIND=inline
+    await write_behind.insert(session_id, payload, expires_at)
 
     return session_id, expires_at
 
 
-def invalidate_session(session_id: str, db_session):
-    # Remove from Redis
-    redis_client.delete(session_id)
+async def invalidate_session(session_id: str, ttl_seconds: int = 3600):
+    session_cache.pop(session_id)
+
+    # Tombstone in the store (so the DB fallback is never consulted while the
+    # update below is still queued) and broadcast to every worker's cache
+    await get_session_store().revoke(session_id, ttl_seconds)
 
     # Mark inactive in DB
-    db_session.exec(
-        "UPDATE sessions SET is_active = FALSE WHERE session_id = :sid",
-        {"sid": session_id}
-    )
-    db_session.commit()
+    await write_behind.deactivate(session_id)
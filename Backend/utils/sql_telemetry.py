@@ -0,0 +1,95 @@
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+
+# Same statement shape repeated more than this many times in one request is flagged as N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", 10))
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """Statement text with literals and whitespace normalised, so repeated lookups collapse together."""
+    return _WHITESPACE.sub(" ", _LITERALS.sub("?", statement)).strip()
+
+
+class RequestQueryStats:
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.shapes = Counter()
+
+    def record(self, statement: str, elapsed: float):
+        self.count += 1
+        self.total_time += elapsed
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated_shapes(self, threshold: int = N_PLUS_ONE_THRESHOLD):
+        return [(shape, n) for shape, n in self.shapes.most_common() if n > threshold]
+
+
+_current_stats: ContextVar[Optional[RequestQueryStats]] = ContextVar("sql_request_stats", default=None)
+
+
+def start_request() -> RequestQueryStats:
+    stats = RequestQueryStats()
+    _current_stats.set(stats)
+    return stats
+
+
+# The start time rides on the statement's execution context rather than on the
+# pooled connection, so a statement that raises leaves nothing behind
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._telemetry_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_telemetry_started", None)
+    stats = _current_stats.get()
+    if stats is not None and started is not None:
+        stats.record(statement, time.perf_counter() - started)
+
+
+def install_sql_telemetry(engine):
+    """Count statements and DB time per request on this (sync) engine."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class RouteQueryTotals:
+    """Process-wide totals per route path, for spotting chatty endpoints."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def add(self, route: str, stats: RequestQueryStats, flagged: bool):
+        with self._lock:
+            totals = self._routes.setdefault(
+                route, {"requests": 0, "queries": 0, "db_time_ms": 0.0, "max_queries": 0, "n_plus_one": 0}
+            )
+            totals["requests"] += 1
+            totals["queries"] += stats.count
+            totals["db_time_ms"] += stats.total_time * 1000
+            totals["max_queries"] = max(totals["max_queries"], stats.count)
+            totals["n_plus_one"] += int(flagged)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                route: {
+                    **totals,
+                    "db_time_ms": round(totals["db_time_ms"], 3),
+                    "avg_queries": round(totals["queries"] / totals["requests"], 2),
+                }
+                for route, totals in sorted(self._routes.items())
+            }
+
+
+route_totals = RouteQueryTotals()